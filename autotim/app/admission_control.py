@@ -0,0 +1,162 @@
+"""Limits concurrent predictions, so that an overloaded worker sheds load early."""
+import os
+import math
+import time
+import threading
+
+from injector import inject
+
+PREDICT = 'predict'
+
+
+class AdmissionRejectedError(Exception):
+    """
+    Raised if a request is not admitted, status is 429 if the queue is full
+    and 503 if the request waited in the queue for too long.
+    """
+
+    def __init__(self, name: str, status: int, retry_after: int):
+        self.status = status
+        self.retry_after = retry_after
+        reason = "too many queued requests" if status == 429 else "queue wait time exceeded"
+        self.message = f"The service is overloaded ({name}: {reason}), " \
+                       f"retry after {retry_after} seconds."
+        super().__init__(self.message)
+
+
+# limits, counters and queue of one limiter, all guarded by the same condition
+class AdmissionLimiter:  # pylint: disable=too-many-instance-attributes
+    """
+    Runs at most max_concurrent requests at once, up to max_queue further requests wait
+    (first come, first served) for at most max_wait seconds.
+
+    :param max_concurrent: number of requests running at once, 0 = unlimited
+    :param max_queue: number of waiting requests, further requests are rejected right away
+    :param max_wait: seconds a request waits before it is rejected
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.running = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # moving average of the request duration, estimates Retry-After
+        self.average_duration = None
+        self._queue = []
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Waits for a free slot, raises AdmissionRejectedError if there is none in time."""
+        with self._condition:
+            if self.max_concurrent <= 0 or \
+                    (self.running < self.max_concurrent and not self._queue):
+                self._admit()
+                return
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejectedError(name=self.name, status=429,
+                                             retry_after=self.retry_after())
+
+            ticket = object()
+            self._queue.append(ticket)
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self._queue[0] is not ticket or self.running >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise AdmissionRejectedError(name=self.name, status=503,
+                                                     retry_after=self.retry_after())
+                    self._condition.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                # the next request in the queue might be admitted now
+                self._condition.notify_all()
+            self._admit()
+
+    def release(self, duration: float):
+        with self._condition:
+            self.running -= 1
+            self.average_duration = duration if self.average_duration is None \
+                else 0.8 * self.average_duration + 0.2 * duration
+            self._condition.notify_all()
+
+    def retry_after(self) -> int:
+        """Seconds until the currently queued requests are expected to be done."""
+        if self.average_duration is None or self.max_concurrent <= 0:
+            return 1
+        return max(1, math.ceil(self.average_duration *
+                                (len(self._queue) + 1) / self.max_concurrent))
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {'running': self.running,
+                    'queued': len(self._queue),
+                    'max_concurrent': self.max_concurrent,
+                    'max_queue': self.max_queue,
+                    'admitted': self.admitted,
+                    'rejected': self.rejected,
+                    'timed_out': self.timed_out}
+
+    def _admit(self):
+        self.running += 1
+        self.admitted += 1
+
+
+class Admission:
+    """
+    Slot of a request, acquired on enter (or by calling acquire) and released on exit
+    (or by calling release, e.g. once a streamed response is done).
+    """
+
+    def __init__(self, limiter: AdmissionLimiter):
+        self._limiter = limiter
+        self._start = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *_):
+        self.release()
+
+    def acquire(self) -> 'Admission':
+        """Waits for a slot (if not acquired yet), raises AdmissionRejectedError."""
+        if self._start is None:
+            self._limiter.acquire()
+            self._start = time.monotonic()
+        return self
+
+    def release(self):
+        if self._start is not None:
+            self._limiter.release(duration=time.monotonic() - self._start)
+            self._start = None
+
+
+class AdmissionController:
+    """
+    One AdmissionLimiter for predictions per worker process. Trainings run as jobs,
+    which are limited by the TrainingJobRunner.
+    """
+
+    @inject
+    def __init__(self):
+        self.limiters = {
+            PREDICT: AdmissionLimiter(
+                name=PREDICT,
+                max_concurrent=int(os.getenv('PREDICT_MAX_CONCURRENT', "4")),
+                max_queue=int(os.getenv('PREDICT_MAX_QUEUE', "32")),
+                max_wait=float(os.getenv('PREDICT_MAX_QUEUE_SECONDS', "10")))}
+
+    def admit(self, name: str) -> Admission:
+        """
+        Usage: with admission_controller.admit(PREDICT): ...
+        raises AdmissionRejectedError if the request is not admitted.
+        """
+        return Admission(limiter=self.limiters[name])
+
+    def stats(self) -> dict:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
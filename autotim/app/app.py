@@ -1,6 +1,4 @@
 """Flask App"""
-import sys
-
 from flask import Flask
 from flask_basicauth import BasicAuth
 from flask_injector import FlaskInjector
@@ -11,16 +9,14 @@ from autotim.app.authconfig import AuthConfig
 from autotim.app.endpoints.store_bp import STORE_BP
 from autotim.app.endpoints.predict_bp import PREDICT_BP
 from autotim.app.endpoints.train_bp import TRAIN_BP
-
-
-# when run in docker, recursion limit is capped at 1000
-sys.setrecursionlimit(3000)
+from autotim.app.endpoints.status_bp import STATUS_BP
 
 
 def register_blueprints(application):
     application.register_blueprint(STORE_BP)
     application.register_blueprint(TRAIN_BP)
     application.register_blueprint(PREDICT_BP)
+    application.register_blueprint(STATUS_BP)
 
 
 def create_app():
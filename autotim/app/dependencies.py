@@ -1,19 +1,32 @@
 import os
 from injector import singleton
 
+from autotim.app.admission_control import AdmissionController
+from autotim.storage_client.dataset_cache import DatasetCache
 from autotim.storage_client.file_store_manager import FileStoreManager
-from autotim.storage_client.gcs_bucket_client import GCSBucketClient
-from autotim.storage_client.local_client import LocalStorageClient
+from autotim.storage_client.storage_factory import get_storage_client_class
+from autotim.training_jobs.job_runner import TrainingJobRunner
+from autotim.training_jobs.job_store import JobStore
 
 from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+from autotim.prediction_service.prediction_coalescer import PredictionCoalescer
+from autotim.prediction_service.result_cache import PredictionResultCache
+from autotim.prediction_service.scoring_sidecar import SidecarPredictionService
 
 
 def configure(binder):
-    if os.getenv("STORAGE") == "local":
-        binder.bind(FileStoreManager, to=LocalStorageClient, scope=singleton)
-    else:
-        os.environ["STORAGE"] = 'GCS'
-        binder.bind(FileStoreManager, to=GCSBucketClient, scope=singleton)
+    binder.bind(FileStoreManager, to=get_storage_client_class(), scope=singleton)
 
-    binder.bind(AutoTiMPredictionService,
-                to=AutoTiMPredictionService, scope=singleton)
+    if os.getenv("SCORING_SIDECAR_SOCKET"):
+        # models are loaded and scored once by the scoring sidecar shared by all workers
+        binder.bind(AutoTiMPredictionService,
+                    to=SidecarPredictionService, scope=singleton)
+    else:
+        binder.bind(AutoTiMPredictionService,
+                    to=AutoTiMPredictionService, scope=singleton)
+    binder.bind(PredictionCoalescer, to=PredictionCoalescer, scope=singleton)
+    binder.bind(AdmissionController, to=AdmissionController, scope=singleton)
+    binder.bind(PredictionResultCache, to=PredictionResultCache, scope=singleton)
+    binder.bind(JobStore, to=JobStore, scope=singleton)
+    binder.bind(DatasetCache, to=DatasetCache, scope=singleton)
+    binder.bind(TrainingJobRunner, to=TrainingJobRunner, scope=singleton)
@@ -1,23 +1,31 @@
+import os
+import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from flask_api import status
 from injector import inject
 
 from flask import Blueprint, request, Response, jsonify
 from mlflow.exceptions import MlflowException
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError as RequestsConnectionError
 
+from autotim.app.admission_control import AdmissionController, AdmissionRejectedError, PREDICT
 from autotim.app.endpoints.utils.reponse_utils import RESPONSE_400_INPUT_FORMAT_WRONG, \
-    RESPONSE_400_NO_REQUIRED_PARAM, RESPONSE_500_INTERNAL_SERVER_ERROR
+    RESPONSE_400_NO_REQUIRED_PARAM, RESPONSE_500_INTERNAL_SERVER_ERROR, get_rejection_response
 
-from autotim.app.endpoints.utils.file_handling_utils import read_timeseries_from_file, \
-     get_single_file_input_format
+from autotim.app.endpoints.utils.dataframe_utils import iter_series_chunks
+from autotim.app.endpoints.utils.file_handling_utils import read_timeseries_from_request, \
+    read_batch_manifest, read_group_timeseries, TIMESERIES_FILE_EXTENSIONS
 
 from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+from autotim.prediction_service.prediction_coalescer import PredictionCoalescer, score_frames
+from autotim.prediction_service.result_cache import PredictionResultCache
 from autotim.model_selection.exceptions import MlflowModelNotFoundError, \
     ModelArtifactsNotAvailableError
 
-from autotim.feature_engineering.automated_feature_engineering import create_features
+from autotim.feature_engineering.automated_feature_engineering import create_features, \
+    feature_cache_stats, merge_settings, select_features
 from autotim.feature_engineering.exceptions import FeatureCreationFailedError
 
 PREDICT_BP = Blueprint('predict', __name__)
@@ -31,55 +39,375 @@ RESPONSE_404_MODEL_NOT_FOUND = \
 
 RESPONSE_400_FEATURES_NOT_CREATED = Response(status=400)
 
+RESPONSE_400_MODEL_VERSIONS_WRONG = Response("model_versions must be a comma separated list of "
+                                             "model versions and/or 'Production'.", status=400)
+
+# models with the same parameters can share the extraction of their features
+EXTRACTION_PARAMS = ['column_id', 'column_value', 'column_kind', 'column_sort']
+
+RESPONSE_400_MANIFEST_WRONG = Response("Wrong input format: batch predictions require a json "
+                                       "manifest containing a non-empty list of 'groups'.",
+                                       status=400)
+
+
+def get_score_function(autotim_prediction_service: AutoTiMPredictionService, autotim_model,
+                       prediction_result_cache: PredictionResultCache):
+    """
+    Returns a function creating features for a dataframe and scoring them with the model,
+        series with a cached prediction are skipped.
+    """
+    def score(dataframe):
+        return prediction_result_cache.score(autotim_model=autotim_model, timeseries=dataframe,
+                                             score=create_features_and_score)
+
+    def create_features_and_score(dataframe):
+        features = create_features(dataframe=dataframe,
+                                   settings=autotim_model.feature_settings,
+                                   column_id=autotim_model.params.get('column_id'),
+                                   column_value=autotim_model.params.get('column_value'),
+                                   column_kind=autotim_model.params.get('column_kind'),
+                                   column_sort=autotim_model.params.get('column_sort'))
+
+        return autotim_prediction_service.predict(features=features,
+                                                  model=autotim_model.model)
+    return score
+
+
+def parse_model_versions(model_versions: str) -> list:
+    """Parses e.g. '3,Production' into [3, None], raises ValueError on invalid versions."""
+    versions = []
+    for version in model_versions.split(','):
+        version = version.strip()
+        version = None if version.lower() == 'production' else int(version)
+        if version not in versions:
+            versions.append(version)
+    if not versions:
+        raise ValueError("No model versions given.")
+    return versions
+
+
+def score_model_versions(autotim_prediction_service: AutoTiMPredictionService,
+                         autotim_models: list, timeseries) -> dict:
+    """
+    Scores time series with several models (e.g. the Staging and the Production version),
+        the features of models with equal extraction parameters are created once with the
+        union of their feature settings and sliced per model.
+
+    :return: predictions per model version
+    """
+    models_by_params, model_uris = {}, set()
+    for autotim_model in autotim_models:
+        # 'Production' might resolve to a version that is requested explicitly as well
+        if autotim_model.mlflow_uri in model_uris:
+            continue
+        model_uris.add(autotim_model.mlflow_uri)
+        params = tuple(autotim_model.params.get(param) for param in EXTRACTION_PARAMS)
+        models_by_params.setdefault(params, []).append(autotim_model)
+
+    predictions = {}
+    for params, models in models_by_params.items():
+        features = create_features(dataframe=timeseries,
+                                   settings=merge_settings([autotim_model.feature_settings
+                                                            for autotim_model in models]),
+                                   **dict(zip(EXTRACTION_PARAMS, params)))
+        for autotim_model in models:
+            predictions[str(autotim_model.model_version)] = autotim_prediction_service.predict(
+                model=autotim_model.model,
+                features=select_features(features, autotim_model.feature_settings))
+    return predictions
+
+
+def read_predict_request():
+    """
+    Reads the time series of a prediction request and checks its required parameters.
+
+    :return: the time series and None, or None and the error response
+    """
+    timeseries = read_timeseries_from_request(request=request)
+    if timeseries is None:
+        return None, RESPONSE_400_INPUT_FORMAT_WRONG
+
+    # request.values also contains the query parameters of raw arrow request bodies
+    if request.values.get('use_case_name') is None or \
+            request.values.get('dataset_identifier') is None:
+        return None, RESPONSE_400_NO_REQUIRED_PARAM
+    return timeseries, None
+
+
+def get_error_response(error: Exception) -> Response:
+    """Maps an exception raised while handling a prediction request to its response."""
+    if isinstance(error, AdmissionRejectedError):
+        return get_rejection_response(error)
+    if isinstance(error, FeatureCreationFailedError):
+        return Response(error.message, status=RESPONSE_400_FEATURES_NOT_CREATED.status)
+    if isinstance(error, (MlflowModelNotFoundError, ModelArtifactsNotAvailableError)):
+        return RESPONSE_404_MODEL_NOT_FOUND
+    # KeyError -> environment variables not set
+    logging.error(error)
+    return RESPONSE_500_INTERNAL_SERVER_ERROR
+
+
+def get_error_details(error: Exception):
+    """Maps an exception raised during a prediction to an error message and a status code."""
+    if isinstance(error, FeatureCreationFailedError):
+        return error.message, status.HTTP_400_BAD_REQUEST
+    if isinstance(error, (MlflowModelNotFoundError, ModelArtifactsNotAvailableError)):
+        return RESPONSE_404_MODEL_NOT_FOUND.get_data(as_text=True), status.HTTP_404_NOT_FOUND
+    logging.error(error)
+    return "Internal error during prediction occurred.", status.HTTP_500_INTERNAL_SERVER_ERROR
+
 
 @inject
 @PREDICT_BP.route('/predict', methods=['POST'])
-def predict(autotim_prediction_service: AutoTiMPredictionService):
+def predict(autotim_prediction_service: AutoTiMPredictionService,
+            prediction_coalescer: PredictionCoalescer,
+            prediction_result_cache: PredictionResultCache,
+            admission_controller: AdmissionController):
     """
     Performs classification of a timeseries provided in a file-parameter
         with a model trained and stored with MLFlow.
     Required parameters: use_case_name (str),
                          dataset_identifier (str),
-                         file (.csv- or .json-file).
-    Optional parameters: model_version (str).
+                         file (.csv-, .json-, .parquet- or .arrow-file).
+    Optional parameters: model_version (str),
+                         model_versions (str, comma separated versions and/or 'Production',
+                            instead of model_version: scores the timeseries with each version).
+    Alternatively, the timeseries can be sent as request body in the Arrow IPC streaming format
+        (content type application/vnd.apache.arrow.stream) with the parameters in the query string.
 
-    Array of predictions will be returned in a response body.
+    Array of predictions will be returned in a response body, with model_versions an object
+        with the array of predictions of each version. If the worker is overloaded,
+        the request is rejected with status 429 or 503 and a Retry-After header.
     """
-    timeseries = read_timeseries_from_file(
-        file=get_single_file_input_format(request=request,
-                                          allowed_extensions=['csv', 'json']))
-    if timeseries is None:
-        return RESPONSE_400_INPUT_FORMAT_WRONG
+    timeseries, error_response = read_predict_request()
+    if error_response is not None:
+        return error_response
 
-    if request.form.get('use_case_name') is None or \
-            request.form.get('dataset_identifier') is None:
-        return RESPONSE_400_NO_REQUIRED_PARAM
+    use_case_name = request.values.get('use_case_name')
+    dataset_identifier = request.values.get('dataset_identifier')
+    model_version = request.values.get('model_version', None)
 
-    use_case_name = request.form.get('use_case_name')
-    dataset_identifier = request.form.get('dataset_identifier')
-    model_version = request.form.get('model_version', None)
+    model_versions = None
+    if request.values.get('model_versions') is not None:
+        try:
+            model_versions = parse_model_versions(request.values.get('model_versions'))
+        except ValueError:
+            return RESPONSE_400_MODEL_VERSIONS_WRONG
 
     try:
-        autotim_model = autotim_prediction_service.get_model(use_case_name=use_case_name,
-                                                           dataset_identifier=dataset_identifier,
-                                                           model_version=model_version)
+        if model_versions is not None:
+            with admission_controller.admit(PREDICT):
+                autotim_models = [autotim_prediction_service.get_model(
+                    use_case_name=use_case_name, dataset_identifier=dataset_identifier,
+                    model_version=version) for version in model_versions]
+                predictions = score_model_versions(
+                    autotim_prediction_service=autotim_prediction_service,
+                    autotim_models=autotim_models, timeseries=timeseries)
+            return jsonify({'predictions': predictions}), status.HTTP_200_OK
 
-        features = create_features(dataframe=timeseries, settings=autotim_model.feature_settings,
-                                   column_id=autotim_model.params.get('column_id'),
-                                   column_value=autotim_model.params.get('column_value'),
-                                   column_kind=autotim_model.params.get('column_kind'),
-                                   column_sort=autotim_model.params.get('column_sort'))
+        # loading a model that is not cached yet is as expensive as scoring
+        with admission_controller.admit(PREDICT):
+            autotim_model = autotim_prediction_service.get_model(
+                use_case_name=use_case_name, dataset_identifier=dataset_identifier,
+                model_version=model_version)
 
-        prediction = autotim_prediction_service.predict(features=features,
-                                                       model=autotim_model.model)
+        # concurrent requests for the same model might be scored together, a batch takes
+        # a single admission slot
+        prediction = prediction_coalescer.submit(
+            key=autotim_model.mlflow_uri, timeseries=timeseries,
+            column_id=autotim_model.params.get('column_id'),
+            score=get_score_function(autotim_prediction_service=autotim_prediction_service,
+                                     autotim_model=autotim_model,
+                                     prediction_result_cache=prediction_result_cache),
+            admit=lambda: admission_controller.admit(PREDICT))
 
-    except FeatureCreationFailedError as e:
-        return Response(e.message, status=RESPONSE_400_FEATURES_NOT_CREATED.status)
-    except (MlflowModelNotFoundError, ModelArtifactsNotAvailableError):
-        return RESPONSE_404_MODEL_NOT_FOUND
-    except (MlflowException, ConnectionError, KeyError, RecursionError) as e:
-        # KeyError -> environment variables not set
-        logging.error(e)
-        return RESPONSE_500_INTERNAL_SERVER_ERROR
+    except (AdmissionRejectedError, FeatureCreationFailedError, MlflowModelNotFoundError,
+            ModelArtifactsNotAvailableError, MlflowException, RequestsConnectionError,
+            ConnectionError, KeyError, RecursionError) as e:
+        return get_error_response(e)
 
     return jsonify({'prediction': prediction}), status.HTTP_200_OK
+
+
+@inject
+@PREDICT_BP.route('/predict/batch', methods=['POST'])
+def predict_batch(autotim_prediction_service: AutoTiMPredictionService,
+                  prediction_result_cache: PredictionResultCache,
+                  admission_controller: AdmissionController):
+    """
+    Performs classification of time series of multiple use cases within one request.
+    Required: a json manifest (as request body or as json-encoded form parameter 'manifest')
+        with a list of 'groups', each containing:
+            use_case_name (str), dataset_identifier (str),
+            series (list of records) or file (name of an uploaded .csv-, .json-, .parquet-
+            or .arrow-file).
+        Optional per group: model_version (str).
+
+    Groups using the same model are scored together. The response contains one result per
+        group in the order of the manifest, with either its predictions or an error.
+    """
+    groups = read_batch_manifest(request=request)
+    if groups is None:
+        return RESPONSE_400_MANIFEST_WRONG
+
+    try:
+        admission = admission_controller.admit(PREDICT).acquire()
+    except AdmissionRejectedError as e:
+        return get_rejection_response(e)
+
+    with admission:
+        results = []
+        groups_by_model = {}
+        for index, group in enumerate(groups):
+            result = {'use_case_name': group.get('use_case_name'),
+                      'dataset_identifier': group.get('dataset_identifier'),
+                      'model_version': group.get('model_version')}
+            results.append(result)
+
+            if result['use_case_name'] is None or result['dataset_identifier'] is None:
+                result.update(error=RESPONSE_400_NO_REQUIRED_PARAM.get_data(as_text=True),
+                              status=status.HTTP_400_BAD_REQUEST)
+                continue
+            timeseries = read_group_timeseries(group=group, files=request.files,
+                                               allowed_extensions=TIMESERIES_FILE_EXTENSIONS)
+            if timeseries is None:
+                result.update(error=RESPONSE_400_INPUT_FORMAT_WRONG.get_data(as_text=True),
+                              status=status.HTTP_400_BAD_REQUEST)
+                continue
+
+            try:
+                autotim_model = autotim_prediction_service.get_model(
+                    use_case_name=result['use_case_name'],
+                    dataset_identifier=result['dataset_identifier'],
+                    model_version=result['model_version'])
+            except (MlflowModelNotFoundError, ModelArtifactsNotAvailableError, MlflowException,
+                    RequestsConnectionError, ConnectionError) as e:
+                result['error'], result['status'] = get_error_details(e)
+                continue
+            result['model_version'] = autotim_model.model_version
+            groups_by_model.setdefault(autotim_model.mlflow_uri, (autotim_model, []))[1] \
+                .append((index, timeseries))
+
+        for autotim_model, model_groups in groups_by_model.values():
+            predictions, errors = score_frames(
+                frames=[timeseries for _, timeseries in model_groups],
+                column_id=autotim_model.params.get('column_id'),
+                score=get_score_function(autotim_prediction_service=autotim_prediction_service,
+                                         autotim_model=autotim_model,
+                                         prediction_result_cache=prediction_result_cache))
+            for (index, _), prediction, error in zip(model_groups, predictions, errors):
+                if error is None:
+                    results[index]['prediction'] = prediction
+                else:
+                    results[index]['error'], results[index]['status'] = get_error_details(error)
+
+    return jsonify({'results': results,
+                    'failed_groups': sum('error' in result for result in results)}), \
+        status.HTTP_200_OK
+
+
+@inject
+@PREDICT_BP.route('/predict/stream', methods=['POST'])
+def predict_stream(autotim_prediction_service: AutoTiMPredictionService,
+                   admission_controller: AdmissionController):
+    """
+    Performs classification of large inputs in chunks of complete time series and streams
+        the predictions back as newline delimited json, one line per time series:
+        {"id": <series id>, "prediction": <prediction>}.
+    Required parameters: use_case_name (str),
+                         dataset_identifier (str),
+                         file (.csv-, .json-, .parquet- or .arrow-file).
+    Optional parameters: model_version (str),
+                         chunk_size (int, number of time series per chunk).
+
+    Features of the next chunk are created while the current chunk is scored. Errors after
+        the first streamed line are reported as a final line {"error": ..., "status": ...}.
+    """
+    timeseries, error_response = read_predict_request()
+    if error_response is not None:
+        return error_response
+
+    try:
+        # the slot is held until the response has been streamed
+        admission = admission_controller.admit(PREDICT).acquire()
+    except AdmissionRejectedError as e:
+        return get_rejection_response(e)
+
+    try:
+        chunk_size = int(request.values.get('chunk_size',
+                                            os.getenv('PREDICT_STREAM_CHUNK_SIZE', "100")))
+        autotim_model = autotim_prediction_service.get_model(
+            use_case_name=request.values.get('use_case_name'),
+            dataset_identifier=request.values.get('dataset_identifier'),
+            model_version=request.values.get('model_version', None))
+        chunks = iter_series_chunks(dataframe=timeseries,
+                                    column_id=autotim_model.params.get('column_id'),
+                                    chunk_size=max(chunk_size, 1))
+    except ValueError:
+        admission.release()
+        return Response("chunk_size parameter must be an integer", status=400)
+    except (MlflowModelNotFoundError, ModelArtifactsNotAvailableError, MlflowException,
+            RequestsConnectionError, ConnectionError, KeyError) as e:
+        admission.release()
+        return get_error_response(e)
+
+    def featurize(chunk):
+        ids, dataframe = chunk
+        return ids, create_features(dataframe=dataframe,
+                                    settings=autotim_model.feature_settings,
+                                    column_id=autotim_model.params.get('column_id'),
+                                    column_value=autotim_model.params.get('column_value'),
+                                    column_kind=autotim_model.params.get('column_kind'),
+                                    column_sort=autotim_model.params.get('column_sort'))
+
+    def generate():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            chunk = next(chunks, None)
+            pending = executor.submit(featurize, chunk) if chunk is not None else None
+            while pending is not None:
+                try:
+                    ids, features = pending.result()
+                    chunk = next(chunks, None)
+                    pending = executor.submit(featurize, chunk) if chunk is not None else None
+                    predictions = autotim_prediction_service.predict(features=features,
+                                                                     model=autotim_model.model)
+                except Exception as e:  # pylint: disable=broad-except
+                    message, error_status = get_error_details(e)
+                    yield json.dumps({'error': message, 'status': error_status}) + '\n'
+                    return
+                for identifier, prediction in zip(ids, predictions):
+                    # numpy scalars are not json serializable
+                    identifier = identifier.item() if hasattr(identifier, 'item') else identifier
+                    yield json.dumps({'id': identifier, 'prediction': prediction}) + '\n'
+
+    response = Response(generate(), mimetype='application/x-ndjson', status=status.HTTP_200_OK)
+    # also called if the client disconnects before the stream has started
+    response.call_on_close(admission.release)
+    return response
+
+
+@inject
+@PREDICT_BP.route('/predict/stats', methods=['GET'])
+def predict_stats(autotim_prediction_service: AutoTiMPredictionService,
+                  prediction_coalescer: PredictionCoalescer,
+                  prediction_result_cache: PredictionResultCache):
+    """Returns the counters of the prediction service caches and of request batching."""
+    return jsonify({**autotim_prediction_service.cache_stats(),
+                    'results': prediction_result_cache.stats(),
+                    'features': feature_cache_stats(),
+                    'batching': prediction_coalescer.stats()}), status.HTTP_200_OK
+
+
+@inject
+@PREDICT_BP.route('/predict/invalidate', methods=['POST'])
+def predict_invalidate(autotim_prediction_service: AutoTiMPredictionService):
+    """
+    Drops cached stage resolutions, so that the next request without a model_version
+        looks up the Production model in MLFlow again.
+    Optional parameters: use_case_name (str), dataset_identifier (str),
+        if not both are provided, the cached stages of all models are dropped.
+    """
+    autotim_prediction_service.invalidate_stage_cache(
+        use_case_name=request.form.get('use_case_name', None),
+        dataset_identifier=request.form.get('dataset_identifier', None))
+    return jsonify({'invalidated': True}), status.HTTP_200_OK
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+from flask_api import status
+from injector import inject
+
+from autotim.app.admission_control import AdmissionController
+from autotim.training_jobs.job_runner import TrainingJobRunner
+
+
+STATUS_BP = Blueprint('status', __name__)
+
+
+@inject
+@STATUS_BP.route('/status', methods=['GET'])
+def service_status(admission_controller: AdmissionController,
+                   training_job_runner: TrainingJobRunner):
+    """
+    Returns running and queued predictions and the capacity of this worker process, as well
+        as the training jobs per status on this host, e.g. for autoscaling.
+    """
+    return jsonify({'admission': admission_controller.stats(),
+                    'training_jobs': training_job_runner.stats()}), status.HTTP_200_OK
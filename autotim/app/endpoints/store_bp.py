@@ -11,10 +11,14 @@ from autotim.storage_client.file_store_manager import FileStoreManager, \
 from autotim.app.endpoints.utils.reponse_utils import RESPONSE_400_INPUT_FORMAT_WRONG, \
     RESPONSE_400_NO_REQUIRED_PARAM, RESPONSE_500_INTERNAL_SERVER_ERROR
 
-from autotim.app.endpoints.utils.file_handling_utils import get_single_file_input_format
+from autotim.app.endpoints.utils.file_handling_utils import get_single_file_input_format, \
+    file_extension, read_arrow_ipc, ARROW_STREAM_MIMETYPE
 
 STORE_BP = Blueprint('store', __name__)
 
+# csv- and parquet-files are stored as they are, arrow-files are converted to parquet
+STORE_FILE_EXTENSIONS = ['csv', 'parquet', 'arrow', 'feather']
+
 RESPONSE_400_BLOB_ALREADY_EXISTS = Response("Dataset with this name and version already exists. "
                                             "Please choose a new dataset version identifier or "
                                             "remove the existing data from storage.",
@@ -25,27 +29,42 @@ RESPONSE_400_BLOB_ALREADY_EXISTS = Response("Dataset with this name and version
 @STORE_BP.route('/store', methods=['POST'])
 def store(file_client: FileStoreManager):
     """
-    Stores data (only accepts a single .csv-file) in a gcs bucket
+    Stores data (only accepts a single .csv-, .parquet- or .arrow-file) in a gcs bucket
         specified through an environment variable or in gcs_config.py.
-    Required parameters: use_case_name (str), file (.csv-file).
+    Required parameters: use_case_name (str), file (.csv-, .parquet- or .arrow-file).
     Optional parameters: dataset_identifier (str).
+    Alternatively, the data can be sent as request body in the Arrow IPC streaming format
+        (content type application/vnd.apache.arrow.stream) with the parameters in the query string.
 
     Data will be stored under a remote path: <use_case_name> / <dataset_identifier>.
+    Arrow data is stored as .parquet-file.
     """
     # check file input
-    file = get_single_file_input_format(request=request, allowed_extensions=['csv'])
-    if file is None:
+    raw_arrow_body = request.mimetype == ARROW_STREAM_MIMETYPE
+    file = None if raw_arrow_body else \
+        get_single_file_input_format(request=request, allowed_extensions=STORE_FILE_EXTENSIONS)
+    if file is None and not raw_arrow_body:
         return RESPONSE_400_INPUT_FORMAT_WRONG
 
-    use_case_name = request.form.get('use_case_name', None)
+    # request.values also contains the query parameters of raw arrow request bodies
+    use_case_name = request.values.get('use_case_name', None)
     if use_case_name is None:
         return RESPONSE_400_NO_REQUIRED_PARAM
 
     # either a dataset_identifier is provided, else: use timestamp of upload as version
-    dataset_identifier = request.form.get('dataset_identifier') \
-        if request.form.get('dataset_identifier') is not None \
+    dataset_identifier = request.values.get('dataset_identifier') \
+        if request.values.get('dataset_identifier') is not None \
         else datetime.now().strftime("%Y-%b-%d-%H:%M")
 
+    # decode arrow data, so that it can be stored as parquet
+    dataset = None
+    if raw_arrow_body or not (file_extension(path=file.filename, extension='.csv') or
+                              file_extension(path=file.filename, extension='.parquet')):
+        try:
+            dataset = read_arrow_ipc(request.stream if raw_arrow_body else file.stream)
+        except (ValueError, OSError):
+            return RESPONSE_400_INPUT_FORMAT_WRONG
+
     # upload data to gcs bucket
     try:
         # stop upload if dataset_identifier and dataset_identifier combination already in use
@@ -54,8 +73,13 @@ def store(file_client: FileStoreManager):
             return RESPONSE_400_BLOB_ALREADY_EXISTS
 
         with tempfile.TemporaryDirectory() as tdir:
-            temp_path = os.path.join(tdir, file.filename)
-            file.save(temp_path)
+            if dataset is None:
+                temp_path = os.path.join(tdir, file.filename)
+                file.save(temp_path)
+            else:
+                file_name = os.path.splitext(file.filename)[0] if file is not None else 'dataset'
+                temp_path = os.path.join(tdir, file_name + '.parquet')
+                dataset.to_parquet(temp_path, index=False)
             file_client.save_single_file(src=temp_path, dest=dest_blob)
     except (StorageDoesNotExistError, UploadToStorageFailedError):
         return RESPONSE_500_INTERNAL_SERVER_ERROR
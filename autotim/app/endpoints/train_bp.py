@@ -1,67 +1,62 @@
-import os
-from flask import Blueprint, request
+from functools import partial
+
+from flask import Blueprint, request, jsonify, url_for
 from injector import inject
 from flask_api import status
 
-from autotim.app.endpoints.utils.model_creation_utils import train
-from autotim.storage_client.file_store_manager import FileStoreManager
+from autotim.app.admission_control import AdmissionRejectedError
+from autotim.app.endpoints.utils.reponse_utils import get_rejection_response
+from autotim.model_training.training_config import TrainingConfig
+from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+from autotim.training_jobs.job_runner import TrainingJobRunner
 
 
 TRAIN_BP = Blueprint('train', __name__)
 
 @inject
-@TRAIN_BP.route('/train', methods=['GET'])
-def training(file_client: FileStoreManager):
-    """Start training."""
+@TRAIN_BP.route('/train', methods=['GET', 'POST'])
+def training(training_job_runner: TrainingJobRunner,
+             autotim_prediction_service: AutoTiMPredictionService):
+    """
+    Submit a training job, returns its job id with status 202 right away. If
+        TRAIN_MAX_CONCURRENT trainings are running and TRAIN_MAX_QUEUE jobs are queued,
+        the job is rejected with status 429 and a Retry-After header.
+    Once the job has completed, the resolved Production stage of the use case is dropped.
+    """
     if "use_case_name" not in request.args \
             or "dataset_identifier" not in request.args:
         return "Request does not contain a use case name and/or dataset identifier.", \
                status.HTTP_404_NOT_FOUND
 
-    train_size = "0.6"
-    if "train_size" in request.args:
-        if float(request.args["train_size"]) < 0 or float(request.args["train_size"]) > 1:
-            return "train_size parameter must be float between 0.0 and 1.0", \
-                   status.HTTP_400_BAD_REQUEST
-        train_size = request.args["train_size"]
+    try:
+        config = TrainingConfig.from_params(request.args)
+    except ValueError as e:
+        return str(e), status.HTTP_400_BAD_REQUEST
 
     name = request.args["use_case_name"]
     identifier = request.args["dataset_identifier"]
 
-    evaluation_identifier = request.args.get("evaluation_identifier", None)
-
-    column_label = request.args.get("column_label", "label")
-    os.environ["COLUMN_LABEL"] = column_label
-
-    column_id = request.args.get("column_id", "id")
-    os.environ["COLUMN_ID"] = column_id
-
-    column_sort = request.args.get("column_sort", "time")
-    os.environ["COLUMN_SORT"] = column_sort
-
-    column_value = request.args.get("column_value", "")
-    os.environ["COLUMN_VALUE"] = column_value
-
-    column_kind = request.args.get("column_kind", "")
-    os.environ["COLUMN_KIND"] = column_kind
+    try:
+        job_id = training_job_runner.submit(
+            use_case_name=name, dataset_identifier=identifier, config=config,
+            on_completed=partial(autotim_prediction_service.invalidate_stage_cache,
+                                 use_case_name=name, dataset_identifier=identifier))
+    except AdmissionRejectedError as e:
+        return get_rejection_response(e)
 
-    recall_average = request.args.get("recall_average", "micro")
-    os.environ["RECALL_AVERAGE"] = recall_average
+    status_url = url_for('train.training_job', job_id=job_id)
+    return jsonify({'training': "queued", 'job_id': job_id, 'status_url': status_url}), \
+        status.HTTP_202_ACCEPTED, {'Location': status_url}
 
-    metric = request.args.get("metric", "accuracy")
-    os.environ["METRIC"] = metric
 
-    max_features = request.args.get("max_features", "1000")
-    os.environ["MAX_FEATURES"] = max_features
-
-    features_decrement = request.args.get("features_decrement", "0.9")
-    os.environ["FEATURES_DECREMENT"] = features_decrement
-
-    train_time = request.args.get("train_time", "dynamic")
-    os.environ["TRAIN_TIME"] = train_time
-
-    max_attempts = request.args.get("max_attempts", "5")
-
-    return train(name=name, identifier=identifier, train_size=float(train_size),
-                 file_client=file_client, max_attempts=max_attempts,
-                 evaluation_identifier=evaluation_identifier)
+@inject
+@TRAIN_BP.route('/train/<job_id>', methods=['GET'])
+def training_job(job_id: str, training_job_runner: TrainingJobRunner):
+    """
+    Returns the status (queued, running, completed or failed), the current stage and,
+        once finished, the result of a training job.
+    """
+    job = training_job_runner.get(job_id)
+    if job is None:
+        return f"Training job '{job_id}' does not exist.", status.HTTP_404_NOT_FOUND
+    return jsonify(job), status.HTTP_200_OK
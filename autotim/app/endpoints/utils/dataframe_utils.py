@@ -1,5 +1,57 @@
-def convert_h2oframe_to_numeric(h2o_frame, training_columns):
-    """Generate numeric h20 frame."""
-    for column in training_columns:
-        h2o_frame[column] = h2o_frame[column].asnumeric()
-    return h2o_frame
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def iter_series_chunks(dataframe, column_id: str, chunk_size: int):
+    """
+    Splits a dataframe into chunks of complete time series.
+
+    :param dataframe: pandas.DataFrame with one or more time series
+    :param column_id: name of the column with time series identifiers
+    :param chunk_size: maximum number of time series per chunk
+    :return: generator of (sorted list of series ids, pandas.DataFrame containing their rows)
+    """
+    positions_by_id = dataframe.groupby(column_id, sort=True).indices
+    ids = list(positions_by_id)
+
+    def chunk(chunk_ids):
+        positions = np.sort(np.concatenate([positions_by_id[identifier]
+                                            for identifier in chunk_ids]))
+        return chunk_ids, dataframe.iloc[positions]
+
+    # grouping is done right away, so that a missing id column raises before iterating
+    return (chunk(ids[start:start + chunk_size]) for start in range(0, len(ids), chunk_size))
+
+
+def hash_settings(settings) -> str:
+    """Returns a stable hash of feature extraction settings (or any json serializable object)."""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode('utf-8')) \
+        .hexdigest()
+
+
+def hash_series_by_id(dataframe, column_id: str, column_sort: str = None) -> dict:
+    """
+    Computes a content hash for each time series in a dataframe. The hash covers the column
+        names and values of a series, but not its id, so that equal series get equal hashes.
+
+    :param dataframe: pandas.DataFrame with one or more time series
+    :param column_id: name of the column with time series identifiers
+    :param column_sort: name of the column to order the rows of a series by, if it exists
+    :return: dict of series id to hash, ordered by series id
+    """
+    columns = sorted(column for column in dataframe.columns if column != column_id)
+    frame = dataframe[[column_id] + columns]
+    if column_sort in columns:
+        frame = frame.sort_values([column_id, column_sort], kind='mergesort')
+    row_hashes = pd.util.hash_pandas_object(frame[columns], index=False).values
+    header = json.dumps(columns, default=str).encode('utf-8')
+
+    hashes = {}
+    for identifier, positions in frame.groupby(column_id, sort=True).indices.items():
+        digest = hashlib.blake2b(header, digest_size=16)
+        digest.update(row_hashes[positions].tobytes())
+        hashes[identifier] = digest.hexdigest()
+    return hashes
@@ -1,6 +1,12 @@
 import os
+import json
 
 import pandas as pd
+import pyarrow as pa
+
+# media type of raw request bodies in the Apache Arrow IPC streaming format
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+TIMESERIES_FILE_EXTENSIONS = ['csv', 'json', 'parquet', 'arrow', 'feather']
 
 def file_extension(path: str, extension: str) -> bool:
     # Split the extension from the path and normalise it to lowercase.
@@ -21,12 +27,87 @@ def get_single_file_input_format(request, allowed_extensions):
         return file
     return None
 
+def read_arrow_ipc(source) -> pd.DataFrame:
+    """
+    Reads data in the Apache Arrow IPC file (.arrow, .feather v2) or streaming format.
+    Columns are handed over to pandas without copying where the data types allow it.
+    """
+    buffer = pa.py_buffer(source.read())
+    try:
+        table = pa.ipc.open_file(buffer).read_all()
+    except pa.ArrowInvalid:
+        table = pa.ipc.open_stream(buffer).read_all()
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
 def read_timeseries_from_file(file):
     try:
         if file_extension(path=file.filename, extension='.csv'):
             timeseries = pd.read_csv(file)
         elif file_extension(path=file.filename, extension='.json'):
             timeseries = pd.read_json(file)
-    except (AttributeError, ValueError):
+        elif file_extension(path=file.filename, extension='.parquet'):
+            timeseries = pd.read_parquet(file.stream)
+        elif file_extension(path=file.filename, extension='.arrow') or \
+                file_extension(path=file.filename, extension='.feather'):
+            timeseries = read_arrow_ipc(file.stream)
+    except (AttributeError, ValueError, OSError):
+        # pyarrow.ArrowInvalid is a ValueError, pyarrow.ArrowIOError an OSError
         timeseries = None
     return timeseries
+
+
+def read_timeseries_from_request(request, allowed_extensions=None):
+    """
+    Reads time series either from a raw request body in the Arrow IPC streaming format
+        or from a single uploaded file.
+    """
+    if request.mimetype == ARROW_STREAM_MIMETYPE:
+        try:
+            return read_arrow_ipc(request.stream)
+        except (ValueError, OSError):
+            return None
+    return read_timeseries_from_file(file=get_single_file_input_format(
+        request=request,
+        allowed_extensions=allowed_extensions if allowed_extensions is not None
+        else TIMESERIES_FILE_EXTENSIONS))
+
+
+def read_batch_manifest(request):
+    """
+    Reads the list of groups of a batch prediction request, either from a json body
+        or from a json-encoded 'manifest' form parameter (if the series are uploaded as files).
+    Returns None if the manifest is missing or malformed.
+    """
+    try:
+        manifest = request.get_json(silent=True) if request.is_json \
+            else json.loads(request.form.get('manifest', 'null'))
+    except ValueError:
+        return None
+    groups = manifest.get('groups') if isinstance(manifest, dict) else None
+    if not isinstance(groups, list) or len(groups) == 0 or \
+            not all(isinstance(group, dict) for group in groups):
+        return None
+    return groups
+
+
+def read_group_timeseries(group: dict, files, allowed_extensions):
+    """
+    Reads the time series of a batch prediction group: either given as a list of records
+        in 'series' or as the name of an uploaded file in 'file'.
+    """
+    if 'file' in group:
+        file = files.get(group['file'])
+        if file is None or not allowed_file(filename=file.filename,
+                                            allowed_extensions=allowed_extensions):
+            return None
+        file.seek(0)
+        return read_timeseries_from_file(file)
+
+    series = group.get('series')
+    if not isinstance(series, list) or len(series) == 0:
+        return None
+    try:
+        return pd.DataFrame.from_records(series)
+    except (TypeError, ValueError):
+        return None
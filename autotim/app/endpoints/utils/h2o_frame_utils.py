@@ -0,0 +1,66 @@
+"""Transfer of data between pandas and the h2o cluster."""
+import os
+import math
+import tempfile
+
+import pandas as pd
+import h2o
+from h2o.exceptions import H2OValueError
+
+
+def upload_frame(dataframe: pd.DataFrame, column_types: dict = None) -> h2o.H2OFrame:
+    """
+    Uploads a pandas.DataFrame to h2o as a single csv parse with explicit column types.
+
+    The csv is written with placeholder column names, so that h2o never has to guess whether
+    the first row (tsfresh feature names contain quotes and commas) is a header, and the
+    real names are set afterwards in one operation.
+
+    :param dataframe: pandas.DataFrame to upload, its index is not uploaded
+    :param column_types: h2o column type (e.g. "enum") by column name, other columns are
+        uploaded as "real"
+    :return: h2o.H2OFrame with the columns and column names of dataframe
+    """
+    if dataframe.shape[0] == 0 or dataframe.shape[1] == 0:
+        raise H2OValueError("No data to write")
+    names = [str(column) for column in dataframe.columns]
+    types = [(column_types or {}).get(name, 'real') for name in names]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'frame.csv')
+        dataframe.to_csv(path, index=False, header=[f'C{i + 1}' for i in range(len(names))])
+        frame = h2o.upload_file(path, header=1, sep=',', col_types=types)
+    return frame.set_names(names)
+
+
+def decode_frame_column(column: dict) -> list:
+    """
+    Converts a column of the /3/Frames REST response into a list: NaN/missing values become
+    None and categorical values are taken from the column's domain, numeric labels as numbers.
+    """
+    if column.get('string_data'):
+        return column['string_data']
+
+    values = [None if value is None or value == 'NaN' or
+              (isinstance(value, float) and math.isnan(value)) else value
+              for value in column['data']]
+    if column['type'] != 'enum':
+        return values
+
+    try:
+        domain = pd.to_numeric(pd.Series(column['domain'])).tolist()
+    except ValueError:
+        domain = column['domain']
+    return [None if value is None else domain[int(value)] for value in values]
+
+
+def download_column(frame: h2o.H2OFrame, column: str) -> list:
+    """
+    Downloads a single column of an h2o frame (e.g. 'predict' of a prediction frame) as a list,
+    instead of exporting the whole frame as csv and parsing it with pandas.
+    """
+    response = h2o.api(f"GET /3/Frames/{frame.frame_id}",
+                       data={'row_count': frame.nrows, 'row_offset': 0,
+                             'column_offset': frame.names.index(column), 'column_count': 1,
+                             'full_column_count': 1})
+    return decode_frame_column(response['frames'][0]['columns'][0])
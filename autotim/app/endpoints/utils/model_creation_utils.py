@@ -1,27 +1,28 @@
 import os
 
 import logging
-from pathlib import Path
 import glob
-import shutil
+import tempfile
 
 import numpy as np
 import pandas as pd
 
-from flask import jsonify
 from flask_api import status
 
 from h2o.exceptions import H2OError, H2OServerError
+from pyarrow import ArrowInvalid
 from mlflow.exceptions import MlflowException
 
 from autotim.feature_engineering.automated_feature_engineering import create_features, \
-    select_relevant_features
+    select_relevant_features, rank_features
 from autotim.feature_engineering.exceptions import FeatureCreationFailedError , \
     DataSplitError
 
 from autotim.model_training.autotim_training import AutoTiMTrainer
+from autotim.model_training.training_config import TrainingConfig
 from autotim.storage_client.file_store_manager import FileStoreManager, \
     DownloadFromStorageFailedError, StorageDoesNotExistError
+from autotim.storage_client.dataset_cache import DatasetCache
 
 from autotim.model_selection.model_selection import ModelSelector
 from autotim.model_selection.exceptions import ModelSelectionFailed, \
@@ -41,62 +42,67 @@ def merge_response_dict(versions, warning: str):
     return response
 
 
-def get_labels(dataframe: pd.DataFrame):
+def get_labels(dataframe: pd.DataFrame, config: TrainingConfig):
     """
     Extracts unique label for each timeseries in a given dataframe.
     :param dataframe: dataset with the uniquely identifiable timeseries
     :returns: series containing one label per timeseries
     """
-    ids = dataframe[os.getenv("COLUMN_ID")].unique()
+    ids = dataframe[config.column_id].unique()
     labels = []
     for identifier in ids:
-        label = dataframe.loc[dataframe[os.getenv("COLUMN_ID")] == identifier] \
-            .iloc[0][os.getenv("COLUMN_LABEL")]
+        label = dataframe.loc[dataframe[config.column_id] == identifier] \
+            .iloc[0][config.column_label]
         labels.append(label)
     return pd.Series(data=labels, index=ids)
 
 
-def train_test_split(dataframe: pd.DataFrame, train_size):
+def train_test_split(dataframe: pd.DataFrame, config: TrainingConfig):
     """Splits dataframe into train and test subset"""
 
-    ids = dataframe[os.getenv("COLUMN_ID")].unique()
+    ids = dataframe[config.column_id].unique()
     np.random.shuffle(ids)
-    train_ids = list(ids[:int(len(ids) * train_size)])
-    train_df = dataframe[dataframe[os.getenv("COLUMN_ID")].isin(train_ids)]
-    test_df = dataframe[~dataframe[os.getenv("COLUMN_ID")].isin(train_ids)]
-
-    X_train = train_df.drop(columns=[os.getenv("COLUMN_LABEL")])
-    y_train = get_labels(train_df)
-    X_test = test_df.drop(columns=[os.getenv("COLUMN_LABEL")])
-    y_test = get_labels(test_df)
+    train_ids = list(ids[:int(len(ids) * config.train_size)])
+    train_df = dataframe[dataframe[config.column_id].isin(train_ids)]
+    test_df = dataframe[~dataframe[config.column_id].isin(train_ids)]
+
+    X_train = train_df.drop(columns=[config.column_label])
+    y_train = get_labels(train_df, config)
+    X_test = test_df.drop(columns=[config.column_label])
+    y_test = get_labels(test_df, config)
     return X_train, y_train, X_test, y_test
 
 
 def download_and_check_dataset(use_case_name: str, data_folder: str, bucket_dir: str,
-                               client: FileStoreManager):
+                               client: FileStoreManager, *, config: TrainingConfig,
+                               dataset_cache: DatasetCache = None):
     dataset = None
     response = 'ok', status.HTTP_200_OK
     logging.debug(f"Downloading {bucket_dir} ...")
 
     try:
-        client.download_dir(output_path=data_folder, prefix=bucket_dir)
-        csv_files = glob.glob(
-            os.path.join(data_folder, bucket_dir, '*.csv'))
+        if dataset_cache is not None:
+            dataset_cache.fetch(file_client=client, prefix=bucket_dir, output_path=data_folder)
+        else:
+            client.download_dir(output_path=data_folder, prefix=bucket_dir)
+        dataset_files = glob.glob(os.path.join(data_folder, bucket_dir, '*.csv')) + \
+            glob.glob(os.path.join(data_folder, bucket_dir, '*.parquet'))
 
-        if len(csv_files) > 1:
-            response = f"Your dataset directory '{bucket_dir}' contains multiple csv files " \
-                       "that can be used for training your model." \
+        if len(dataset_files) > 1:
+            response = f"Your dataset directory '{bucket_dir}' contains multiple csv or parquet " \
+                       "files that can be used for training your model." \
                        "This is an unexpected behavior. " \
-                       "Please reduce the number of csv files in this directory to one. " \
+                       "Please reduce the number of dataset files in this directory to one. " \
                        "If you wish to store multiple datasets for your use case, please create" \
-                       f"a new subdirectory in '{use_case_name}/' for each csv file or use our " \
-                       f"/store-endpoint.", status.HTTP_406_NOT_ACCEPTABLE
+                       f"a new subdirectory in '{use_case_name}/' for each dataset file or use " \
+                       f"our /store-endpoint.", status.HTTP_406_NOT_ACCEPTABLE
         else:
-            dataset = pd.read_csv(csv_files[0])
+            dataset = pd.read_parquet(dataset_files[0]) \
+                if dataset_files[0].endswith('.parquet') else pd.read_csv(dataset_files[0])
 
-            for key in ['COLUMN_ID', 'COLUMN_LABEL', 'COLUMN_VALUE', 'COLUMN_KIND']:
-                if os.getenv(key, "") != "" and not os.getenv(key) in dataset.columns:
-                    response = f"Dataset does not contain the column '{os.getenv(key)}' " \
+            for key, column in config.dataset_columns.items():
+                if column not in dataset.columns:
+                    response = f"Dataset does not contain the column '{column}' " \
                                f"that was set as {key}", status.HTTP_406_NOT_ACCEPTABLE
     except StorageDoesNotExistError as e:
         response = "There has been an error connecting to storage: " + str(e), \
@@ -104,8 +110,8 @@ def download_and_check_dataset(use_case_name: str, data_folder: str, bucket_dir:
     except (DownloadFromStorageFailedError, FileNotFoundError) as e:
         response = "Could not load your requested dataset. Did you upload it already? " + \
                    str(e), status.HTTP_404_NOT_FOUND
-    except (UnicodeDecodeError, pd.errors.ParserError, MemoryError) as e:
-        response = "Could not read your dataset with pandas.read_csv: " + str(e), \
+    except (UnicodeDecodeError, pd.errors.ParserError, ArrowInvalid, MemoryError) as e:
+        response = "Could not read your dataset with pandas: " + str(e), \
                    status.HTTP_406_NOT_ACCEPTABLE
     except AttributeError:
         response = "Dataset was not loaded correctly. Cannot proceed with training", \
@@ -114,23 +120,21 @@ def download_and_check_dataset(use_case_name: str, data_folder: str, bucket_dir:
     return dataset, response
 
 
-def extract_features(x_train, y_train):
+def extract_features(x_train, y_train, config: TrainingConfig):
     logging.debug("Extracting features for training ...")
     features_train = create_features(
-        x_train, y_train, column_id=os.getenv(
-            'COLUMN_ID'),
-        column_value=os.getenv('COLUMN_VALUE') if os.getenv(
-            'COLUMN_VALUE') != "" else None,
-        column_kind=os.getenv('COLUMN_KIND') if os.getenv(
-            'COLUMN_KIND') != "" else None
+        x_train, y_train, column_id=config.column_id,
+        column_value=config.column_value,
+        column_kind=config.column_kind
     )
     return features_train
 
 
-def train_model(name, identifier, features_train, y_train):
+def train_model(name, identifier, features_train, y_train, config: TrainingConfig):
     experiment_name = f"{name}-{identifier}"
     trainer = AutoTiMTrainer(experiment_name=experiment_name,
-                            model_name=f"{experiment_name}_model")
+                            model_name=f"{experiment_name}_model",
+                            config=config, use_case_name=name)
     model_version = trainer.train(features_train, y_train)
     logging.info(f"Best {experiment_name} model has been logged as version: "
                  f"{str(model_version)}")
@@ -138,9 +142,10 @@ def train_model(name, identifier, features_train, y_train):
     return experiment_name, model_version
 
 
-def select_model(name, identifier, model_version, experiment_name, X_test, y_test):
+def select_model(name, identifier, model_version, experiment_name, *, X_test, y_test,
+                 config: TrainingConfig):
     old_metric, warning = None, ''
-    new_metric = os.getenv('METRIC')
+    new_metric = config.metric
 
     model_selector = ModelSelector(name=name, identifier=identifier,
                                    latest_model_version=model_version)
@@ -151,90 +156,126 @@ def select_model(name, identifier, model_version, experiment_name, X_test, y_tes
                   f"Production."
     logging.debug("Updating production flag...")
     model_selector.update_production_flag(
-        x_test=X_test, y_test=y_test, metric=new_metric)
+        x_test=X_test, y_test=y_test, metric=new_metric, recall_average=config.recall_average)
     logging.debug("Checking if metric has changed...")
     old_metric = model_selector.metric_has_changed(
         metric=new_metric)
     return old_metric, new_metric, warning
 
 
-def dataset_split(name, data_folder, file_client, evaluation_identifier, dataset, train_size):
-    if evaluation_identifier is not None:
+def dataset_split(name, data_folder, file_client, dataset, *, config: TrainingConfig,
+                  dataset_cache: DatasetCache = None):
+    if config.evaluation_identifier is not None:
         eval_data, eval_res = download_and_check_dataset(use_case_name=name,
                                                          data_folder=data_folder,
                                                          client=file_client,
                                                          bucket_dir=f"{name}/"
-                                                                    f"{evaluation_identifier}/")
+                                                         f"{config.evaluation_identifier}/",
+                                                         config=config,
+                                                         dataset_cache=dataset_cache)
         if eval_res[1] != status.HTTP_200_OK or eval_data is None:
             raise DataSplitError(message=eval_res[0],status=eval_res[1])
 
         logging.debug("Train/Test Split ...")
         # pylint: disable=no-member
-        x_train = dataset.drop(columns=[os.getenv("COLUMN_LABEL")])
-        y_train = get_labels(dataset)
-        x_test = eval_data.drop(columns=[os.getenv("COLUMN_LABEL")])
-        y_test = get_labels(eval_data)
+        x_train = dataset.drop(columns=[config.column_label])
+        y_train = get_labels(dataset, config)
+        x_test = eval_data.drop(columns=[config.column_label])
+        y_test = get_labels(eval_data, config)
         # pylint: enable=no-member
     else:
         logging.debug("Train/Test Split ...")
-        x_train, y_train, x_test, y_test = train_test_split(dataset, train_size=train_size)
+        x_train, y_train, x_test, y_test = train_test_split(dataset, config)
 
     return x_train, x_test, y_train, y_test
 
 
-def train(name: str, identifier: str, file_client: FileStoreManager, train_size,
-          max_attempts, evaluation_identifier=None):
-    """Run training for the given use case."""
-    data_folder = os.path.join(str(Path(__file__).parent.parent), 'data')
+def train(name: str, identifier: str, file_client: FileStoreManager, *,
+          config: TrainingConfig = TrainingConfig(), on_stage=None,
+          dataset_cache: DatasetCache = None):
+    """
+    Run training for the given use case. Each training downloads its dataset into its own
+    workspace directory (in TRAINING_WORKSPACE_DIR), which is removed afterwards.
+
+    :param config: parameters of the training
+    :param on_stage: optional callback, called with the name of each stage when it starts
+    :param dataset_cache: optional cache, dataset files that did not change are not downloaded
+    :return: response dict and http status
+    """
+    with tempfile.TemporaryDirectory(prefix='autotim-training-',
+                                     dir=os.getenv('TRAINING_WORKSPACE_DIR') or None) \
+            as data_folder:
+        return train_in_workspace(name=name, identifier=identifier, file_client=file_client,
+                                  data_folder=data_folder, config=config,
+                                  on_stage=on_stage or (lambda stage: None),
+                                  dataset_cache=dataset_cache)
+
+
+def train_in_workspace(name: str, identifier: str, file_client: FileStoreManager,
+                       data_folder: str, *, config: TrainingConfig, on_stage,
+                       dataset_cache: DatasetCache = None):
+    on_stage("downloading dataset")
     dataset, dataset_response = download_and_check_dataset(
         use_case_name=name,
         data_folder=data_folder,
         client=file_client,
-        bucket_dir=f"{name}/{identifier}/")
+        bucket_dir=f"{name}/{identifier}/",
+        config=config,
+        dataset_cache=dataset_cache)
 
     if dataset_response[1] != status.HTTP_200_OK:
-        return jsonify({'training': "failed",
-                        'error': dataset_response[0]}), dataset_response[1]
+        return {'training': "failed",
+                'error': dataset_response[0]}, dataset_response[1]
 
+    on_stage("splitting dataset")
     try:
         x_train, x_test, y_train, y_test = \
             dataset_split(name=name, data_folder=data_folder, file_client=file_client,
-                        evaluation_identifier=evaluation_identifier,
-                        dataset=dataset, train_size=train_size)
+                          dataset=dataset, config=config, dataset_cache=dataset_cache)
     except DataSplitError as e:
-        return jsonify({'training': "failed",
-                            'error': e.message}), e.status
+        return {'training': "failed",
+                'error': e.message}, e.status
 
     # Extract Features
+    on_stage("extracting features")
     try:
-        features_train = extract_features(x_train, y_train)
+        features_train = extract_features(x_train, y_train, config)
     except FeatureCreationFailedError as e:
-        return jsonify({'training': "failed",
-                        'error': e.message}), status.HTTP_406_NOT_ACCEPTABLE
+        return {'training': "failed",
+                'error': e.message}, status.HTTP_406_NOT_ACCEPTABLE
+    # ranked once, each attempt keeps fewer of the most relevant features
+    ranking = rank_features(features_train, y_train)
 
     warning = ''
     old_metric, new_metric = '', ''
-    for attempt_model_creation in range(int(max_attempts)):
+    for attempt_model_creation in range(config.max_attempts):
 
         features_train = select_relevant_features(features=features_train,
                                                   target_vector=y_train,
                                                   features_decrement_count=
-                                                  attempt_model_creation)
+                                                  attempt_model_creation,
+                                                  max_features=config.max_features,
+                                                  features_decrement=
+                                                  config.features_decrement,
+                                                  ranking=ranking)
 
         # Train Model
+        on_stage(f"training (attempt {attempt_model_creation + 1} of {config.max_attempts})")
         try:
             experiment_name, model_version = train_model(
-                name, identifier, features_train, y_train)
+                name, identifier, features_train, y_train, config)
         except (H2OError, MlflowException) as e:
             logging.error(e)
-            return jsonify({'training': "failed",
-                            'error': "Internal error during training occurred."}), \
+            return {'training': "failed",
+                    'error': "Internal error during training occurred."}, \
                 status.HTTP_500_INTERNAL_SERVER_ERROR
 
         # Predict
+        on_stage("selecting model")
         try:
             old_metric, new_metric, warning = select_model(
-                name, identifier, model_version, experiment_name, x_test, y_test)
+                name, identifier, model_version, experiment_name, X_test=x_test, y_test=y_test,
+                config=config)
             break
         except (ModelSelectionFailed, MlflowExperimentNotFoundError) as e:
             logging.error(e)
@@ -249,21 +290,17 @@ def train(name: str, identifier: str, file_client: FileStoreManager, train_size,
                 "please check this manually in the MlFlow database."
         except RecursionError as e:
             logging.error(e)
-            if attempt_model_creation == int(max_attempts) - 1:
-                return jsonify({'training': "failed",
-                                'error': "Internal error during training occurred." +
-                                "Please define the paramater max_attempts " +
-                                "from default '5' to an higer number " +
-                                "in your request. For more information " +
-                                "have a look into the README.md"}), \
+            if attempt_model_creation == config.max_attempts - 1:
+                return {'training': "failed",
+                        'error': "Internal error during training occurred." +
+                        "Please define the paramater max_attempts " +
+                        "from default '5' to an higer number " +
+                        "in your request. For more information " +
+                        "have a look into the README.md"}, \
                     status.HTTP_500_INTERNAL_SERVER_ERROR
             logging.warning(
                 "Too many features for model prediction. Retrain model with less features")
 
-    # Clear data folder
-    if os.path.exists(data_folder):
-        shutil.rmtree(data_folder)
-
     if old_metric != "" and new_metric != "" and old_metric is not None and new_metric is not None \
             and old_metric != new_metric:
         warning = f"The chosen metric has changed from {str(old_metric)} to " \
@@ -271,5 +308,4 @@ def train(name: str, identifier: str, file_client: FileStoreManager, train_size,
                   f"is not encouraged. To guarantee that the desired model is set to " \
                   f"production, please do so manually."
 
-    return jsonify(merge_response_dict(versions=model_version,
-                                       warning=warning)), status.HTTP_200_OK
+    return merge_response_dict(versions=model_version, warning=warning), status.HTTP_200_OK
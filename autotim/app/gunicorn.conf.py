@@ -0,0 +1,50 @@
+"""
+Gunicorn settings of the AutoTiM service (gunicorn -c autotim/app/gunicorn.conf.py ...).
+
+Each worker process holds its own model cache and h2o connection, concurrent requests are
+served by threads (gthread, default) or greenlets (gevent) sharing these within a process.
+If SCORING_SIDECAR_SOCKET is set, a single scoring sidecar holding the models for all workers
+is started alongside them instead.
+"""
+import os
+import sys
+import subprocess
+
+bind = os.getenv('GUNICORN_BIND', "0.0.0.0:5004")
+# gthread or gevent, sync handles one request per worker process at a time
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', "gthread")
+workers = int(os.getenv('GUNICORN_WORKERS', "2"))
+# threads per worker process (gthread)
+threads = int(os.getenv('GUNICORN_THREADS', "8"))
+# simultaneous connections per worker process (gevent)
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', "100"))
+# import the app (mlflow, h2o, tsfresh, ...) once in the master process, the workers fork
+# from it and share these modules instead of importing them again. gevent has to patch the
+# standard library before anything else is imported, so the app is loaded per worker there
+preload_app = os.getenv('GUNICORN_PRELOAD_APP',
+                        "false" if worker_class == 'gevent' else "true").lower() == 'true'
+# seconds a worker may not respond before it is restarted, trainings run in their own
+# processes (autotim/training_jobs) and do not block workers
+timeout = int(os.getenv('GUNICORN_TIMEOUT', "120"))
+enable_stdio_inheritance = True
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', "debug")
+
+
+# Unix socket of the scoring sidecar, unset: every worker loads and scores models itself
+sidecar_socket = os.getenv('SCORING_SIDECAR_SOCKET', "")
+_sidecar = None
+
+
+def on_starting(server):
+    global _sidecar  # pylint: disable=global-statement
+    if sidecar_socket:
+        server.log.info(f"Starting scoring sidecar on {sidecar_socket}")
+        _sidecar = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, '-m', 'autotim.prediction_service.scoring_sidecar'])
+
+
+def on_exit(server):
+    if _sidecar is not None:
+        server.log.info("Stopping scoring sidecar")
+        _sidecar.terminate()
+        _sidecar.wait()
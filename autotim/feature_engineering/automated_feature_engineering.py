@@ -1,46 +1,154 @@
 """Automatically extract relevant features. """
 import os
 
+import pandas as pd
 from tsfresh import extract_features, extract_relevant_features
+from tsfresh.feature_extraction.settings import from_columns
 from tsfresh.feature_selection.relevance import calculate_relevance_table
 from tsfresh.utilities.dataframe_functions import impute
 
-import h2o
 from h2o.exceptions import H2OResponseError
 
 from autotim.feature_engineering.exceptions import FeatureCreationFailedError
+from autotim.feature_engineering.extraction_policy import count_series, \
+    get_execution_settings, get_n_jobs
+from autotim.feature_engineering.feature_compiler import compile_settings
 from autotim.feature_engineering.data_imputation import imputation_test_time, \
     imputation_train_time
+from autotim.app.endpoints.utils.dataframe_utils import hash_series_by_id, hash_settings
+from autotim.prediction_service.lru_cache import LRUCache
+
+
+# feature vectors of the most recently seen time series at prediction time, 0 = disabled
+FEATURE_CACHE = LRUCache(capacity=int(os.getenv('FEATURE_CACHE_SIZE', "0"))) \
+    if int(os.getenv('FEATURE_CACHE_SIZE', "0")) > 0 else None
+
+
+# 'tsfresh' or 'compiled' (vectorized evaluation of the settings, see feature_compiler)
+FEATURE_EVALUATOR = os.getenv('FEATURE_EVALUATOR', "tsfresh").lower()
+
+
+def feature_cache_stats() -> dict:
+    return FEATURE_CACHE.stats() if FEATURE_CACHE is not None else {'enabled': False}
+
+
+def evaluate_settings(data, column_id=None, column_value=None, column_kind=None, settings=None):
+    """Calculates the features given by settings with FEATURE_EVALUATOR."""
+    if FEATURE_EVALUATOR == 'compiled' and settings:
+        return compile_settings(settings).evaluate(data, column_id=column_id,
+                                                   column_value=column_value,
+                                                   column_kind=column_kind)
+    return extract_features(data, column_id=column_id, column_value=column_value,
+                            column_kind=column_kind, kind_to_fc_parameters=settings,
+                            **get_execution_settings(count_series(data, column_id)))
+
+
+def extract_features_from_settings(data, column_id=None, column_value=None, column_kind=None,
+                                   settings=None):
+    """
+    Extracts the features given by settings for each time series, without imputation.
+    Feature vectors of series that have been seen before with the same settings are taken
+        from FEATURE_CACHE, only the remaining series are passed to tsfresh.
+    """
+    if FEATURE_CACHE is None:
+        return evaluate_settings(data, column_id=column_id, column_value=column_value,
+                                 column_kind=column_kind, settings=settings)
+
+    # same errors as raised by tsfresh for missing ids or empty data
+    if column_id not in data.columns:
+        raise ValueError(f"Column '{column_id}' not found in the input data.")
+    settings_hash = hash_settings(settings)
+    series_hashes = hash_series_by_id(dataframe=data, column_id=column_id)
+    if len(series_hashes) == 0:
+        raise ValueError("The input data does not contain any time series.")
+    rows, missing_ids = {}, []
+    for identifier, series_hash in series_hashes.items():
+        row = FEATURE_CACHE.get((settings_hash, series_hash))
+        if row is None:
+            missing_ids.append(identifier)
+        else:
+            rows[identifier] = row
+
+    if missing_ids:
+        extracted = evaluate_settings(data[data[column_id].isin(missing_ids)],
+                                      column_id=column_id, column_value=column_value,
+                                      column_kind=column_kind, settings=settings)
+        for identifier, row in extracted.reindex(missing_ids).iterrows():
+            rows[identifier] = row
+            FEATURE_CACHE.put((settings_hash, series_hashes[identifier]), row)
+
+    features = pd.DataFrame([rows[identifier] for identifier in series_hashes],
+                            index=list(series_hashes))
+    return features.reindex(columns=sorted(features.columns))
 
 
 def load_features_from_settings(data, column_id=None, column_value=None, column_kind=None,
                                 settings=None):
-    """Load features."""
-    features = extract_features(data, column_id=column_id,
-                                column_value=column_value,
-                                column_kind=column_kind,
-                                kind_to_fc_parameters=settings,
-                                impute_function=impute)
-    features = h2o.H2OFrame(features)
-    #check if header of pd.DataFrame was converted to H2OFrame, then remove
-    if len(features) == len(set(data[column_id].unique()))+1:
-        features = features.drop([0], axis=0)
-
-    return features
+    """Load the features given by settings as imputed pandas.DataFrame."""
+    features = extract_features_from_settings(data, column_id=column_id,
+                                              column_value=column_value,
+                                              column_kind=column_kind,
+                                              settings=settings)
+    return impute(features)
+
+def merge_settings(settings_list) -> dict:
+    """
+    Returns the union of feature settings (kind_to_fc_parameters), so that the features of
+        several models can be calculated at once and sliced per model with select_features.
+    """
+    merged = {}
+    for settings in settings_list:
+        for kind, calculators in settings.items():
+            merged_calculators = merged.setdefault(kind, {})
+            for calculator, parameters in calculators.items():
+                if parameters is None or merged_calculators.get(calculator, []) is None:
+                    merged_calculators[calculator] = None
+                    continue
+                merged_parameters = merged_calculators.setdefault(calculator, [])
+                merged_parameters.extend(parameter for parameter in parameters
+                                         if parameter not in merged_parameters)
+    return merged
+
+
+def select_features(features, settings):
+    """Returns the columns of features (created with a superset of settings) given by settings."""
+    def in_settings(column):
+        kind, calculators = next(iter(from_columns([column]).items()))
+        calculator, parameters = next(iter(calculators.items()))
+        selected = settings.get(kind, {})
+        if calculator not in selected:
+            return False
+        return parameters is None or selected[calculator] is None or \
+            parameters[0] in selected[calculator]
+    return features[[column for column in features.columns if in_settings(column)]]
+
+
+def rank_features(features, target_vector) -> list:
+    """
+    Names of the features ordered by the p_value of their relevance for target_vector, lowest
+    first. The relevance test of a feature does not depend on the other features, so the
+    ranking of a subset of the features is a slice of this ranking.
+    """
+    relevance_table = calculate_relevance_table(features, target_vector,
+                                                n_jobs=get_n_jobs(len(features)))
+    return relevance_table.sort_values(by=['p_value'], kind='mergesort')['feature'].to_list()
+
 
 # Select the most important features with the lowest p_value
-def select_relevant_features(features, target_vector, features_decrement_count):
-    relevance_table = calculate_relevance_table(features, target_vector)
-    sorted_relevance_table = relevance_table.sort_values(by=['p_value'])
-    max_features = int(os.getenv("MAX_FEATURES"))
-    features_decrement = float(os.getenv("FEATURES_DECREMENT"))
+def select_relevant_features(features, target_vector, features_decrement_count,
+                             max_features=1000, features_decrement=0.9, *, ranking=None):
+    """
+    :param ranking: result of rank_features for features (or a superset of them), computed if
+        not given, so that retries with fewer features do not repeat the relevance tests
+    """
+    if ranking is None:
+        ranking = rank_features(features, target_vector)
 
     limit = int(max_features * (features_decrement**features_decrement_count)) \
         if features_decrement < 1 \
         else int(max_features - (features_decrement**features_decrement_count))
-    trimmed_relevance_table = sorted_relevance_table.iloc[:limit]
 
-    names_of_selected_features = trimmed_relevance_table['feature'].to_list()
+    names_of_selected_features = [name for name in ranking if name in features.columns][:limit]
     selected_features = features[names_of_selected_features]
     return selected_features
 
@@ -61,17 +169,20 @@ def create_features(dataframe, var_y=None, column_id=None,
             dataframe = imputation_train_time(df=dataframe, column_id=column_id,
                                               column_sort=column_sort, column_kind=column_kind)
 
+            execution_settings = get_execution_settings(count_series(dataframe, column_id))
             features = extract_relevant_features(dataframe, var_y,
                                                  column_id=column_id,
                                                  column_sort=column_sort,
                                                  column_value=column_value,
-                                                 column_kind=column_kind)
+                                                 column_kind=column_kind,
+                                                 **execution_settings)
 
             # if no relevant features were extracted, then perform feature calculation
                                                                     # without the relevance test
             if features.shape[1] == 0:
                 features = extract_features(dataframe, column_id=column_id,
-                    column_sort=column_sort, column_value=column_value, column_kind=column_kind)
+                    column_sort=column_sort, column_value=column_value, column_kind=column_kind,
+                    **execution_settings)
 
             features = impute(features)
         return features
@@ -0,0 +1,77 @@
+"""Decides how tsfresh executes the feature extraction of an input."""
+import os
+import atexit
+import threading
+
+from tsfresh.utilities.distribution import MapDistributor, MultiprocessingDistributor
+
+
+# inputs with at most this many time series are processed in the calling process
+SMALL_INPUT_SERIES = int(os.getenv('TSFRESH_SMALL_INPUT_SERIES', "20"))
+# number of processes of the shared worker pool for larger inputs, <= 1 = no multiprocessing
+N_WORKERS = int(os.getenv('TSFRESH_N_WORKERS', str(max(1, (os.cpu_count() or 1) // 2))))
+# number of (id, kind) time series per task sent to a worker, 0 = tsfresh heuristic
+CHUNK_SIZE = int(os.getenv('TSFRESH_CHUNK_SIZE', "0")) or None
+
+_SHARED_DISTRIBUTOR = None
+_SHARED_DISTRIBUTOR_LOCK = threading.Lock()
+
+
+class PersistentMultiprocessingDistributor(MultiprocessingDistributor):
+    """
+    MultiprocessingDistributor whose worker pool is reused across extractions.
+
+    tsfresh closes the distributor at the end of every extraction, so close() keeps the
+    pool running and only shutdown() terminates it.
+    """
+
+    def __init__(self, n_workers: int):
+        super().__init__(n_workers=n_workers)
+        self.pid = os.getpid()
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+def get_shared_distributor() -> PersistentMultiprocessingDistributor:
+    """Returns the worker pool of this process, which is started on first use."""
+    global _SHARED_DISTRIBUTOR  # pylint: disable=global-statement
+    with _SHARED_DISTRIBUTOR_LOCK:
+        # a pool inherited from the parent process (e.g. gunicorn --preload) has no workers
+        if _SHARED_DISTRIBUTOR is None or _SHARED_DISTRIBUTOR.pid != os.getpid():
+            _SHARED_DISTRIBUTOR = PersistentMultiprocessingDistributor(n_workers=N_WORKERS)
+            atexit.register(_SHARED_DISTRIBUTOR.shutdown)
+        return _SHARED_DISTRIBUTOR
+
+
+def count_series(data, column_id: str) -> int:
+    """Number of time series ids of a dataframe, 0 if the id column is missing."""
+    return data[column_id].nunique() if column_id in data.columns else 0
+
+
+def is_small_input(number_of_series: int) -> bool:
+    return N_WORKERS <= 1 or number_of_series <= SMALL_INPUT_SERIES
+
+
+def get_n_jobs(number_of_series: int) -> int:
+    """Number of processes for tsfresh steps that cannot use a distributor (relevance tests)."""
+    return 0 if is_small_input(number_of_series) else N_WORKERS
+
+
+def get_execution_settings(number_of_series: int) -> dict:
+    """
+    Returns the keyword arguments for tsfresh's extract_features and extract_relevant_features:
+        small inputs are processed in the calling process, since starting worker processes
+        takes longer than the extraction itself, larger inputs are sent to the shared pool.
+
+    :param number_of_series: number of time series ids of the input
+    """
+    if is_small_input(number_of_series):
+        distributor = MapDistributor()
+    else:
+        distributor = get_shared_distributor()
+    return {'distributor': distributor, 'chunksize': CHUNK_SIZE,
+            'n_jobs': get_n_jobs(number_of_series)}
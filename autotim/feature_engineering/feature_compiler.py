@@ -0,0 +1,423 @@
+"""
+Compiles tsfresh feature settings (kind_to_fc_parameters) into a vectorized NumPy evaluation
+plan, which calculates each feature for all time series of an input at once.
+
+Time series are grouped into buckets of equal length, so that every supported calculator
+is evaluated on a (series x length) matrix instead of once per series. Calculators without
+a native implementation are passed on to tsfresh, feature names follow the tsfresh naming.
+"""
+import numpy as np
+import pandas as pd
+from tsfresh import extract_features
+from tsfresh.utilities.string_manipulation import convert_to_output_format
+
+from autotim.app.endpoints.utils.dataframe_utils import hash_settings
+from autotim.feature_engineering.extraction_policy import get_execution_settings
+from autotim.prediction_service.lru_cache import LRUCache
+
+
+# name -> (function(matrix, ...), fctype) of all natively supported tsfresh calculators
+NATIVE_CALCULATORS = {}
+
+_PLANS = LRUCache(capacity=32)
+
+
+def native(name: str, fctype: str = 'simple'):
+    """
+    Registers the vectorized implementation of a tsfresh calculator.
+
+    A 'simple' function is called with a (series x length) matrix and the parameters of one
+    feature and returns one value per series. A 'combiner' function is called with the
+    matrix and the whole parameter list and returns (name suffix, values) pairs.
+    """
+    def register(function):
+        NATIVE_CALCULATORS[name] = (function, fctype)
+        return function
+    return register
+
+
+@native('mean')
+def _mean(x):
+    return x.mean(axis=1)
+
+
+@native('median')
+def _median(x):
+    return np.median(x, axis=1)
+
+
+@native('sum_values')
+def _sum_values(x):
+    return x.sum(axis=1)
+
+
+@native('minimum')
+def _minimum(x):
+    return x.min(axis=1)
+
+
+@native('maximum')
+def _maximum(x):
+    return x.max(axis=1)
+
+
+@native('absolute_maximum')
+def _absolute_maximum(x):
+    return np.abs(x).max(axis=1)
+
+
+@native('standard_deviation')
+def _standard_deviation(x):
+    return x.std(axis=1)
+
+
+@native('variance')
+def _variance(x):
+    return x.var(axis=1)
+
+
+@native('variation_coefficient')
+def _variation_coefficient(x):
+    mean = x.mean(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(mean == 0, np.nan, x.std(axis=1) / mean)
+
+
+@native('length')
+def _length(x):
+    return np.full(x.shape[0], x.shape[1], dtype=float)
+
+
+@native('abs_energy')
+def _abs_energy(x):
+    return np.einsum('ij,ij->i', x, x)
+
+
+@native('root_mean_square')
+def _root_mean_square(x):
+    return np.sqrt(np.mean(np.square(x), axis=1))
+
+
+@native('mean_abs_change')
+def _mean_abs_change(x):
+    if x.shape[1] < 2:
+        return np.full(x.shape[0], np.nan)
+    return np.mean(np.abs(np.diff(x, axis=1)), axis=1)
+
+
+@native('mean_change')
+def _mean_change(x):
+    if x.shape[1] < 2:
+        return np.full(x.shape[0], np.nan)
+    return (x[:, -1] - x[:, 0]) / (x.shape[1] - 1)
+
+
+@native('absolute_sum_of_changes')
+def _absolute_sum_of_changes(x):
+    return np.sum(np.abs(np.diff(x, axis=1)), axis=1)
+
+
+@native('mean_second_derivative_central')
+def _mean_second_derivative_central(x):
+    if x.shape[1] < 3:
+        return np.full(x.shape[0], np.nan)
+    return (x[:, -1] - x[:, -2] - x[:, 1] + x[:, 0]) / (2 * (x.shape[1] - 2))
+
+
+@native('count_above_mean')
+def _count_above_mean(x):
+    return (x > x.mean(axis=1, keepdims=True)).sum(axis=1)
+
+
+@native('count_below_mean')
+def _count_below_mean(x):
+    return (x < x.mean(axis=1, keepdims=True)).sum(axis=1)
+
+
+@native('first_location_of_maximum')
+def _first_location_of_maximum(x):
+    return np.argmax(x, axis=1) / x.shape[1]
+
+
+@native('first_location_of_minimum')
+def _first_location_of_minimum(x):
+    return np.argmin(x, axis=1) / x.shape[1]
+
+
+@native('last_location_of_maximum')
+def _last_location_of_maximum(x):
+    return 1.0 - np.argmax(x[:, ::-1], axis=1) / x.shape[1]
+
+
+@native('last_location_of_minimum')
+def _last_location_of_minimum(x):
+    return 1.0 - np.argmin(x[:, ::-1], axis=1) / x.shape[1]
+
+
+@native('skewness')
+def _skewness(x):
+    # same (bias corrected) estimator as pandas.Series.skew used by tsfresh
+    return pd.DataFrame(x).skew(axis=1, skipna=False).to_numpy()
+
+
+@native('kurtosis')
+def _kurtosis(x):
+    return pd.DataFrame(x).kurtosis(axis=1).to_numpy()
+
+
+@native('quantile')
+def _quantile(x, q):
+    return np.quantile(x, q, axis=1)
+
+
+@native('has_duplicate_max')
+def _has_duplicate_max(x):
+    return (x == x.max(axis=1, keepdims=True)).sum(axis=1) >= 2
+
+
+@native('has_duplicate_min')
+def _has_duplicate_min(x):
+    return (x == x.min(axis=1, keepdims=True)).sum(axis=1) >= 2
+
+
+@native('has_duplicate')
+def _has_duplicate(x):
+    return (np.diff(np.sort(x, axis=1), axis=1) == 0).any(axis=1)
+
+
+@native('variance_larger_than_standard_deviation')
+def _variance_larger_than_standard_deviation(x):
+    variance = x.var(axis=1)
+    return variance > np.sqrt(variance)
+
+
+@native('large_standard_deviation')
+def _large_standard_deviation(x, r):
+    return x.std(axis=1) > r * (x.max(axis=1) - x.min(axis=1))
+
+
+@native('ratio_beyond_r_sigma')
+def _ratio_beyond_r_sigma(x, r):
+    distance = np.abs(x - x.mean(axis=1, keepdims=True))
+    return (distance > r * x.std(axis=1, keepdims=True)).sum(axis=1) / x.shape[1]
+
+
+@native('count_above')
+def _count_above(x, t):
+    return (x >= t).sum(axis=1) / x.shape[1]
+
+
+@native('count_below')
+def _count_below(x, t):
+    return (x <= t).sum(axis=1) / x.shape[1]
+
+
+@native('range_count')
+def _range_count(x, min, max):  # pylint: disable=redefined-builtin
+    return ((x >= min) & (x < max)).sum(axis=1)
+
+
+@native('value_count')
+def _value_count(x, value):
+    if np.isnan(value):
+        return np.isnan(x).sum(axis=1)
+    return (x == value).sum(axis=1)
+
+
+@native('number_crossing_m')
+def _number_crossing_m(x, m):
+    return np.diff(x > m, axis=1).sum(axis=1)
+
+
+@native('autocorrelation')
+def _autocorrelation(x, lag):
+    length = x.shape[1]
+    if length < lag:
+        return np.full(x.shape[0], np.nan)
+    mean = x.mean(axis=1, keepdims=True)
+    variance = x.var(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.sum((x[:, :length - lag] - mean) * (x[:, lag:] - mean), axis=1) \
+            / ((length - lag) * variance)
+    return np.where(np.isclose(variance, 0), np.nan, result)
+
+
+@native('c3')
+def _c3(x, lag):
+    length = x.shape[1]
+    if 2 * lag >= length:
+        return np.zeros(x.shape[0])
+    return np.mean(x[:, 2 * lag:] * x[:, lag:length - lag] * x[:, :length - 2 * lag], axis=1)
+
+
+@native('cid_ce')
+def _cid_ce(x, normalize):
+    if normalize:
+        std = x.std(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = (x - x.mean(axis=1, keepdims=True)) / std
+    differences = np.diff(x, axis=1)
+    result = np.sqrt(np.einsum('ij,ij->i', differences, differences))
+    return np.where(std[:, 0] == 0, 0.0, result) if normalize else result
+
+
+@native('symmetry_looking', fctype='combiner')
+def _symmetry_looking(x, param):
+    mean_median_difference = np.abs(x.mean(axis=1) - np.median(x, axis=1))
+    max_min_difference = x.max(axis=1) - x.min(axis=1)
+    return [(f"r_{r['r']}", mean_median_difference < r['r'] * max_min_difference)
+            for r in param]
+
+
+@native('fft_coefficient', fctype='combiner')
+def _fft_coefficient(x, param):
+    fft = np.fft.rfft(x, axis=1)
+    aggregations = {'real': np.real, 'imag': np.imag, 'abs': np.abs,
+                    'angle': lambda values: np.angle(values, deg=True)}
+    return [(f'attr_"{config["attr"]}"__coeff_{config["coeff"]}',
+             aggregations[config['attr']](fft[:, config['coeff']])
+             if config['coeff'] < fft.shape[1] else np.full(x.shape[0], np.nan))
+            for config in param]
+
+
+class FeaturePlan:
+    """
+    Evaluation plan of one set of feature settings.
+
+    :param settings: tsfresh kind_to_fc_parameters, e.g. the feature settings of a model
+    """
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        # kind -> list of (calculator function, fctype, parameters, feature name)
+        self.native = {}
+        # kind_to_fc_parameters of all features without native implementation
+        self.fallback = {}
+
+        for kind, calculators in settings.items():
+            for name, parameters in calculators.items():
+                if name not in NATIVE_CALCULATORS:
+                    self.fallback.setdefault(kind, {})[name] = parameters
+                    continue
+                function, fctype = NATIVE_CALCULATORS[name]
+                steps = self.native.setdefault(kind, [])
+                if fctype == 'combiner':
+                    steps.append((function, fctype, parameters, f"{kind}__{name}"))
+                elif not parameters:
+                    steps.append((function, fctype, {}, f"{kind}__{name}"))
+                else:
+                    steps.extend((function, fctype, parameter,
+                                  f"{kind}__{name}__{convert_to_output_format(parameter)}")
+                                 for parameter in parameters)
+
+    def evaluate(self, data: pd.DataFrame, column_id: str, column_value: str = None,
+                 column_kind: str = None) -> pd.DataFrame:
+        """
+        Calculates the features for each time series of data (in the same long or wide
+        format that is accepted by tsfresh.extract_features, rows in temporal order).
+
+        :return: pandas.DataFrame with one row per series id (sorted) and one column per feature
+        """
+        if column_id not in data.columns:
+            raise ValueError(f"Column '{column_id}' not found in the input data.")
+        if len(data) == 0:
+            raise ValueError("The input data does not contain any time series.")
+
+        series = self._get_series_by_kind(data=data, column_id=column_id,
+                                          column_value=column_value, column_kind=column_kind)
+        if series is None:
+            # tsfresh defines the results for missing or non-finite values
+            return extract_features(data, column_id=column_id, column_value=column_value,
+                                    column_kind=column_kind, kind_to_fc_parameters=self.settings,
+                                    **get_execution_settings(data[column_id].nunique()))
+
+        codes, ids = pd.factorize(data[column_id], sort=True)
+        columns = {}
+        for kind, steps in self.native.items():
+            if kind not in series:
+                continue
+            kind_codes, values = codes[series[kind][0]], series[kind][1]
+            for members, matrix in bucket_by_length(codes=kind_codes, values=values,
+                                                    number_of_ids=len(ids)):
+                for name, result in self._evaluate_steps(steps, matrix):
+                    columns.setdefault(name, np.full(len(ids), np.nan))[members] = result
+
+        features = pd.DataFrame(columns, index=ids)
+        if self.fallback:
+            fallback = extract_features(data, column_id=column_id, column_value=column_value,
+                                        column_kind=column_kind,
+                                        kind_to_fc_parameters=self.fallback,
+                                        **get_execution_settings(len(ids)))
+            features = features.join(fallback)
+        return features.reindex(columns=sorted(features.columns))
+
+    def _get_series_by_kind(self, data, column_id, column_value, column_kind):
+        """
+        Returns kind -> (row positions, float values) of the kinds with native calculators,
+        None if their values are not numeric or not finite. Other columns (e.g. a sort column
+        of the wide format) are not converted.
+        """
+        try:
+            if column_kind is not None:
+                value_columns = [column_value] if column_value is not None else \
+                    [column for column in data.columns if column not in (column_id, column_kind)]
+                if len(value_columns) != 1:
+                    return None
+                positions_by_kind = pd.Series(np.arange(len(data))).groupby(
+                    data[column_kind].to_numpy(), sort=False).indices
+                positions_by_kind = {kind: positions
+                                     for kind, positions in positions_by_kind.items()
+                                     if kind in self.native}
+                values = data[value_columns[0]].to_numpy(dtype=float) \
+                    if positions_by_kind else None
+                series = {kind: (positions, values[positions])
+                          for kind, positions in positions_by_kind.items()}
+            else:
+                kinds = [column_value] if column_value is not None else \
+                    [column for column in data.columns if column != column_id]
+                positions = np.arange(len(data))
+                series = {kind: (positions, data[kind].to_numpy(dtype=float))
+                          for kind in kinds if kind in self.native}
+        except (TypeError, ValueError):
+            # tsfresh reports values that are not numeric
+            return None
+
+        if not all(np.isfinite(values).all() for _, values in series.values()):
+            return None
+        return series
+
+    @staticmethod
+    def _evaluate_steps(steps, matrix):
+        for function, fctype, parameter, name in steps:
+            if fctype == 'combiner':
+                for suffix, result in function(matrix, parameter):
+                    yield f"{name}__{suffix}", result
+            else:
+                yield name, function(matrix, **parameter)
+
+
+def bucket_by_length(codes: np.ndarray, values: np.ndarray, number_of_ids: int):
+    """
+    Groups values into one (series x length) matrix per series length.
+
+    :param codes: series index (0 .. number_of_ids - 1) of each value
+    :param values: values in temporal order within each series
+    :return: generator of (series indices, matrix with one row per series)
+    """
+    order = np.argsort(codes, kind='stable')
+    ordered_values = values[order]
+    counts = np.bincount(codes, minlength=number_of_ids)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    for length in np.unique(counts[counts > 0]):
+        members = np.flatnonzero(counts == length)
+        yield members, ordered_values[starts[members][:, None] + np.arange(length)]
+
+
+def compile_settings(settings: dict) -> FeaturePlan:
+    """Returns the (cached) evaluation plan of feature settings."""
+    key = hash_settings(settings)
+    plan = _PLANS.get(key)
+    if plan is None:
+        plan = FeaturePlan(settings=settings)
+        _PLANS.put(key, plan)
+    return plan
@@ -0,0 +1,131 @@
+"""
+Connects to (or starts) the h2o clusters used for training and for serving predictions.
+
+The cluster is configured with environment variables H2O_<SETTING>, with separate clusters
+H2O_<ROLE>_<SETTING> takes precedence (e.g. H2O_SERVING_MAX_MEM_SIZE over H2O_MAX_MEM_SIZE):
+    URL:           url of an external cluster, if not set a local cluster is started
+    PORT:          port of the local cluster
+    MAX_MEM_SIZE:  java heap of the local cluster, e.g. 4G (default: a quarter of the RAM)
+    NTHREADS:      threads of the local cluster (default: -1, all cores)
+With H2O_SEPARATE_CLUSTERS=true, training and serving use their own local clusters on
+different ports, so that a training cannot take memory and cores from predictions.
+
+The h2o client holds a single connection per process: a process that trains and serves
+predictions uses the cluster of the role it connected to first. Separate clusters therefore
+apply to predictions served by the scoring sidecar (or not served by h2o, SCORING_BACKEND=mojo).
+"""
+import os
+import time
+import logging
+import threading
+
+import h2o
+
+TRAINING = 'training'
+SERVING = 'serving'
+ROLES = (TRAINING, SERVING)
+
+DEFAULT_PORT = 54321
+# h2o uses the port and the next one, the serving cluster needs a distinct pair
+DEFAULT_SEPARATE_PORTS = {TRAINING: DEFAULT_PORT, SERVING: DEFAULT_PORT + 2}
+
+
+def separate_clusters() -> bool:
+    return os.getenv('H2O_SEPARATE_CLUSTERS', "false").lower() == 'true'
+
+
+def get_setting(role: str, setting: str, default: str = None) -> str:
+    value = os.getenv(f'H2O_{role.upper()}_{setting}', "") if role is not None else ""
+    if value == "":
+        value = os.getenv(f'H2O_{setting}', "")
+    return value if value != "" else default
+
+
+class H2OCluster:
+    """
+    Connection to the h2o cluster of one role, connected (and the local cluster started if
+    needed) on connect(), checked and reconnected by ensure_healthy().
+
+    :param role: 'training' or 'serving'
+    """
+
+    def __init__(self, role: str):
+        if role not in ROLES:
+            raise ValueError(f"Unknown h2o cluster role '{role}', expected one of {ROLES}.")
+        self.role = role
+        # both roles share one cluster unless H2O_SEPARATE_CLUSTERS is set
+        self.cluster_role = role if separate_clusters() else None
+        self.url = get_setting(self.cluster_role, 'URL')
+        default_port = DEFAULT_SEPARATE_PORTS[role] if separate_clusters() else DEFAULT_PORT
+        # arguments of h2o.init for the local cluster, started if no url is set
+        self.local_cluster = {
+            'ip': '127.0.0.1',
+            'port': int(get_setting(self.cluster_role, 'PORT', str(default_port))),
+            'name': f'autotim-{role}' if separate_clusters() else None,
+            'nthreads': int(get_setting(self.cluster_role, 'NTHREADS', "-1")),
+            'max_mem_size': get_setting(self.cluster_role, 'MAX_MEM_SIZE')}
+        # seconds between health checks, requests in between assume the cluster is up
+        self.health_check_interval = float(os.getenv('H2O_HEALTH_CHECK_INTERVAL_SECONDS',
+                                                     "30"))
+        self._last_health_check = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        """Connects to the cluster of this role, starting a local cluster if none is running."""
+        with self._lock:
+            self._connect()
+
+    def ensure_healthy(self) -> bool:
+        """
+        Checks (at most every H2O_HEALTH_CHECK_INTERVAL_SECONDS) that the cluster is running
+        and reconnects otherwise.
+
+        :return: True if the connection had to be reestablished, i.e. objects held in the
+            previous cluster (models, frames) are gone
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._last_health_check is not None and \
+                    now - self._last_health_check < self.health_check_interval:
+                return False
+            self._last_health_check = now
+            if h2o.connection() is not None and h2o.cluster().is_running():
+                return False
+            logging.warning(f"h2o {self.role} cluster is not reachable, reconnecting.")
+            self._connect(reconnect=True)
+            return True
+
+    def _connect(self, reconnect: bool = False):
+        connection = h2o.connection()
+        if not reconnect and connection is not None and connection.connected:
+            connected_to = getattr(connection, 'autotim_role', None)
+            if connected_to not in (None, self.cluster_role):
+                logging.warning(f"This process is connected to the h2o {connected_to} "
+                                f"cluster, which is used for {self.role} as well.")
+            return
+        if self.url is not None:
+            h2o.init(url=self.url, start_h2o=False, verbose=False)
+        else:
+            h2o.init(**self.local_cluster, verbose=False)
+        h2o.connection().autotim_role = self.cluster_role
+        self._last_health_check = time.monotonic()
+        logging.info(f"Connected to the h2o {self.role} cluster at {h2o.connection().base_url}")
+
+
+_clusters = {}
+_clusters_lock = threading.Lock()
+
+
+def get_cluster(role: str) -> H2OCluster:
+    """Returns the h2o cluster of a role, shared within the process."""
+    with _clusters_lock:
+        if role not in _clusters:
+            _clusters[role] = H2OCluster(role=role)
+        return _clusters[role]
+
+
+def connect(role: str) -> H2OCluster:
+    """Connects to the h2o cluster of a role and returns it."""
+    cluster = get_cluster(role)
+    cluster.connect()
+    return cluster
@@ -4,13 +4,9 @@ import math
 import os
 import mlflow
 import numpy
-from matplotlib import pyplot as plt
-
-from sklearn.metrics import balanced_accuracy_score, precision_score, recall_score, \
-    accuracy_score, confusion_matrix
 
 from autotim.feature_engineering.automated_feature_engineering import create_features
-from autotim.app.endpoints.utils.dataframe_utils import convert_h2oframe_to_numeric
+from autotim.app.endpoints.utils.h2o_frame_utils import download_column, upload_frame
 
 from autotim.prediction_service.autotim_model import AutoTiM_Model
 from autotim.prediction_service.mlflow_model_loader import MlFlowModelLoader
@@ -26,6 +22,9 @@ VALID_METRICS = ['accuracy',
 
 
 def create_plot(y_test, conf_matrix):
+    # pyplot is only needed after trainings, not to serve predictions
+    from matplotlib import pyplot as plt  # pylint: disable=import-outside-toplevel
+
     unique_labels = numpy.unique(y_test)
     fig_size = 2 * math.sqrt(len(unique_labels) + 2)
     fig, ax = plt.subplots(figsize=(fig_size, fig_size))
@@ -65,9 +64,17 @@ class ModelSelector:
         self._load_models_for_comparison(name=name, identifier=identifier,
                                          latest_model_version=latest_model_version)
 
-    def compute_metrics(self, autotim_model: AutoTiM_Model, x_test, y_test) -> dict:
+    def compute_metrics(self, autotim_model: AutoTiM_Model, x_test, y_test,
+                        recall_average: str = "micro") -> dict:
         """Computes and logs metrics for the latest model in the given stage,
-         shows confusion matrix."""
+         shows confusion matrix.
+
+        :param recall_average: average of the precision and recall score
+        """
+        # pylint: disable=import-outside-toplevel
+        from sklearn.metrics import balanced_accuracy_score, precision_score, recall_score, \
+            accuracy_score, confusion_matrix
+
         if autotim_model.model is None:
             return {}
 
@@ -80,15 +87,13 @@ class ModelSelector:
                                        'column_sort'),
                                    settings=autotim_model.feature_settings)
 
-        features = convert_h2oframe_to_numeric(features, features.columns)
-        y_pre = autotim_model.model.predict(features)['predict'].as_data_frame()
+        y_pre = download_column(autotim_model.model.predict(upload_frame(features)), 'predict')
 
         metrics = {
             'accuracy': accuracy_score(y_test, y_pre),
             'balanced_accuracy': balanced_accuracy_score(y_test, y_pre),
-            'precision_score': precision_score(y_test, y_pre,
-                                               average=os.getenv("RECALL_AVERAGE")),
-            'recall_score': recall_score(y_test, y_pre, average=os.getenv("RECALL_AVERAGE"))
+            'precision_score': precision_score(y_test, y_pre, average=recall_average),
+            'recall_score': recall_score(y_test, y_pre, average=recall_average)
         }
 
         conf_matrix = confusion_matrix(y_test, y_pre)
@@ -123,7 +128,8 @@ class ModelSelector:
                 return prod_evaluation_metric
         return None
 
-    def update_production_flag(self, x_test, y_test, metric: str = 'accuracy'):
+    def update_production_flag(self, x_test, y_test, metric: str = 'accuracy',
+                               recall_average: str = "micro"):
         """
         Compare the latest model that has been set to staging and the current production model.
         According to the given metric, give the production flag to the better model.
@@ -131,12 +137,14 @@ class ModelSelector:
         #  calculate the metrics for the latest model and the current production model
         if self.production_model is not None:
             metrics_production = self.compute_metrics(autotim_model=self.production_model,
-                                                      x_test=x_test, y_test=y_test)
+                                                      x_test=x_test, y_test=y_test,
+                                                      recall_average=recall_average)
         else:
             metrics_production = {}
 
         metrics_latest = self.compute_metrics(autotim_model=self.latest_model,
-                                              x_test=x_test, y_test=y_test)
+                                              x_test=x_test, y_test=y_test,
+                                              recall_average=recall_average)
 
         #  log the parameter that the model is being selected by
         self.client.log_param(run_id=self.latest_model.run_id,
@@ -6,24 +6,31 @@ import os
 import logging
 import tsfresh
 
-import h2o
-from h2o.exceptions import H2OServerError
+from h2o.exceptions import H2OError
 from h2o.automl import H2OAutoML
 
 import mlflow
 from mlflow.tracking import MlflowClient
 
+from autotim.app.endpoints.utils.h2o_frame_utils import upload_frame
+from autotim.h2o_cluster.cluster_manager import TRAINING, connect
+from autotim.model_training.training_config import TrainingConfig
+from autotim.model_training.training_scheduler import TrainingScheduler
+
 
 class AutoTiMTrainer:
-    def __init__(self, experiment_name, model_name, tracking_uri=os.getenv('MLFLOW_TRACKING_URI')):
-        try:
-            h2o.init()
-        except H2OServerError:
-            logging.warning("H2O already initialized, move on training.")
+    def __init__(self, experiment_name, model_name, tracking_uri=os.getenv('MLFLOW_TRACKING_URI'),
+                 config: TrainingConfig = TrainingConfig(), use_case_name=None):
+        # the cluster might have been restarted since the previous training
+        connect(TRAINING).ensure_healthy()
         mlflow.set_tracking_uri(uri=tracking_uri)
         self.client = MlflowClient()
         self.experiment_name = experiment_name
         self.model_name = model_name
+        self.config = config
+        # AutoML runs share the training cluster with those of other trainings
+        self.scheduler = TrainingScheduler()
+        self.use_case_name = use_case_name or experiment_name
 
     def init_mlflow(self):
         if not mlflow.get_experiment_by_name(self.experiment_name):
@@ -35,8 +42,7 @@ class AutoTiMTrainer:
     def prepare_training_frame(data, labels):
         train = data.copy()
         train['label'] = labels
-        train = h2o.H2OFrame(train).drop([0], axis=0)
-        train['label'] = train['label'].asfactor() # labels are categorical
+        train = upload_frame(train, column_types={'label': 'enum'}) # labels are categorical
         x_cols = train.columns
         y_col = 'label'
         x_cols.remove(y_col)
@@ -51,13 +57,15 @@ class AutoTiMTrainer:
         self.client.transition_model_version_stage(name=self.model_name,
                                                    version=latest_version,
                                                    stage='Staging')
+        self.log_mojo(best_model)
         # Log feature extraction settings to MLFlow
         mlflow.log_metric('number of extracted features', num_features)
         mlflow.log_params({
-            'column_id': os.getenv("COLUMN_ID"),
-            'column_value': os.getenv("COLUMN_VALUE"),
-            'column_kind': os.getenv("COLUMN_KIND"),
-            'column_sort': os.getenv("COLUMN_SORT")
+            'column_id': self.config.column_id,
+            # unset columns are logged as empty string, as expected by the MlFlowModelLoader
+            'column_value': self.config.column_value or "",
+            'column_kind': self.config.column_kind or "",
+            'column_sort': self.config.column_sort
         })
         with tempfile.NamedTemporaryFile(mode='w', suffix='.json') as f:
             json.dump(feature_extraction_settings, f)
@@ -66,23 +74,47 @@ class AutoTiMTrainer:
 
         return latest_version
 
+    @staticmethod
+    def log_mojo(model):
+        """
+        Logs the model as MOJO together with its h2o-genmodel.jar (artifact path 'mojo'),
+        so that it can be scored without an h2o cluster (SCORING_BACKEND=mojo).
+        """
+        with tempfile.TemporaryDirectory() as t_dir:
+            try:
+                mojo_path = model.download_mojo(path=t_dir, get_genmodel_jar=True)
+            except (H2OError, OSError) as e:
+                # e.g. algorithms without MOJO support, the model can still be used with h2o
+                logging.warning(f"Could not export {model.model_id} as MOJO: {e}")
+                return
+            mlflow.log_artifact(mojo_path, artifact_path='mojo')
+            mlflow.log_artifact(os.path.join(t_dir, 'h2o-genmodel.jar'), artifact_path='mojo')
+
     def train(self, features, labels):
         experiment_id = self.init_mlflow()
         with mlflow.start_run(experiment_id=experiment_id):
             # AutoTiM Training
             training_frame, x, y = self.prepare_training_frame(features, labels)
-            if os.getenv("TRAIN_TIME") == "dynamic":
-                runtime = int(min(math.sqrt(training_frame.ncols * training_frame.nrows) + 120,
-                                  1800))
-                nmodels = 10
-                aml = H2OAutoML(nfolds=5, max_runtime_secs_per_model=int(runtime / nmodels),
-                                max_runtime_secs=runtime, keep_cross_validation_predictions=True,
-                                max_models=nmodels,
-                                stopping_tolerance=1 / runtime * math.sqrt(1 / nmodels))
-                aml.train(x=x, y=y, training_frame=training_frame)
+            dynamic = self.config.train_time is None
+            if dynamic:
+                requested_runtime = int(min(math.sqrt(training_frame.ncols *
+                                                      training_frame.nrows) + 120, 1800))
             else:
-                aml = H2OAutoML(nfolds=5, max_runtime_secs=int(float(os.getenv("TRAIN_TIME"))*60),
-                                keep_cross_validation_predictions=True)
+                requested_runtime = int(self.config.train_time*60)
+            # waits for a free slot, the runtime is shortened if other runs train at once
+            with self.scheduler.slot(use_case_name=self.use_case_name,
+                                     requested_runtime=requested_runtime,
+                                     priority=self.config.priority) as slot:
+                runtime = slot.max_runtime_secs
+                if dynamic:
+                    nmodels = 10
+                    aml = H2OAutoML(nfolds=5, max_runtime_secs_per_model=int(runtime / nmodels),
+                                    max_runtime_secs=runtime,
+                                    keep_cross_validation_predictions=True, max_models=nmodels,
+                                    stopping_tolerance=1 / runtime * math.sqrt(1 / nmodels))
+                else:
+                    aml = H2OAutoML(nfolds=5, max_runtime_secs=runtime,
+                                    keep_cross_validation_predictions=True)
                 aml.train(x=x, y=y, training_frame=training_frame)
 
             # Log model and feature extraction settings to MLFlow
@@ -0,0 +1,82 @@
+"""Parameters of a training, passed explicitly through the training pipeline."""
+from dataclasses import dataclass, asdict, fields
+from typing import Optional
+
+
+# one field per optional parameter of /train, grouping them would only nest the parameters
+@dataclass(frozen=True)
+class TrainingConfig:  # pylint: disable=too-many-instance-attributes
+    """
+    Immutable parameters of one training (see the optional parameters of /train), so that
+    trainings running in parallel threads or processes do not share any state.
+
+    :param train_time: runtime of AutoML in minutes, None = dynamic
+    """
+    column_id: str = "id"
+    column_label: str = "label"
+    column_sort: str = "time"
+    column_value: Optional[str] = None
+    column_kind: Optional[str] = None
+    recall_average: str = "micro"
+    metric: str = "accuracy"
+    max_features: int = 1000
+    features_decrement: float = 0.9
+    train_time: Optional[float] = None
+    train_size: float = 0.6
+    max_attempts: int = 5
+    evaluation_identifier: Optional[str] = None
+    priority: int = 0
+
+    def __post_init__(self):
+        if not 0 <= self.train_size <= 1:
+            raise ValueError("train_size parameter must be float between 0.0 and 1.0")
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts parameter must be a positive integer")
+
+    @classmethod
+    def from_params(cls, params: dict) -> 'TrainingConfig':
+        """
+        Creates the config from request parameters (strings), parameters that are not given
+            keep their default. Empty column_value / column_kind and train_time 'dynamic'
+            are None.
+
+        :raises ValueError: if a parameter has a wrong type or value
+        """
+        values = {}
+        for field in fields(cls):
+            value = params.get(field.name)
+            if value is None:
+                continue
+            if field.name in ('column_value', 'column_kind', 'evaluation_identifier'):
+                values[field.name] = value if value != "" else None
+            elif field.name == 'train_time':
+                values[field.name] = None if value == "dynamic" else \
+                    cls._convert(field.name, value, float)
+            elif field.name in ('max_features', 'max_attempts', 'priority'):
+                values[field.name] = cls._convert(field.name, value, int)
+            elif field.name in ('features_decrement', 'train_size'):
+                values[field.name] = cls._convert(field.name, value, float)
+            else:
+                values[field.name] = value
+        return cls(**values)
+
+    def to_params(self) -> dict:
+        """JSON serializable parameters, TrainingConfig(**params) restores the config."""
+        return asdict(self)
+
+    @property
+    def dataset_columns(self) -> dict:
+        """Columns that have to be in the dataset, by parameter name."""
+        return {name: column for name, column in [('column_id', self.column_id),
+                                                  ('column_label', self.column_label),
+                                                  ('column_value', self.column_value),
+                                                  ('column_kind', self.column_kind)]
+                if column}
+
+    @staticmethod
+    def _convert(name: str, value, to_type):
+        try:
+            return to_type(value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{name} parameter must be {to_type.__name__}, "
+                             f"got '{value}'") from e
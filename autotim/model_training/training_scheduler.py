@@ -0,0 +1,222 @@
+"""
+Schedules the AutoML runs of concurrent trainings on the shared h2o training cluster.
+
+At most AUTOML_MAX_CONCURRENT runs (0 = unlimited) train at once, further runs wait. Waiting
+runs are started by priority (higher first), then fairly across use cases (the use case with
+the fewest running runs, then the one that started a run least recently), then first come,
+first served. The wall time budget AUTOML_RUNTIME_BUDGET_SECONDS is split across the runs that
+train at once: a run started next to others gets at most budget / (number of runs) seconds
+(but at least AUTOML_MIN_RUNTIME_SECONDS), instead of all runs competing for heap and cores
+for their full runtime. A run that trains alone keeps its requested runtime, so the budget is
+only split with AUTOML_MAX_CONCURRENT > 1 (or 0); with the default of 1 runs train one after
+another with their requested runtime.
+
+The state is kept in the SQLite database of the training jobs (TRAINING_JOB_STORE), so that
+the schedule applies to all training processes of a host.
+"""
+import os
+import time
+import uuid
+import logging
+import sqlite3
+import tempfile
+from collections import Counter
+from contextlib import closing
+
+WAITING = 'waiting'
+RUNNING = 'running'
+FINISHED = 'finished'
+
+# finished runs are kept this long to share the cluster fairly between use cases
+HISTORY_SECONDS = 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS automl_runs (
+    run_id TEXT PRIMARY KEY,
+    use_case_name TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    requested_runtime INTEGER NOT NULL,
+    max_runtime_secs INTEGER,
+    status TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+
+def get_database_path() -> str:
+    """SQLite database of the training jobs and the AutoML runs."""
+    return os.getenv('TRAINING_JOB_STORE',
+                     os.path.join(tempfile.gettempdir(), 'autotim-training-jobs.db'))
+
+
+def process_is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists, but belongs to another user
+        return True
+    return True
+
+
+def schedule_key(priority: int, use_case_name: str, enqueued_at: float,
+                 running_per_use_case: Counter, last_started: dict) -> tuple:
+    """Sort key of waiting runs or jobs, the smallest key is started next."""
+    return (-priority, running_per_use_case[use_case_name],
+            last_started.get(use_case_name, 0.0), enqueued_at)
+
+
+def split_runtime(requested_runtime: int, concurrent_runs: int, runtime_budget: int,
+                  min_runtime: int) -> int:
+    """
+    Runtime of a run started while concurrent_runs runs (including itself) train at once.
+
+    :param runtime_budget: seconds shared by concurrent runs, 0 = no split
+    """
+    if concurrent_runs <= 1 or runtime_budget <= 0:
+        return requested_runtime
+    share = max(runtime_budget // concurrent_runs, min_runtime)
+    return min(requested_runtime, share)
+
+
+class AutoMLSlot:
+    """
+    Slot of an AutoML run, waits for its turn on enter and is released on exit.
+    max_runtime_secs is the runtime granted to the run.
+    """
+
+    def __init__(self, scheduler: 'TrainingScheduler', use_case_name: str, priority: int,
+                 requested_runtime: int):
+        self.scheduler = scheduler
+        self.use_case_name = use_case_name
+        self.priority = priority
+        self.requested_runtime = requested_runtime
+        self.run_id = None
+        self.max_runtime_secs = None
+
+    def __enter__(self):
+        self.run_id = self.scheduler.enqueue(use_case_name=self.use_case_name,
+                                             priority=self.priority,
+                                             requested_runtime=self.requested_runtime)
+        try:
+            waiting_since = time.monotonic()
+            while True:
+                self.max_runtime_secs = self.scheduler.claim(self.run_id)
+                if self.max_runtime_secs is not None:
+                    break
+                time.sleep(self.scheduler.poll_interval)
+        except BaseException:
+            self.scheduler.finish(self.run_id)
+            raise
+        logging.info(f"AutoML run of {self.use_case_name} started after "
+                     f"{time.monotonic() - waiting_since:.0f} s with a runtime of "
+                     f"{self.max_runtime_secs} s (requested: {self.requested_runtime} s)")
+        return self
+
+    def __exit__(self, *_):
+        self.scheduler.finish(self.run_id)
+
+
+class TrainingScheduler:
+    """Admits AutoML runs to the h2o training cluster, see the module docstring."""
+
+    def __init__(self, poll_interval: float = 1.0):
+        self.path = get_database_path()
+        self.max_concurrent = int(os.getenv('AUTOML_MAX_CONCURRENT', "1"))
+        self.runtime_budget = int(os.getenv('AUTOML_RUNTIME_BUDGET_SECONDS', "1800"))
+        self.min_runtime = int(os.getenv('AUTOML_MIN_RUNTIME_SECONDS', "120"))
+        self.poll_interval = poll_interval
+        with closing(self._connect()) as connection:
+            connection.execute(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # autocommit, transactions are started explicitly
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def slot(self, use_case_name: str, requested_runtime: int, priority: int = 0) -> AutoMLSlot:
+        """
+        Usage: with scheduler.slot(...) as slot: H2OAutoML(max_runtime_secs=
+            slot.max_runtime_secs, ...)
+        """
+        return AutoMLSlot(scheduler=self, use_case_name=use_case_name, priority=priority,
+                          requested_runtime=requested_runtime)
+
+    def enqueue(self, use_case_name: str, priority: int, requested_runtime: int) -> str:
+        run_id = uuid.uuid4().hex
+        with closing(self._connect()) as connection:
+            connection.execute(
+                'INSERT INTO automl_runs (run_id, use_case_name, priority, requested_runtime, '
+                'status, pid, enqueued_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (run_id, use_case_name, priority, requested_runtime, WAITING, os.getpid(),
+                 time.time()))
+        return run_id
+
+    def claim(self, run_id: str):
+        """
+        Starts a waiting run if it is next in line and a slot is free.
+
+        :return: the granted runtime in seconds or None if the run has to wait
+        """
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._clean_up(connection)
+                runs = connection.execute(
+                    'SELECT * FROM automl_runs WHERE status IN (?, ?)',
+                    (WAITING, RUNNING)).fetchall()
+                running = [run for run in runs if run['status'] == RUNNING]
+                waiting = [run for run in runs if run['status'] == WAITING]
+                if not waiting or 0 < self.max_concurrent <= len(running):
+                    return None
+                running_per_use_case = Counter(run['use_case_name'] for run in running)
+                last_started = dict(connection.execute(
+                    'SELECT use_case_name, MAX(started_at) FROM automl_runs '
+                    'WHERE started_at IS NOT NULL GROUP BY use_case_name').fetchall())
+                next_run = min(waiting, key=lambda run: schedule_key(
+                    priority=run['priority'], use_case_name=run['use_case_name'],
+                    enqueued_at=run['enqueued_at'],
+                    running_per_use_case=running_per_use_case, last_started=last_started))
+                if next_run['run_id'] != run_id:
+                    return None
+                max_runtime_secs = split_runtime(
+                    requested_runtime=next_run['requested_runtime'],
+                    concurrent_runs=len(running) + 1, runtime_budget=self.runtime_budget,
+                    min_runtime=self.min_runtime)
+                connection.execute(
+                    'UPDATE automl_runs SET status = ?, started_at = ?, max_runtime_secs = ? '
+                    'WHERE run_id = ?', (RUNNING, time.time(), max_runtime_secs, run_id))
+                return max_runtime_secs
+            finally:
+                connection.execute('COMMIT')
+
+    def finish(self, run_id: str):
+        with closing(self._connect()) as connection:
+            connection.execute(
+                'UPDATE automl_runs SET status = ?, finished_at = ? WHERE run_id = ?',
+                (FINISHED, time.time(), run_id))
+
+    def stats(self) -> dict:
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                'SELECT status, COUNT(*) AS runs FROM automl_runs WHERE status IN (?, ?) '
+                'GROUP BY status', (WAITING, RUNNING)).fetchall()
+        return {**{WAITING: 0, RUNNING: 0}, **{row['status']: row['runs'] for row in rows},
+                'max_concurrent': self.max_concurrent}
+
+    @staticmethod
+    def _clean_up(connection: sqlite3.Connection):
+        """Finishes runs of exited processes and removes the history of old runs."""
+        for row in connection.execute('SELECT run_id, pid FROM automl_runs WHERE status IN '
+                                      '(?, ?)', (WAITING, RUNNING)).fetchall():
+            if not process_is_alive(row['pid']):
+                connection.execute(
+                    'UPDATE automl_runs SET status = ?, finished_at = ? WHERE run_id = ?',
+                    (FINISHED, time.time(), row['run_id']))
+        connection.execute('DELETE FROM automl_runs WHERE status = ? AND finished_at < ?',
+                           (FINISHED, time.time() - HISTORY_SECONDS))
@@ -1,9 +1,12 @@
 """Represent AutoTiM models. """
 
 
-class AutoTiM_Model:
+# the name, mlflow coordinates and loaded artifacts of one model
+class AutoTiM_Model:  # pylint: disable=too-many-instance-attributes
     """Represent AutoTiM models. """
     mlflow_uri: str
+    use_case_name: str
+    dataset_identifier: str
     autotim_model_name: str
     model_version: int
     model = None
@@ -11,6 +14,7 @@ class AutoTiM_Model:
     params = None
     run_id = None
     stage = None
+    memory_footprint = 0
 
     def __init__(self, use_case_name: str, dataset_identifier: str,
                  model_version: int = None,
@@ -19,6 +23,8 @@ class AutoTiM_Model:
                  model_params = None,
                  run_id = None,
                  stage: str = None):
+        self.use_case_name = use_case_name
+        self.dataset_identifier = dataset_identifier
         self.autotim_model_name = \
             AutoTiM_Model.get_autotim_convention_model_name(
                 use_case_name=use_case_name, dataset_identifier=dataset_identifier)
@@ -1,58 +1,230 @@
 import os
 import logging
+import threading
 import h2o
 import mlflow
-from h2o.exceptions import H2OServerError
+import pandas as pd
+from h2o.exceptions import H2OError, H2OServerError, H2OResponseError
 
 from injector import inject
 
-from autotim.app.endpoints.utils.dataframe_utils import convert_h2oframe_to_numeric
+from autotim.app.endpoints.utils.h2o_frame_utils import download_column, upload_frame
+from autotim.h2o_cluster.cluster_manager import H2OCluster, SERVING, connect
 
 from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.lru_cache import LRUCache
 from autotim.prediction_service.mlflow_model_loader import MlFlowModelLoader
+from autotim.prediction_service.mojo_model import MojoModel
+from autotim.prediction_service.stage_cache import StageResolutionCache
+from autotim.prediction_service.production_watcher import ProductionWatcher
+from autotim.model_selection.exceptions import MlflowModelNotFoundError, \
+    ModelArtifactsNotAvailableError
 
 
 mlflow.set_tracking_uri(uri=os.getenv('MLFLOW_TRACKING_URI'))
 
 
-class AutoTiMPredictionService:
-    current_model: AutoTiM_Model = None
+def remove_model_from_cluster(model_uri: str, autotim_model: AutoTiM_Model):
+    """Frees the memory of an evicted model in the h2o cluster (or its local MOJO files)."""
+    logging.debug(f"Evicting model from cache: {model_uri}")
+    if isinstance(autotim_model.model, MojoModel):
+        autotim_model.model.remove()
+        return
+    try:
+        h2o.remove(autotim_model.model)
+    except (H2OResponseError, H2OServerError, AttributeError) as e:
+        logging.warning(f"Could not remove evicted model {model_uri} from h2o: {e}")
+
+
+def warm_up_model(autotim_model: AutoTiM_Model):
+    """Scores a single row of zeros, so that the first request does not pay for h2o warm-up."""
+    if isinstance(autotim_model.model, MojoModel):
+        # every MOJO prediction starts its own java process, there is nothing to warm up
+        return
+    try:
+        # pylint: disable=protected-access
+        columns = [column for column in autotim_model.model._model_json['output']['names']
+                   if column != autotim_model.model.actual_params.get('response_column')]
+        frame = upload_frame(pd.DataFrame({column: [0.0] for column in columns}))
+        autotim_model.model.predict(frame)
+        h2o.remove(frame)
+    except (H2OError, KeyError) as e:
+        # a cold model is still better than no model
+        logging.warning(f"Warm-up of {autotim_model.mlflow_uri} failed: {e}")
+
+
+# the caches of a worker each come with the lock and the settings they need
+class AutoTiMPredictionService:  # pylint: disable=too-many-instance-attributes
+    model_cache: LRUCache = None
+    stage_cache: StageResolutionCache = None
+    production_watcher: ProductionWatcher = None
+    h2o_cluster: H2OCluster = None
 
     @inject
     def __init__(self):
-        try:
-            h2o.init()
-        except H2OServerError:
-            logging.warning("H2O already initialized, move on prediction.")
+        # 'cluster' scores with the h2o cluster, 'mojo' with the MOJO exported at training time
+        self.scoring_backend = os.getenv('SCORING_BACKEND', "cluster").lower()
+        if self.scoring_backend not in ('cluster', 'mojo'):
+            raise ValueError(f"Unknown SCORING_BACKEND '{self.scoring_backend}', "
+                             f"expected 'cluster' or 'mojo'.")
+        if self.scoring_backend == 'cluster':
+            self.h2o_cluster = connect(SERVING)
         self.client = mlflow.tracking.MlflowClient()
 
+        # seconds an evicted model is kept in h2o, so that requests still using it can finish
+        self.eviction_grace_period = float(os.getenv('MODEL_EVICTION_GRACE_SECONDS', "30"))
+        max_memory_mb = os.getenv('MODEL_CACHE_MAX_MEMORY_MB', "")
+        self.model_cache = LRUCache(
+            capacity=int(os.getenv('MODEL_CACHE_SIZE', "8")),
+            max_size=int(float(max_memory_mb) * 1024 ** 2) if max_memory_mb != "" else None,
+            size_of=lambda autotim_model: autotim_model.memory_footprint,
+            on_evict=self._release_model)
+        # one lock per model uri, so that concurrent requests for a cold model load it once
+        self._load_locks = {}
+        self._load_locks_lock = threading.Lock()
+        self.stage_cache = StageResolutionCache(
+            ttl=float(os.getenv('STAGE_CACHE_TTL_SECONDS', "30")))
+
+        # models requested by stage, checked by the production watcher for new versions
+        self._watched_models = {}
+        self._watched_models_lock = threading.Lock()
+        watch_interval = float(os.getenv('PRODUCTION_WATCH_INTERVAL_SECONDS', "0"))
+        if watch_interval > 0:
+            self.production_watcher = ProductionWatcher(refresh=self.refresh_production_models,
+                                                        interval=watch_interval)
+            self.production_watcher.start()
+
     @staticmethod
     def predict(model, features):
-        features = convert_h2oframe_to_numeric(features, features.columns)
-        result = model.predict(features).as_data_frame()['predict'].tolist()
+        """
+        Returns the predicted label of each row of features.
 
-        return result
+        :param model: h2o model or MojoModel
+        :param features: pandas.DataFrame with one row of features per time series
+        """
+        if isinstance(model, MojoModel):
+            return model.predict(features)
+        return download_column(model.predict(upload_frame(features)), 'predict')
 
     def get_model(self, use_case_name: str, dataset_identifier: str,
                   model_version: int = None):
-        stage = None if model_version is not None else 'Production'
+        if self.h2o_cluster is not None and self.h2o_cluster.ensure_healthy():
+            # the models of the cache were held by the previous cluster
+            self.model_cache.clear()
+        loader = MlFlowModelLoader(mlflow_client=self.client,
+                                   scoring_backend=self.scoring_backend)
+        if model_version is None:
+            # resolve the current Production version, models are cached by their versioned uri
+            model_version = self._resolve_stage(
+                model_sceleton=AutoTiM_Model(use_case_name=use_case_name,
+                                             dataset_identifier=dataset_identifier,
+                                             stage='Production'),
+                loader=loader)
 
         model_sceleton = AutoTiM_Model(use_case_name=use_case_name,
                                       dataset_identifier=dataset_identifier,
-                                      model_version=model_version, stage=stage)
-        return self._get_model(model_sceleton=model_sceleton)
-
-    def _get_model(self, model_sceleton: AutoTiM_Model) -> AutoTiM_Model:
-        """
-        Helper function to facilitate storage of the last used model
-        (useful if one particular model is in use through multiple consecutive requests,
-        so that it can be loaded from MLFlow only once for the 1st request).
-        """
-        current_model_uri = self.current_model.mlflow_uri \
-            if self.current_model is not None else None
-        if current_model_uri != model_sceleton.mlflow_uri:
-            loader = MlFlowModelLoader(mlflow_client=self.client)
-            self.current_model = loader.retrieve_mlflow_model_data(
-                model_sceleton=model_sceleton
-            )
-        return self.current_model
+                                      model_version=model_version)
+        return self._get_model(model_sceleton=model_sceleton, loader=loader)
+
+    def refresh_production_models(self):
+        """
+        Checks all models that have been requested by stage for a new Production version.
+        A new version is loaded and warmed up before the stage is switched over to it,
+        requests that already hold the previous model finish on it.
+        """
+        loader = MlFlowModelLoader(mlflow_client=self.client,
+                                   scoring_backend=self.scoring_backend)
+        with self._watched_models_lock:
+            watched_models = list(self._watched_models.values())
+
+        for use_case_name, dataset_identifier in watched_models:
+            model_sceleton = AutoTiM_Model(use_case_name=use_case_name,
+                                          dataset_identifier=dataset_identifier,
+                                          stage='Production')
+            try:
+                run_id, version = loader.resolve_model_version(model_sceleton=model_sceleton)
+                cached = self.stage_cache.get(model_name=model_sceleton.autotim_model_name,
+                                              stage=model_sceleton.stage)
+                if cached is None or cached[1] != version:
+                    logging.info(f"Loading {model_sceleton.autotim_model_name}, "
+                                 f"version {version} set to Production.")
+                    self._get_model(
+                        model_sceleton=AutoTiM_Model(use_case_name=use_case_name,
+                                                    dataset_identifier=dataset_identifier,
+                                                    model_version=version),
+                        loader=loader, warm_up=True)
+            except (MlflowModelNotFoundError, ModelArtifactsNotAvailableError) as e:
+                logging.warning(f"Production model could not be refreshed: {e.message}")
+                continue
+            # the stage only points to the new version once it is loaded
+            self.stage_cache.put(model_name=model_sceleton.autotim_model_name,
+                                 stage=model_sceleton.stage, run_id=run_id,
+                                 model_version=version)
+
+    def invalidate_stage_cache(self, use_case_name: str = None, dataset_identifier: str = None):
+        """
+        Forgets resolved stages, so that the next request looks up the model registry again.
+        Without a use case name and dataset identifier, all cached stages are dropped.
+        """
+        model_name = AutoTiM_Model.get_autotim_convention_model_name(
+            use_case_name=use_case_name, dataset_identifier=dataset_identifier) \
+            if use_case_name is not None and dataset_identifier is not None else None
+        self.stage_cache.invalidate(model_name=model_name)
+
+    def cache_stats(self) -> dict:
+        return {'models': self.model_cache.stats(),
+                'stages': self.stage_cache.stats()}
+
+    def _resolve_stage(self, model_sceleton: AutoTiM_Model, loader: MlFlowModelLoader):
+        """Returns the model version a stage points to, cached for STAGE_CACHE_TTL_SECONDS."""
+        resolved = self.stage_cache.get(model_name=model_sceleton.autotim_model_name,
+                                        stage=model_sceleton.stage)
+        if resolved is None:
+            resolved = loader.resolve_model_version(model_sceleton=model_sceleton)
+            with self._watched_models_lock:
+                self._watched_models[model_sceleton.autotim_model_name] = \
+                    (model_sceleton.use_case_name, model_sceleton.dataset_identifier)
+            self.stage_cache.put(model_name=model_sceleton.autotim_model_name,
+                                 stage=model_sceleton.stage,
+                                 run_id=resolved[0], model_version=resolved[1])
+        return resolved[1]
+
+    def _get_model(self, model_sceleton: AutoTiM_Model, loader: MlFlowModelLoader,
+                   warm_up: bool = False) -> AutoTiM_Model:
+        """
+        Helper function to keep the most recently used models in memory
+        (useful if the service is used for multiple models at once,
+        so that each of them is loaded from MLFlow only once).
+        """
+        model_uri = model_sceleton.mlflow_uri
+        autotim_model = self.model_cache.get(model_uri)
+        if autotim_model is not None:
+            return autotim_model
+
+        with self._load_locks_lock:
+            load_lock = self._load_locks.setdefault(model_uri, threading.Lock())
+        with load_lock:
+            # another request might have loaded the model while this one was waiting
+            autotim_model = self.model_cache.get(model_uri) if model_uri in self.model_cache \
+                else None
+            if autotim_model is None:
+                try:
+                    autotim_model = loader.retrieve_mlflow_model_data(
+                        model_sceleton=model_sceleton)
+                    if warm_up:
+                        warm_up_model(autotim_model=autotim_model)
+                    self.model_cache.put(model_uri, autotim_model)
+                finally:
+                    with self._load_locks_lock:
+                        self._load_locks.pop(model_uri, None)
+        return autotim_model
+
+    def _release_model(self, model_uri: str, autotim_model: AutoTiM_Model):
+        """Removes an evicted model once requests that got it before the eviction are done."""
+        if self.eviction_grace_period <= 0:
+            remove_model_from_cluster(model_uri=model_uri, autotim_model=autotim_model)
+            return
+        timer = threading.Timer(self.eviction_grace_period, remove_model_from_cluster,
+                                kwargs={'model_uri': model_uri, 'autotim_model': autotim_model})
+        timer.daemon = True
+        timer.start()
@@ -0,0 +1,183 @@
+"""
+Offline scoring of a complete dataset in storage, e.g. nightly predictions for a whole fleet,
+without sending the time series through the /predict endpoint.
+
+The dataset (csv and/or parquet files in <use_case_name>/<dataset_identifier>, as saved by
+/store) is scored in chunks of complete time series. Features of the next chunk are created
+while the current chunk is scored, large chunks are extracted by the shared tsfresh worker
+pool. The predictions of each chunk are written as parquet file (columns: <column_id>,
+prediction) to the output directory in storage.
+
+Usage (with the environment of the service, e.g. STORAGE, MLFLOW_TRACKING_URI):
+    python -m autotim.prediction_service.bulk_scoring --use-case-name <use case> \
+        --dataset-identifier <dataset> [--model-version 3] [--output <directory in storage>]
+"""
+import os
+import glob
+import time
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import mlflow
+import pandas as pd
+from injector import Injector
+
+from autotim.app.dependencies import configure
+from autotim.app.endpoints.utils.dataframe_utils import iter_series_chunks
+from autotim.feature_engineering.automated_feature_engineering import create_features
+from autotim.h2o_cluster.cluster_manager import SERVING, connect
+from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+from autotim.prediction_service.mlflow_model_loader import MlFlowModelLoader
+from autotim.prediction_service.mojo_model import MojoModel
+from autotim.storage_client.file_store_manager import FileStoreManager
+
+DATASET_FILE_EXTENSIONS = ('.csv', '.parquet')
+
+
+def read_dataset_file(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+class ScoringProgress:
+    """Logs the number of scored time series and the throughput after each chunk."""
+
+    def __init__(self, total_series: int):
+        self.total_series = total_series
+        self.series = 0
+        self.rows = 0
+        self.start = time.monotonic()
+
+    def update(self, series: int, rows: int):
+        self.series += series
+        self.rows += rows
+        elapsed = time.monotonic() - self.start
+        series_per_second = self.series / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total_series - self.series) / series_per_second \
+            if series_per_second > 0 else float('nan')
+        logging.info(f"Scored {self.series}/{self.total_series} time series "
+                     f"({self.series / max(self.total_series, 1):.1%}), "
+                     f"{series_per_second:.1f} series/s, {self.rows / max(elapsed, 1e-9):.0f} "
+                     f"rows/s, {remaining:.0f} s remaining")
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.start
+        return {'series': self.series, 'rows': self.rows, 'seconds': round(elapsed, 3),
+                'series_per_second': round(self.series / elapsed, 3) if elapsed > 0 else None}
+
+
+def score_dataset(dataframe: pd.DataFrame, autotim_model: AutoTiM_Model, chunk_size: int):
+    """
+    Scores the time series of a dataframe in chunks, the features of the next chunk are
+        created while the current chunk is scored.
+
+    :return: generator of (pandas.DataFrame with column_id and prediction, number of rows)
+        per chunk
+    """
+    params = autotim_model.params
+    column_id = params.get('column_id')
+    chunks = iter_series_chunks(dataframe=dataframe, column_id=column_id,
+                                chunk_size=chunk_size)
+
+    def featurize(chunk):
+        ids, chunk_dataframe = chunk
+        return ids, len(chunk_dataframe), create_features(
+            dataframe=chunk_dataframe, settings=autotim_model.feature_settings,
+            column_id=column_id, column_value=params.get('column_value'),
+            column_kind=params.get('column_kind'), column_sort=params.get('column_sort'))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        chunk = next(chunks, None)
+        pending = executor.submit(featurize, chunk) if chunk is not None else None
+        while pending is not None:
+            ids, rows, features = pending.result()
+            chunk = next(chunks, None)
+            pending = executor.submit(featurize, chunk) if chunk is not None else None
+            predictions = AutoTiMPredictionService.predict(model=autotim_model.model,
+                                                           features=features)
+            yield pd.DataFrame({column_id: ids, 'prediction': predictions}), rows
+
+
+def run(file_client: FileStoreManager, autotim_model: AutoTiM_Model, output: str,
+        chunk_size: int, working_directory: str) -> dict:
+    """
+    Downloads the dataset of the model's use case and dataset identifier, scores it and
+        uploads one parquet file of predictions per chunk to output.
+
+    :return: summary with the number of scored series and rows and the throughput
+    """
+    prefix = f"{autotim_model.use_case_name}/{autotim_model.dataset_identifier}"
+    file_client.download_dir(output_path=working_directory, prefix=prefix)
+    dataset_directory = os.path.join(working_directory, prefix)
+    dataset_files = sorted(path for path in glob.glob(os.path.join(dataset_directory, '*'))
+                           if path.endswith(DATASET_FILE_EXTENSIONS))
+    if not dataset_files:
+        raise FileNotFoundError(f"No csv or parquet files found in '{prefix}'.")
+
+    column_id = autotim_model.params.get('column_id')
+    part = 0
+    progress = ScoringProgress(total_series=0)
+    for dataset_file in dataset_files:
+        logging.info(f"Scoring {os.path.basename(dataset_file)}")
+        dataframe = read_dataset_file(dataset_file)
+        # files are read one at a time, the total grows with each file
+        progress.total_series += dataframe[column_id].nunique()
+        for predictions, rows in score_dataset(dataframe=dataframe,
+                                               autotim_model=autotim_model,
+                                               chunk_size=chunk_size):
+            part_path = os.path.join(working_directory, f'part-{part:05d}.parquet')
+            predictions.to_parquet(part_path, index=False)
+            file_client.save_single_file(src=part_path, dest=output)
+            os.remove(part_path)
+            part += 1
+            progress.update(series=len(predictions), rows=rows)
+    return {**progress.summary(), 'files': part, 'output': output}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--use-case-name', required=True)
+    parser.add_argument('--dataset-identifier', required=True)
+    parser.add_argument('--model-version', type=int, default=None,
+                        help="model version to score with (default: Production model)")
+    parser.add_argument('--output', default=None,
+                        help="directory in storage for the predictions (default: "
+                             "<use case>/predictions/<dataset>/version_<model version>)")
+    parser.add_argument('--chunk-size', type=int,
+                        default=int(os.getenv('BULK_SCORING_CHUNK_SIZE', "10000")),
+                        help="number of time series per chunk and output file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    scoring_backend = os.getenv('SCORING_BACKEND', "cluster").lower()
+    if scoring_backend == 'cluster':
+        connect(SERVING)
+    mlflow.set_tracking_uri(uri=os.getenv('MLFLOW_TRACKING_URI'))
+    loader = MlFlowModelLoader(mlflow_client=mlflow.tracking.MlflowClient(),
+                               scoring_backend=scoring_backend)
+    autotim_model = loader.retrieve_mlflow_model_data(
+        model_sceleton=AutoTiM_Model(use_case_name=args.use_case_name,
+                                     dataset_identifier=args.dataset_identifier,
+                                     model_version=args.model_version,
+                                     stage='Production' if args.model_version is None else None))
+    output = args.output or f"{args.use_case_name}/predictions/{args.dataset_identifier}/" \
+                            f"version_{autotim_model.model_version}"
+    logging.info(f"Scoring with {autotim_model.mlflow_uri}, writing predictions to {output}")
+
+    file_client = Injector([configure]).get(FileStoreManager)
+    try:
+        with tempfile.TemporaryDirectory() as working_directory:
+            summary = run(file_client=file_client, autotim_model=autotim_model, output=output,
+                          chunk_size=max(args.chunk_size, 1),
+                          working_directory=working_directory)
+    finally:
+        if isinstance(autotim_model.model, MojoModel):
+            autotim_model.model.remove()
+    logging.info(f"Bulk scoring done: {summary}")
+
+
+if __name__ == "__main__":
+    main()
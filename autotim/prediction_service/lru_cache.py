@@ -0,0 +1,108 @@
+"""Bounded, thread-safe LRU cache used to keep loaded models (and other artifacts) in memory."""
+import threading
+from collections import OrderedDict
+
+
+# bounds, entries and counters of one cache, all guarded by the same lock
+class LRUCache:  # pylint: disable=too-many-instance-attributes
+    """
+    Least-recently-used cache bounded by the number of entries and (optionally) by the
+    summed footprint of its values.
+
+    :param capacity: maximum number of entries kept in the cache
+    :param max_size: maximum summed size of all entries as reported by size_of, None = unbounded
+    :param size_of: callable returning the footprint of a value, default: every value counts 0
+    :param on_evict: callable(key, value) invoked for every entry that is pushed out of the cache
+    """
+
+    def __init__(self, capacity: int, max_size: int = None, size_of=None, on_evict=None):
+        if capacity < 1:
+            raise ValueError("LRUCache capacity must be at least 1.")
+        self.capacity = capacity
+        self.max_size = max_size
+        self._size_of = size_of if size_of is not None else lambda value: 0
+        self._on_evict = on_evict
+
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._total_size = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    @property
+    def total_size(self):
+        return self._total_size
+
+    def get(self, key, default=None):
+        """Returns the cached value for key and marks it as most recently used."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        """Adds (or replaces) an entry and evicts least recently used entries if necessary."""
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            size = self._size_of(value)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._total_size += size
+            self._evict(keep=key)
+
+    def pop(self, key, default=None):
+        """Removes an entry without counting it as an eviction."""
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'capacity': self.capacity,
+                    'size': self._total_size,
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _drop(self, key):
+        value = self._entries.pop(key)
+        self._total_size -= self._sizes.pop(key)
+        return value
+
+    def _over_budget(self):
+        return len(self._entries) > self.capacity or \
+            (self.max_size is not None and self._total_size > self.max_size)
+
+    def _evict(self, keep):
+        # the newest entry is always kept, even if it exceeds max_size on its own
+        while self._over_budget() and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                break
+            value = self._drop(key)
+            self.evictions += 1
+            if self._on_evict is not None:
+                self._on_evict(key, value)
@@ -1,6 +1,7 @@
 """This class facilitates communication with MlFlow and retrieval of stored models."""
 import os
 import json
+import shutil
 import tempfile
 import logging
 
@@ -8,14 +9,16 @@ import mlflow
 from mlflow.exceptions import RestException, MlflowException
 
 from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.mojo_model import MojoModel
 from autotim.model_selection.exceptions import MlflowModelNotFoundError, \
     ModelArtifactsNotAvailableError
 
 
 class MlFlowModelLoader:
 
-    def __init__(self, mlflow_client):
+    def __init__(self, mlflow_client, scoring_backend: str = 'cluster'):
         self.client = mlflow_client
+        self.scoring_backend = scoring_backend
 
     def get_model_run_id_and_version(self, model_name: str, model_version: int = None,
                                      stage: str = 'Production'):
@@ -30,6 +33,35 @@ class MlFlowModelLoader:
         latest = self.client.get_latest_versions(model_name, stages=[stage])[-1]
         return latest.run_id, latest.version
 
+    def resolve_model_version(self, model_sceleton: AutoTiM_Model):
+        """
+        Resolves the model version of a model requested by stage (e.g. Production),
+            so that the model can be identified by its versioned uri.
+
+        :param model_sceleton base for the AutoTiM_Model containing a model name and uri
+        :return tuple of run id and model version
+        """
+        try:
+            return self.get_model_run_id_and_version(
+                model_name=model_sceleton.autotim_model_name,
+                model_version=model_sceleton.model_version,
+                stage=model_sceleton.stage
+            )
+        except (IndexError, AttributeError, RestException, MlflowException) as e:
+            # IndexError -> no model in the requested stage
+            logging.error(e)
+            raise MlflowModelNotFoundError(model_name=model_sceleton.autotim_model_name) from e
+
+    def get_artifact_size(self, run_id: str, path: str) -> int:
+        """Returns the summed size in bytes of all artifacts stored under path for a run."""
+        size = 0
+        for file_info in self.client.list_artifacts(run_id, path):
+            if file_info.is_dir:
+                size += self.get_artifact_size(run_id=run_id, path=file_info.path)
+            else:
+                size += file_info.file_size or 0
+        return size
+
     def get_params_for_run_id(self, run_id: str, param_keys):
         """
         Retrieves parameters associated with a run_id.
@@ -60,14 +92,25 @@ class MlFlowModelLoader:
                 extraction_settings = json.load(settings)
         return extraction_settings
 
+    def load_mojo_for_run_id(self, run_id) -> MojoModel:
+        """Downloads the MOJO exported at training time into a new local directory."""
+        directory = tempfile.mkdtemp(prefix='autotim-mojo-')
+        try:
+            self.client.download_artifacts(run_id, 'mojo', directory)
+            return MojoModel(directory=os.path.join(directory, 'mojo'))
+        except (MlflowException, OSError):
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+
     def retrieve_mlflow_model_data(self, model_sceleton: AutoTiM_Model):
         """
         Fills autotim_model instance with params, that need to be retrieved from MlFlow:
             - model run id
             - model version (if not set already)
-            - h20 model
+            - h20 model (or MojoModel for the mojo scoring backend)
             - feature engineering settings
             - model_params: 'column_id', 'column_value', 'column_kind', 'column_sort'
+            - memory footprint of the stored model
 
         :param model_sceleton base for the AutoTiM_Model containing a model name and uri
         :return AutoTiM_Model
@@ -85,8 +128,20 @@ class MlFlowModelLoader:
             model_sceleton.params = self.get_params_for_run_id(run_id=run_id,
                 param_keys=['column_id', 'column_value', 'column_kind', 'column_sort'])
 
-            model_sceleton.model = mlflow.h2o.load_model(model_uri=model_sceleton.mlflow_uri)
             model_sceleton.feature_settings = self.load_settings_for_run_id(run_id=run_id)
+            if self.scoring_backend == 'mojo':
+                if not self.client.list_artifacts(run_id, 'mojo'):
+                    # model was trained without MOJO export
+                    raise FileNotFoundError(f"No MOJO logged for run {run_id}.")
+                model_sceleton.model = self.load_mojo_for_run_id(run_id=run_id)
+                model_sceleton.memory_footprint = self.get_artifact_size(run_id=run_id,
+                                                                         path='mojo')
+            else:
+                model_sceleton.model = mlflow.h2o.load_model(
+                    model_uri=model_sceleton.mlflow_uri)
+                # size of the persisted h2o model approximates its footprint in the h2o cluster
+                model_sceleton.memory_footprint = self.get_artifact_size(
+                    run_id=run_id, path=model_sceleton.autotim_model_name)
 
             return model_sceleton
         except (AttributeError, RestException, MlflowException) as e:
@@ -0,0 +1,39 @@
+"""H2O models exported as MOJO, scored without an h2o cluster."""
+import os
+import shutil
+import logging
+
+import h2o
+import pandas as pd
+
+GENMODEL_JAR = 'h2o-genmodel.jar'
+
+
+class MojoModel:
+    """
+    Scores features with a MOJO (and the h2o-genmodel.jar it was exported with)
+    in a local java process instead of the h2o cluster.
+
+    :param directory: local directory containing the MOJO zip and h2o-genmodel.jar,
+        removed by remove()
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        mojo_files = [file for file in os.listdir(directory) if file.endswith('.zip')]
+        if len(mojo_files) != 1 or not os.path.isfile(os.path.join(directory, GENMODEL_JAR)):
+            raise FileNotFoundError(f"Expected a MOJO zip and {GENMODEL_JAR} in {directory}.")
+        self.mojo_path = os.path.join(directory, mojo_files[0])
+        self.java_options = os.getenv('MOJO_JAVA_OPTIONS', "-Xmx1g")
+
+    def predict(self, features: pd.DataFrame) -> list:
+        """Returns the predicted label of each row of features."""
+        predictions = h2o.mojo_predict_pandas(
+            dataframe=features, mojo_zip_path=self.mojo_path,
+            genmodel_jar_path=os.path.join(self.directory, GENMODEL_JAR),
+            java_options=self.java_options)
+        return predictions['predict'].tolist()
+
+    def remove(self):
+        logging.debug(f"Removing MOJO files in {self.directory}")
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,199 @@
+"""Coalesces concurrent prediction requests for the same model into a single scoring call."""
+import os
+import logging
+import threading
+from contextlib import nullcontext
+
+import pandas as pd
+from injector import inject
+
+
+def merge_timeseries(frames, column_id: str):
+    """
+    Concatenates the time series of multiple requests into a single dataframe.
+
+    The series ids of each frame are replaced by consecutive integers, so that series of
+    different requests cannot collide and the features of the merged frame are ordered
+    request by request, each in the order of its own (sorted) series ids.
+
+    :param frames: list of pandas.DataFrame in long or wide format
+    :param column_id: name of the column with time series identifiers
+    :return: merged pandas.DataFrame and the number of series of each frame
+    """
+    merged, counts = [], []
+    offset = 0
+    for frame in frames:
+        ids = frame[column_id].drop_duplicates().sort_values().tolist()
+        new_ids = {identifier: offset + rank for rank, identifier in enumerate(ids)}
+        frame = frame.copy()
+        frame[column_id] = frame[column_id].map(new_ids)
+        merged.append(frame)
+        counts.append(len(ids))
+        offset += len(ids)
+    return pd.concat(merged, ignore_index=True), counts
+
+
+def split_predictions(predictions: list, counts: list) -> list:
+    """Splits the predictions of a merged frame into one list of predictions per frame."""
+    result, start = [], 0
+    for count in counts:
+        result.append(predictions[start:start + count])
+        start += count
+    return result
+
+
+def score_frames(frames, column_id: str, score):
+    """
+    Scores the time series of multiple requests for the same model with a single call of score.
+    If that fails, the frames are scored one by one, so that a single bad input
+    only fails its own request.
+
+    :param frames: list of pandas.DataFrame
+    :param column_id: name of the column with time series identifiers
+    :param score: callable(dataframe) returning one prediction per series id,
+        ordered by series id
+    :return: list of predictions and list of raised exceptions (or None), one entry per frame
+    """
+    results, errors = [None] * len(frames), [None] * len(frames)
+    try:
+        if len(frames) == 1:
+            results[0] = score(frames[0])
+        else:
+            merged, counts = merge_timeseries(frames=frames, column_id=column_id)
+            predictions = score(merged)
+            if len(predictions) != sum(counts):
+                raise ValueError("Number of predictions does not match the number of series.")
+            results = split_predictions(predictions=predictions, counts=counts)
+        return results, errors
+    except Exception as e:  # pylint: disable=broad-except
+        if len(frames) == 1:
+            errors[0] = e
+            return results, errors
+        logging.warning(f"Scoring a batch failed, scoring its requests one by one: {e}")
+
+    for i, frame in enumerate(frames):
+        try:
+            results[i] = score(frame)
+        except Exception as e:  # pylint: disable=broad-except
+            errors[i] = e
+    return results, errors
+
+
+class _Batch:
+    """Requests collected for one model within one batching window."""
+
+    def __init__(self):
+        self.frames = []
+        self.series = 0
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.errors = None
+
+
+class PredictionCoalescer:
+    """
+    Gathers prediction requests for the same model that arrive within a short window
+    and scores them together, so that concurrent requests result in a single
+    feature extraction and a single h2o scoring call.
+
+    Batching is disabled unless PREDICT_BATCH_WINDOW_MS is set to a value > 0.
+    A batch is scored once the window has passed or PREDICT_BATCH_MAX_SERIES series
+    have been collected, whatever happens first.
+    """
+
+    @inject
+    def __init__(self):
+        self.window = float(os.getenv('PREDICT_BATCH_WINDOW_MS', "0")) / 1000
+        self.max_series = int(os.getenv('PREDICT_BATCH_MAX_SERIES', "256"))
+        self._open_batches = {}
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.batched_requests = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def submit(self, key, timeseries: pd.DataFrame, column_id: str, score, admit=None):
+        """
+        Scores a dataframe of time series, possibly together with other requests for key.
+
+        :param key: identifies the model, only requests with the same key are merged
+        :param timeseries: time series of this request
+        :param column_id: name of the column with time series identifiers
+        :param score: callable(dataframe) returning one prediction per series id,
+            ordered by series id
+        :param admit: optional callable returning a context manager entered around each
+            scoring call (e.g. an admission slot), requests waiting for a batch hold none
+        :return: list of predictions for this request
+        """
+        admit = admit or nullcontext
+        if not self.enabled:
+            with admit():
+                return score(timeseries)
+
+        # raises for an invalid request (e.g. without column_id) before it joins a batch
+        series = timeseries[column_id].nunique()
+        with self._lock:
+            batch = self._open_batches.get(key)
+            leader = batch is None
+            if leader:
+                batch = _Batch()
+                self._open_batches[key] = batch
+            index = len(batch.frames)
+            batch.frames.append(timeseries)
+            batch.series += series
+            if batch.series >= self.max_series:
+                # later requests start a new batch
+                del self._open_batches[key]
+                batch.full.set()
+
+        if leader:
+            try:
+                batch.full.wait(self.window)
+                self._close_batch(key=key, batch=batch)
+                self._score_batch(batch=batch, column_id=column_id, score=score, admit=admit)
+            finally:
+                # requests of the batch must not wait forever, whatever happened to the leader
+                self._close_batch(key=key, batch=batch)
+                if not batch.done.is_set():
+                    error = RuntimeError("The batch of this request was not scored.")
+                    batch.results, batch.errors = [None] * len(batch.frames), \
+                        [error] * len(batch.frames)
+                    batch.done.set()
+        else:
+            batch.done.wait()
+
+        if batch.errors[index] is not None:
+            raise batch.errors[index]
+        return batch.results[index]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'enabled': self.enabled,
+                    'window_ms': self.window * 1000,
+                    'max_series': self.max_series,
+                    'batches': self.batches,
+                    'batched_requests': self.batched_requests}
+
+    def _close_batch(self, key, batch: _Batch):
+        """Stops further requests from joining batch."""
+        with self._lock:
+            if self._open_batches.get(key) is batch:
+                del self._open_batches[key]
+
+    def _score_batch(self, batch: _Batch, column_id: str, score, admit):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += len(batch.frames)
+        try:
+            with admit():
+                batch.results, batch.errors = score_frames(
+                    frames=batch.frames, column_id=column_id, score=score)
+        except Exception as e:  # pylint: disable=broad-except
+            # e.g. the batch was not admitted, which fails all of its requests
+            batch.results, batch.errors = [None] * len(batch.frames), [e] * len(batch.frames)
+        finally:
+            batch.done.set()
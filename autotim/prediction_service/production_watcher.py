@@ -0,0 +1,30 @@
+"""Background thread that loads newly promoted Production models off the request path."""
+import logging
+import threading
+
+
+class ProductionWatcher(threading.Thread):
+    """
+    Periodically calls refresh() (e.g. AutoTiMPredictionService.refresh_production_models)
+    until stop() is called.
+
+    :param refresh: callable checking for stage transitions and loading new models
+    :param interval: seconds between two checks
+    """
+
+    def __init__(self, refresh, interval: float):
+        super().__init__(name='autotim-production-watcher', daemon=True)
+        self._refresh = refresh
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self._refresh()
+            except Exception as e:  # pylint: disable=broad-except
+                # the watcher must survive e.g. a temporarily unreachable MLFlow server
+                logging.error(f"Checking for new Production models failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
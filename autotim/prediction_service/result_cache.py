@@ -0,0 +1,70 @@
+"""Cache of predictions for time series that have already been scored with the same model."""
+import os
+
+from injector import inject
+
+from autotim.app.endpoints.utils.dataframe_utils import hash_series_by_id, hash_settings
+from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.lru_cache import LRUCache
+
+
+class PredictionResultCache:
+    """
+    Keeps the predictions of the PREDICTION_CACHE_SIZE most recently scored time series,
+    keyed by the content of a series, the model version and its feature settings.
+    Disabled if PREDICTION_CACHE_SIZE is 0 (default).
+
+    Note: features are imputed per request, so a series containing values that cannot be
+    turned into features (NaN/inf) might get a different prediction depending on the other
+    series of a request. The cache returns the prediction of the first request.
+    """
+
+    @inject
+    def __init__(self):
+        capacity = int(os.getenv('PREDICTION_CACHE_SIZE', "0"))
+        self._cache = LRUCache(capacity=capacity) if capacity > 0 else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache is not None
+
+    def score(self, autotim_model: AutoTiM_Model, timeseries, score) -> list:
+        """
+        Returns one prediction per series id (ordered by series id), only series
+            without a cached prediction are passed to score.
+
+        :param autotim_model: model the predictions are made with
+        :param timeseries: pandas.DataFrame with one or more time series
+        :param score: callable(dataframe) returning one prediction per series id,
+            ordered by series id
+        """
+        if not self.enabled:
+            return score(timeseries)
+
+        column_id = autotim_model.params.get('column_id')
+        series_hashes = hash_series_by_id(dataframe=timeseries, column_id=column_id,
+                                          column_sort=autotim_model.params.get('column_sort'))
+        model_key = (autotim_model.mlflow_uri, hash_settings(autotim_model.feature_settings))
+
+        predictions, missing_ids = {}, []
+        for identifier, series_hash in series_hashes.items():
+            cached = self._cache.get((model_key, series_hash))
+            if cached is None:
+                missing_ids.append(identifier)
+            else:
+                predictions[identifier] = cached[0]
+
+        if missing_ids:
+            missing = timeseries[timeseries[column_id].isin(missing_ids)]
+            new_predictions = score(missing)
+            if len(new_predictions) != len(missing_ids):
+                raise ValueError("Number of predictions does not match the number of series.")
+            for identifier, prediction in zip(missing_ids, new_predictions):
+                predictions[identifier] = prediction
+                # wrapped in a tuple, so that a cached prediction of None is still a hit
+                self._cache.put((model_key, series_hashes[identifier]), (prediction,))
+
+        return [predictions[identifier] for identifier in series_hashes]
+
+    def stats(self) -> dict:
+        return self._cache.stats() if self.enabled else {'enabled': False}
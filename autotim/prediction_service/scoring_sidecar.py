@@ -0,0 +1,345 @@
+"""
+Optional scoring sidecar: a single local process that owns the model cache and scoring
+for all gunicorn workers of a container, instead of one AutoTiMPredictionService
+(with its own h2o session and model copies) per worker.
+
+Workers talk to the sidecar over a Unix socket. Each message is a 5 byte header
+(message type, payload length) followed by the payload. Scoring requests and their predictions
+use a fixed binary layout (see encode_predict_request and encode_predictions), the rarely used
+control messages (model lookup, cache stats, invalidation, errors) are json. Features are not
+sent over the socket, they are written to shared memory whose name is passed in the request.
+
+Run with: python -m autotim.prediction_service.scoring_sidecar
+(started automatically by gunicorn if SCORING_SIDECAR_SOCKET is set).
+"""
+import os
+import json
+import time
+import numbers
+import struct
+import socket
+import logging
+import socketserver
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+import pandas as pd
+from injector import inject
+
+from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+from autotim.model_selection.exceptions import MlflowModelNotFoundError, \
+    ModelArtifactsNotAvailableError
+
+HEADER = struct.Struct('!BI')
+LENGTH = struct.Struct('!I')
+SHAPE = struct.Struct('!II')
+INT64 = struct.Struct('!q')
+FLOAT64 = struct.Struct('!d')
+
+# request types
+GET_MODEL = 1
+PREDICT = 2
+CACHE_STATS = 3
+INVALIDATE = 4
+# response types
+OK = 0
+ERROR = 1
+# type tags of the values of encoded predictions
+NONE_VALUE = 0
+INTEGER_VALUE = 1
+FLOAT_VALUE = 2
+STRING_VALUE = 3
+
+
+def send_frame(connection: socket.socket, message_type: int, data: bytes):
+    connection.sendall(HEADER.pack(message_type, len(data)) + data)
+
+
+def receive_frame(connection: socket.socket):
+    """Returns message type and payload bytes of the next message, raises ConnectionError on EOF."""
+    message_type, length = HEADER.unpack(_receive_exactly(connection, HEADER.size))
+    return message_type, _receive_exactly(connection, length)
+
+
+def send_message(connection: socket.socket, message_type: int, payload: dict):
+    send_frame(connection, message_type, json.dumps(payload, default=str).encode('utf-8'))
+
+
+def _receive_exactly(connection: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = connection.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("Connection to the scoring sidecar was closed.")
+        buffer += chunk
+    return bytes(buffer)
+
+
+def write_features(features: pd.DataFrame):
+    """
+    Copies features (as float64 matrix) into a new shared memory block.
+
+    :return: the SharedMemory (to be closed and unlinked by the caller once the features
+        have been scored) and its description for read_features
+    """
+    matrix = features.to_numpy(dtype=np.float64)
+    memory = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+    np.ndarray(matrix.shape, dtype=np.float64, buffer=memory.buf)[:] = matrix
+    return memory, {'name': memory.name, 'shape': list(matrix.shape),
+                    'columns': [str(column) for column in features.columns]}
+
+
+def read_features(description: dict) -> pd.DataFrame:
+    """Reads features written by write_features in another process."""
+    memory = shared_memory.SharedMemory(name=description['name'])
+    try:
+        matrix = np.ndarray(description['shape'], dtype=np.float64, buffer=memory.buf).copy()
+    finally:
+        memory.close()
+        # the block belongs to the writing process, which unlinks it
+        resource_tracker.unregister(memory._name, 'shared_memory')  # pylint: disable=protected-access
+    return pd.DataFrame(matrix, columns=description['columns'])
+
+
+class _Reader:
+    """Reads the values of a binary payload in order."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, structure: struct.Struct) -> tuple:
+        values = structure.unpack_from(self.data, self.offset)
+        self.offset += structure.size
+        return values
+
+    def string(self) -> str:
+        (length,) = self.unpack(LENGTH)
+        value = self.data[self.offset:self.offset + length].decode('utf-8')
+        self.offset += length
+        return value
+
+
+def _pack_strings(*strings: str) -> bytes:
+    return b''.join(LENGTH.pack(len(data)) + data
+                    for data in (string.encode('utf-8') for string in strings))
+
+
+def encode_predict_request(model: dict, features: dict) -> bytes:
+    """
+    Layout: use case name, dataset identifier (length-prefixed utf-8), model version (int64,
+    -1 = latest Production), shared memory name, shape (2 x uint32) and the column names.
+
+    :param model: use_case_name, dataset_identifier and model_version of the model to score
+    :param features: description of the features returned by write_features
+    """
+    model_version = -1 if model['model_version'] is None else int(model['model_version'])
+    return _pack_strings(model['use_case_name'], model['dataset_identifier']) + \
+        INT64.pack(model_version) + _pack_strings(features['name']) + \
+        SHAPE.pack(*features['shape']) + _pack_strings(*features['columns'])
+
+
+def decode_predict_request(data: bytes):
+    """:return: model and features description, as passed to encode_predict_request"""
+    reader = _Reader(data)
+    use_case_name, dataset_identifier = reader.string(), reader.string()
+    (model_version,) = reader.unpack(INT64)
+    name = reader.string()
+    shape = list(reader.unpack(SHAPE))
+    columns = [reader.string() for _ in range(shape[1])]
+    return {'use_case_name': use_case_name, 'dataset_identifier': dataset_identifier,
+            'model_version': model_version if model_version >= 0 else None}, \
+        {'name': name, 'shape': shape, 'columns': columns}
+
+
+def encode_predictions(predictions: list) -> bytes:
+    """Layout: number of values (uint32), then per value a type tag and the value."""
+    parts = [LENGTH.pack(len(predictions))]
+    for value in predictions:
+        if value is None:
+            parts.append(bytes([NONE_VALUE]))
+        elif isinstance(value, numbers.Integral):
+            parts.append(bytes([INTEGER_VALUE]) + INT64.pack(int(value)))
+        elif isinstance(value, numbers.Real):
+            parts.append(bytes([FLOAT_VALUE]) + FLOAT64.pack(float(value)))
+        else:
+            parts.append(bytes([STRING_VALUE]) + _pack_strings(str(value)))
+    return b''.join(parts)
+
+
+def decode_predictions(data: bytes) -> list:
+    reader = _Reader(data)
+    (count,) = reader.unpack(LENGTH)
+    predictions = []
+    for _ in range(count):
+        value_type = reader.data[reader.offset]
+        reader.offset += 1
+        if value_type == NONE_VALUE:
+            predictions.append(None)
+        elif value_type == INTEGER_VALUE:
+            predictions.append(reader.unpack(INT64)[0])
+        elif value_type == FLOAT_VALUE:
+            predictions.append(reader.unpack(FLOAT64)[0])
+        else:
+            predictions.append(reader.string())
+    return predictions
+
+
+def describe_model(autotim_model: AutoTiM_Model) -> dict:
+    return {'use_case_name': autotim_model.use_case_name,
+            'dataset_identifier': autotim_model.dataset_identifier,
+            'model_version': autotim_model.model_version,
+            'run_id': autotim_model.run_id,
+            'params': autotim_model.params,
+            'feature_settings': autotim_model.feature_settings}
+
+
+class SidecarModel:
+    """Stands in for the h2o model of an AutoTiM_Model in the workers, scored by the sidecar."""
+
+    def __init__(self, description: dict):
+        self.description = description
+
+
+class ScoringRequestHandler(socketserver.BaseRequestHandler):
+    """Handles one request per connection with the AutoTiMPredictionService of the server."""
+
+    def handle(self):
+        message_type, data = receive_frame(self.request)
+        service = self.server.prediction_service
+        payload = {}
+        try:
+            if message_type == PREDICT:
+                payload, features = decode_predict_request(data)
+                autotim_model = service.get_model(**payload)
+                predictions = service.predict(model=autotim_model.model,
+                                              features=read_features(features))
+                send_frame(self.request, OK, encode_predictions(predictions))
+                return
+            payload = json.loads(data)
+            if message_type == GET_MODEL:
+                response = describe_model(service.get_model(**payload))
+            elif message_type == CACHE_STATS:
+                response = service.cache_stats()
+            elif message_type == INVALIDATE:
+                service.invalidate_stage_cache(**payload)
+                response = {}
+            else:
+                raise ValueError(f"Unknown message type {message_type}.")
+        except Exception as e:  # pylint: disable=broad-except
+            logging.error(f"Scoring sidecar request failed: {e}")
+            model = payload if isinstance(payload, dict) else {}
+            send_message(self.request, ERROR, {'type': type(e).__name__, 'message': str(e),
+                                               'use_case_name': model.get('use_case_name'),
+                                               'dataset_identifier':
+                                                   model.get('dataset_identifier'),
+                                               'model_version': model.get('model_version')})
+            return
+        send_message(self.request, OK, response)
+
+
+class ScoringServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, prediction_service):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.prediction_service = prediction_service
+        super().__init__(socket_path, ScoringRequestHandler)
+
+
+def raise_sidecar_error(payload: dict):
+    """Raises the exception of an ERROR response in the worker."""
+    model_name = AutoTiM_Model.get_autotim_convention_model_name(
+        use_case_name=payload.get('use_case_name'),
+        dataset_identifier=payload.get('dataset_identifier'))
+    if payload['type'] == MlflowModelNotFoundError.__name__:
+        raise MlflowModelNotFoundError(model_name=model_name)
+    if payload['type'] == ModelArtifactsNotAvailableError.__name__:
+        raise ModelArtifactsNotAvailableError(model_name=model_name,
+                                              model_version=payload.get('model_version'))
+    raise RuntimeError(f"Scoring sidecar: {payload['type']}: {payload['message']}")
+
+
+class SidecarPredictionService:
+    """
+    Used in place of AutoTiMPredictionService by the Flask workers if SCORING_SIDECAR_SOCKET
+    is set: models are loaded and scored by the sidecar, features are created in the worker.
+    """
+
+    @inject
+    def __init__(self):
+        self.socket_path = os.environ['SCORING_SIDECAR_SOCKET']
+        # seconds to wait for the sidecar socket, e.g. while the sidecar is starting
+        self.connect_timeout = float(os.getenv('SCORING_SIDECAR_CONNECT_TIMEOUT', "60"))
+
+    def get_model(self, use_case_name: str, dataset_identifier: str,
+                  model_version: int = None) -> AutoTiM_Model:
+        request = {'use_case_name': use_case_name, 'dataset_identifier': dataset_identifier,
+                   'model_version': model_version}
+        description = self._request(GET_MODEL, request)
+        return AutoTiM_Model(use_case_name=description['use_case_name'],
+                             dataset_identifier=description['dataset_identifier'],
+                             model_version=description['model_version'],
+                             mlflow_model=SidecarModel(description=description),
+                             feature_settings=description['feature_settings'],
+                             model_params=description['params'],
+                             run_id=description['run_id'])
+
+    def predict(self, model: SidecarModel, features: pd.DataFrame) -> list:
+        memory, features_description = write_features(features)
+        try:
+            model_description = {key: model.description[key] for key in
+                                 ['use_case_name', 'dataset_identifier', 'model_version']}
+            return decode_predictions(self._request_frame(
+                PREDICT, encode_predict_request(model=model_description,
+                                                features=features_description)))
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def cache_stats(self) -> dict:
+        return self._request(CACHE_STATS, {})
+
+    def invalidate_stage_cache(self, use_case_name: str = None, dataset_identifier: str = None):
+        self._request(INVALIDATE, {'use_case_name': use_case_name,
+                                   'dataset_identifier': dataset_identifier})
+
+    def _request(self, message_type: int, payload: dict) -> dict:
+        return json.loads(self._request_frame(
+            message_type, json.dumps(payload, default=str).encode('utf-8')))
+
+    def _request_frame(self, message_type: int, data: bytes) -> bytes:
+        with self._connect() as connection:
+            send_frame(connection, message_type, data)
+            response_type, response = receive_frame(connection)
+        if response_type == ERROR:
+            raise_sidecar_error(json.loads(response))
+        return response
+
+    def _connect(self) -> socket.socket:
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                connection.connect(self.socket_path)
+                return connection
+            except (FileNotFoundError, ConnectionRefusedError):
+                connection.close()
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.1)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    socket_path = os.environ['SCORING_SIDECAR_SOCKET']
+    with ScoringServer(socket_path=socket_path,
+                       prediction_service=AutoTiMPredictionService()) as server:
+        logging.info(f"Scoring sidecar listening on {socket_path}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
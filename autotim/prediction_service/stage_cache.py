@@ -0,0 +1,55 @@
+"""Time-based cache for the resolution of model stages (e.g. Production) to model versions."""
+import threading
+import time
+
+
+class StageResolutionCache:
+    """
+    Caches which model version (and run id) a stage of a registered model points to.
+
+    Entries expire after ttl seconds, so that stage transitions done by other processes
+    (e.g. a training setting a new model to Production) are picked up eventually.
+    Use invalidate() to drop entries right away.
+
+    :param ttl: time to live of an entry in seconds, 0 disables the cache
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_name: str, stage: str):
+        """Returns a tuple of run id and model version or None if not cached or expired."""
+        with self._lock:
+            entry = self._entries.get((model_name, stage))
+            if entry is None or entry[2] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, model_name: str, stage: str, run_id: str, model_version):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[(model_name, stage)] = (run_id, model_version,
+                                                  time.monotonic() + self.ttl)
+
+    def invalidate(self, model_name: str = None, stage: str = None):
+        """Drops all entries matching model_name and stage, None matches every value."""
+        with self._lock:
+            for key in list(self._entries):
+                if (model_name is None or key[0] == model_name) and \
+                        (stage is None or key[1] == stage):
+                    del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'ttl': self.ttl,
+                    'hits': self.hits,
+                    'misses': self.misses}
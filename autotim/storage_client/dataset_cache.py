@@ -0,0 +1,148 @@
+"""
+Local cache of dataset files keyed by a key of their content (the MD5 checksum on GCS, size
+and modification time on local storage), shared by the trainings of a host, so that
+retraining on an unchanged dataset does not download it again.
+
+The key of a local file is not a checksum: a file rewritten with the same size within the
+granularity of the file system's modification time is served from the stale cache entry.
+"""
+import os
+import shutil
+import logging
+import tempfile
+import threading
+
+from injector import inject
+
+from autotim.storage_client.file_store_manager import FileStoreManager
+
+
+class DatasetCache:
+    """
+    Files are stored as <content key><extension> in DATASET_CACHE_DIR and hard linked into the
+    workspace of a training (copied if the workspace is on another file system). Once the
+    cached files exceed DATASET_CACHE_MAX_MB (0 = disabled), the least recently used files are
+    removed. Files are added atomically, so that the cache can be shared by processes.
+    """
+
+    @inject
+    def __init__(self):
+        self.directory = os.getenv('DATASET_CACHE_DIR',
+                                   os.path.join(tempfile.gettempdir(), 'autotim-dataset-cache'))
+        self.max_bytes = int(float(os.getenv('DATASET_CACHE_MAX_MB', "1024")) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if self.max_bytes > 0:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def fetch(self, file_client: FileStoreManager, prefix: str, output_path: str):
+        """
+        Places the files below prefix in output_path like file_client.download_dir, files
+        whose content key is in the cache are not downloaded.
+        """
+        keys = file_client.list_content_keys(prefix) if self.max_bytes > 0 else None
+        if not keys:
+            # no content keys (or no files, download_dir raises the usual error)
+            file_client.download_dir(output_path=output_path, prefix=prefix)
+            return
+
+        missing = [path for path, key in keys.items()
+                   if not self._link(key=key, path=path, output_path=output_path)]
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        logging.info(f"Dataset '{prefix}': {len(keys) - len(missing)} of {len(keys)} files "
+                     f"found in the dataset cache.")
+        if not missing:
+            return
+
+        with tempfile.TemporaryDirectory(dir=self.directory) as download_directory:
+            download_path = os.path.join(download_directory, 'download')
+            file_client.download_dir(output_path=download_path, prefix=prefix)
+            # a file that changed while it was downloaded is not cached under its old key
+            keys_after_download = file_client.list_content_keys(prefix) or {}
+            for path in missing:
+                downloaded = os.path.join(download_path, path)
+                if os.path.isfile(downloaded):
+                    self._add(downloaded=downloaded, path=path, output_path=output_path,
+                              key=keys[path] if keys_after_download.get(path) == keys[path]
+                              else None)
+        self._evict()
+
+    def size(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def stats(self) -> dict:
+        """Files and bytes in the cache (of all processes), hits and misses of this process."""
+        if self.max_bytes <= 0:
+            return {'enabled': False}
+        entries = self._entries()
+        with self._lock:
+            return {'enabled': True,
+                    'files': len(entries),
+                    'size': sum(entry.stat().st_size for entry in entries),
+                    'max_size': self.max_bytes,
+                    'hits': self.hits,
+                    'misses': self.misses}
+
+    def _cache_path(self, key: str, path: str) -> str:
+        # the extension is kept, e.g. to read the file as csv or parquet
+        return os.path.join(self.directory, key + os.path.splitext(path)[1])
+
+    def _link(self, key: str, path: str, output_path: str) -> bool:
+        """Links the cached file into output_path, False if it is not cached."""
+        cache_path = self._cache_path(key, path)
+        target = os.path.join(output_path, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(target)
+        try:
+            os.link(cache_path, target)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # e.g. the workspace is on another file system
+            try:
+                shutil.copyfile(cache_path, target)
+            except FileNotFoundError:
+                return False
+        try:
+            # the modification time orders the files for eviction
+            os.utime(cache_path)
+        except FileNotFoundError:
+            # evicted in between, the linked file is still complete
+            pass
+        return True
+
+    def _add(self, downloaded: str, path: str, output_path: str, key: str = None):
+        """Moves a downloaded file into the cache (unless key is None) and links it."""
+        target = os.path.join(output_path, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if key is None or os.path.getsize(downloaded) > self.max_bytes:
+            shutil.move(downloaded, target)
+            return
+        cache_path = self._cache_path(key, path)
+        os.replace(downloaded, cache_path)
+        if os.path.exists(target):
+            os.remove(target)
+        try:
+            os.link(cache_path, target)
+        except OSError:
+            shutil.copyfile(cache_path, target)
+
+    def _entries(self) -> list:
+        return [entry for entry in os.scandir(self.directory) if entry.is_file()]
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                # removed by another process
+                pass
+            size -= entry.stat().st_size
@@ -19,6 +19,15 @@ class FileStoreManager(ABC):
     def save_single_file(self, src: str, dest: str):
         raise NotImplementedError("You have called an abstract method!")
 
+    def list_content_keys(self, prefix: str):
+        """
+        Keys of the files below prefix that change with their content (e.g. a checksum), by
+        their path in the storage (as placed below the output path by download_dir). None if
+        the storage cannot provide them without reading the files.
+        """
+        # pylint: disable=unused-argument
+        return None
+
 class StorageDoesNotExistError(Exception):
     pass
 
@@ -1,11 +1,10 @@
 """Connect to Google Cloud Bucket."""
 import os
+import base64
 import glob
 import logging
 import shutil
 
-import gcsfs
-
 from injector import inject
 from google.auth import exceptions as auth_exception
 from google.cloud.storage import Client, Bucket
@@ -14,20 +13,21 @@ from google.api_core.exceptions import BadRequest, Forbidden
 
 from autotim.storage_client.file_store_manager import FileStoreManager, \
     StorageDoesNotExistError, DownloadFromStorageFailedError
-from autotim.storage_client.gcs_storage_config import Config
+from autotim.storage_client.gcs_storage_config import get_config
 
 
 class GCSBucketClient(FileStoreManager):
     @inject
     def __init__(self, bucket_name: str = ""):
         FileStoreManager.__init__(self=self)
+        config = get_config()
         try:
             credentials = service_account.Credentials.from_service_account_info(
-                Config.GOOGLE_CLOUD_CREDENTIALS)
-            self._gcs_client = Client(project=Config.GOOGLE_CLOUD_PROJECT,
+                config.GOOGLE_CLOUD_CREDENTIALS)
+            self._gcs_client = Client(project=config.GOOGLE_CLOUD_PROJECT,
                                       credentials=credentials)
 
-            self._bucket_name = Config.GOOGLE_CLOUD_BUCKET \
+            self._bucket_name = config.GOOGLE_CLOUD_BUCKET \
                 if (bucket_name is None or bucket_name == "") \
                 else bucket_name
             self._bucket = self._init_bucket_client(self._bucket_name)
@@ -57,6 +57,18 @@ class GCSBucketClient(FileStoreManager):
             if os.path.isfile(local_file):
                 self.save_single_file(src=local_file, dest=dest_blob_name)
 
+    def list_content_keys(self, prefix: str):
+        try:
+            blobs = [blob for blob in self._bucket.list_blobs(prefix=prefix)
+                     if not blob.name.endswith('/')]
+        except AttributeError as ae:
+            raise BucketNotFoundException(bucket_name=self._bucket_name) from ae
+        if any(blob.md5_hash is None for blob in blobs):
+            # e.g. composite objects, which only have a crc32c checksum
+            return None
+        # the MD5 checksum is stored with each object
+        return {blob.name: base64.b64decode(blob.md5_hash).hex() for blob in blobs}
+
     def download_dir(self, output_path, prefix=""):
         if not self.dir_exists(prefix):
             logging.warning(f"Path '{prefix}' in bucket '"
@@ -98,6 +110,7 @@ class GCSBucketClient(FileStoreManager):
         """
         :return: GCSFileSystem ready to interact with the project's storage bucket on gcs
         """
+        import gcsfs  # pylint: disable=import-outside-toplevel
 
         try:
             gcs_filesystem = gcsfs.GCSFileSystem(project=os.getenv('GOOGLE_CLOUD_PROJECT'),
@@ -39,6 +39,17 @@ class LocalStorageClient(FileStoreManager):
                 logging.error("Permission denied while uploading file with LocalStorageClient.")
             raise UploadToStorageFailedError(src) from e
 
+    def list_content_keys(self, prefix: str):
+        # size and modification time, reading every file would cost as much as copying it
+        keys = {}
+        for directory, _, files in os.walk(os.path.join(self._directory_path, prefix)):
+            for file in files:
+                path = os.path.join(directory, file)
+                relative_path = os.path.relpath(path, self._directory_path)
+                stat = os.stat(path)
+                keys[relative_path.replace(os.sep, '/')] = f"{stat.st_size}-{stat.st_mtime_ns}"
+        return keys
+
     def download_dir(self, output_path, prefix: str = ""):
         try:
             # check if a tree / part of the tree to be copied exists
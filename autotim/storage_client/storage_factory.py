@@ -0,0 +1,21 @@
+"""Selects the storage client, shared by the service and the training processes."""
+import os
+
+from autotim.storage_client.file_store_manager import FileStoreManager
+from autotim.storage_client.local_client import LocalStorageClient
+
+
+def get_storage_client_class() -> type:
+    """LocalStorageClient if the environment variable STORAGE is 'local', GCSBucketClient else."""
+    if os.getenv("STORAGE") == "local":
+        return LocalStorageClient
+
+    os.environ["STORAGE"] = 'GCS'
+    # the google cloud clients are only imported if they are used
+    from autotim.storage_client.gcs_bucket_client import \
+        GCSBucketClient  # pylint: disable=import-outside-toplevel
+    return GCSBucketClient
+
+
+def create_storage_client() -> FileStoreManager:
+    return get_storage_client_class()()
@@ -0,0 +1,181 @@
+"""
+Runs training jobs in separate processes, so that a training does not block a worker of the
+service. A job is submitted by /train, waits in the job store until a training slot is free
+and is then run by the training process started for it.
+"""
+import os
+import math
+import time
+import logging
+import threading
+import multiprocessing
+from functools import partial
+
+from flask_api import status
+from injector import inject
+
+from autotim.app.admission_control import AdmissionRejectedError
+from autotim.model_training.training_config import TrainingConfig
+from autotim.model_training.training_scheduler import TrainingScheduler
+from autotim.storage_client.dataset_cache import DatasetCache
+from autotim.storage_client.storage_factory import create_storage_client
+from autotim.training_jobs.job_store import JobStore, ACTIVE, COMPLETED
+
+def wait_for_slot(job_store: JobStore, job_id: str, max_running: int, max_wait: float,
+                  poll_interval: float = 1.0) -> bool:
+    """
+    Waits until the job is claimed, fails it if it waited longer than max_wait seconds
+        (0 = no limit).
+
+    :return: True if the job is running now
+    """
+    deadline = time.monotonic() + max_wait if max_wait > 0 else None
+    while not job_store.claim(job_id, max_running=max_running):
+        if deadline is not None and time.monotonic() > deadline:
+            job_store.finish(job_id, result={'training': "failed",
+                                             'error': "The training waited too long for a "
+                                                      "free training slot, please retry."},
+                             http_status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            return False
+        time.sleep(poll_interval)
+    return True
+
+
+def run_job(job_id: str, max_running: int, max_wait: float):
+    """Entry point of the training process of a job."""
+    # imported in the training process only, the workers do not need the training modules
+    from autotim.app.endpoints.utils.model_creation_utils import \
+        train  # pylint: disable=import-outside-toplevel
+
+    logging.basicConfig(level=logging.INFO)
+    job_store = JobStore()
+    # also recorded by the submitting worker, which might exit before it can do so
+    job_store.set_worker(job_id, pid=os.getpid())
+    if not wait_for_slot(job_store=job_store, job_id=job_id, max_running=max_running,
+                         max_wait=max_wait):
+        return
+    job = job_store.get(job_id)
+    logging.info(f"Starting training job {job_id} for {job['use_case_name']}/"
+                 f"{job['dataset_identifier']}")
+
+    dataset_cache = DatasetCache()
+    try:
+        result, http_status = train(name=job['use_case_name'],
+                                    identifier=job['dataset_identifier'],
+                                    file_client=create_storage_client(),
+                                    config=TrainingConfig(**job['params']),
+                                    on_stage=partial(job_store.set_stage, job_id),
+                                    dataset_cache=dataset_cache)
+    except Exception as e:  # pylint: disable=broad-except
+        logging.exception(e)
+        result, http_status = {'training': "failed",
+                               'error': "Internal error during training occurred."}, \
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+    # summed over all jobs by the job store, this process exits after the job
+    result = {**result, 'dataset_cache': {'hits': dataset_cache.hits,
+                                          'misses': dataset_cache.misses}}
+    job_store.finish(job_id, result=result, http_status=http_status)
+    logging.info(f"Training job {job_id} finished with status {http_status}")
+
+
+# the job store and dataset cache it hands to its jobs, plus the limits of this host
+class TrainingJobRunner:  # pylint: disable=too-many-instance-attributes
+    """
+    Submits training jobs and starts a training process for each of them. At most
+    TRAIN_MAX_CONCURRENT jobs (0 = unlimited) run at once on this host, up to TRAIN_MAX_QUEUE
+    further jobs wait (in the order of the training scheduler) for at most
+    TRAIN_MAX_QUEUE_SECONDS (0 = no limit), further submissions are rejected. The AutoML runs
+    of running jobs are limited separately by the training scheduler.
+    """
+
+    @inject
+    def __init__(self, job_store: JobStore, dataset_cache: DatasetCache = None):
+        self.job_store = job_store
+        self.dataset_cache = dataset_cache if dataset_cache is not None else DatasetCache()
+        # jobs prepare their data and features while another job's AutoML run is scheduled
+        self.max_running = int(os.getenv('TRAIN_MAX_CONCURRENT', "2"))
+        self.max_queue = int(os.getenv('TRAIN_MAX_QUEUE', "16"))
+        self.max_wait = float(os.getenv('TRAIN_MAX_QUEUE_SECONDS', "0"))
+        self.scheduler = TrainingScheduler()
+        # training processes are started without the state (threads, h2o connection)
+        # of the worker
+        self._context = multiprocessing.get_context('spawn')
+        self._processes = []
+        self._lock = threading.Lock()
+
+    def submit(self, use_case_name: str, dataset_identifier: str,
+               config: TrainingConfig, on_completed=None) -> str:
+        """
+        Queues a training job with its config and starts its training process.
+
+        :param on_completed: optional callable, called in this process once the training
+            process has completed the job (e.g. to drop the resolved Production stage)
+        :return: job id
+        :raises AdmissionRejectedError: if too many jobs are queued or running
+        """
+        max_active = self.max_running + self.max_queue if self.max_running > 0 else 0
+        job_id = self.job_store.submit(use_case_name=use_case_name,
+                                       dataset_identifier=dataset_identifier,
+                                       params=config.to_params(), priority=config.priority,
+                                       max_active=max_active)
+        if job_id is None:
+            raise AdmissionRejectedError(name='train', status=status.HTTP_429_TOO_MANY_REQUESTS,
+                                         retry_after=self.retry_after())
+        process = self._context.Process(target=run_job, name=f'autotim-training-{job_id}',
+                                        args=(job_id, self.max_running, self.max_wait))
+        self._reap()
+        with self._lock:
+            try:
+                process.start()
+            except OSError:
+                self.job_store.finish(job_id, result={'training': "failed",
+                                                      'error': "Could not start training."},
+                                      http_status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                raise
+            self._processes.append(process)
+        self.job_store.set_worker(job_id, pid=process.pid)
+        if on_completed is not None:
+            threading.Thread(target=self._notify, name=f'autotim-training-{job_id}-notify',
+                             args=(job_id, process, on_completed), daemon=True).start()
+        return job_id
+
+    def get(self, job_id: str):
+        self._reap()
+        return self.job_store.get(job_id)
+
+    def retry_after(self) -> int:
+        """Seconds until the queued and running jobs are expected to be done."""
+        duration = self.job_store.average_duration()
+        if duration is None or self.max_running <= 0:
+            return 60
+        counts = self.job_store.counts()
+        active = sum(counts[job_status] for job_status in ACTIVE)
+        return max(1, math.ceil(duration * active / self.max_running))
+
+    def stats(self) -> dict:
+        self._reap()
+        dataset_cache = self.dataset_cache.stats()
+        if dataset_cache['enabled']:
+            # the trainings use the cache in their own processes
+            dataset_cache.update(self.job_store.dataset_cache_counts())
+        return {**self.job_store.counts(), 'max_concurrent': self.max_running,
+                'max_queue': self.max_queue, 'automl_runs': self.scheduler.stats(),
+                'dataset_cache': dataset_cache}
+
+    def _notify(self, job_id: str, process, on_completed):
+        """Calls on_completed once process has exited, if it completed the job."""
+        process.join()
+        job = self.job_store.get(job_id)
+        if job is None or job['status'] != COMPLETED:
+            return
+        try:
+            on_completed()
+        except Exception as e:  # pylint: disable=broad-except
+            logging.warning(f"Notifying the completion of training job {job_id} failed: {e}")
+
+    def _reap(self):
+        """Reaps exited training processes and fails jobs whose process exited unexpectedly."""
+        with self._lock:
+            # is_alive() joins processes that have exited
+            self._processes = [p for p in self._processes if p.is_alive()]
+        self.job_store.fail_orphaned()
@@ -0,0 +1,241 @@
+"""
+Keeps the state, stage progress and result of training jobs in a local SQLite database,
+shared by all worker processes of the service and the training processes.
+"""
+import json
+import time
+import uuid
+import sqlite3
+from collections import Counter
+from contextlib import closing
+from datetime import datetime, timezone
+
+from injector import inject
+
+from autotim.model_training.training_scheduler import get_database_path, process_is_alive, \
+    schedule_key
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+# seconds until the process of a job has recorded its pid, jobs without one are failed after
+# that (e.g. the submitting worker died before the process was started)
+WORKER_START_TIMEOUT = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS training_jobs (
+    job_id TEXT PRIMARY KEY,
+    use_case_name TEXT NOT NULL,
+    dataset_identifier TEXT NOT NULL,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    stage TEXT,
+    stages TEXT NOT NULL DEFAULT '[]',
+    result TEXT,
+    http_status INTEGER,
+    worker_pid INTEGER,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+
+def to_isoformat(timestamp: float):
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat() \
+        if timestamp is not None else None
+
+
+class JobStore:
+    """
+    Training jobs in the SQLite database at TRAINING_JOB_STORE. State changes that depend on
+    other jobs (submit, claim) run in an exclusive transaction, so that they are atomic across
+    processes. Queued jobs are started in the order of the training scheduler (priority, then
+    fairly across use cases, then first come, first served).
+    """
+
+    @inject
+    def __init__(self):
+        self.path = get_database_path()
+        with closing(self._connect()) as connection:
+            connection.execute(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # autocommit, transactions are started explicitly
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def submit(self, use_case_name: str, dataset_identifier: str, params: dict,
+               priority: int = 0, max_active: int = 0):
+        """
+        Adds a queued job.
+
+        :param priority: jobs with a higher priority are started first
+        :param max_active: maximum number of queued and running jobs, 0 = unlimited
+        :return: job id or None if max_active jobs are queued or running already
+        """
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                if 0 < max_active <= self._count(connection, *ACTIVE):
+                    return None
+                connection.execute(
+                    'INSERT INTO training_jobs (job_id, use_case_name, dataset_identifier, '
+                    'params, priority, status, submitted_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, use_case_name, dataset_identifier, json.dumps(params), priority,
+                     QUEUED, time.time()))
+            finally:
+                connection.execute('COMMIT')
+        return job_id
+
+    def set_worker(self, job_id: str, pid: int):
+        """Records the process that runs the job, used to detect jobs of crashed processes."""
+        with closing(self._connect()) as connection:
+            connection.execute('UPDATE training_jobs SET worker_pid = ? WHERE job_id = ?',
+                               (pid, job_id))
+
+    def claim(self, job_id: str, max_running: int = 0) -> bool:
+        """
+        Starts a queued job if it is next in line and less than max_running (0 = unlimited)
+            jobs are running.
+
+        :return: True if the job is running now
+        """
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._fail_orphaned(connection)
+                jobs = connection.execute(
+                    'SELECT job_id, use_case_name, priority, status, submitted_at '
+                    'FROM training_jobs WHERE status IN (?, ?)', ACTIVE).fetchall()
+                running = [job for job in jobs if job['status'] == RUNNING]
+                queued = [job for job in jobs if job['status'] == QUEUED]
+                if not queued or 0 < max_running <= len(running):
+                    return False
+                running_per_use_case = Counter(job['use_case_name'] for job in running)
+                last_started = dict(connection.execute(
+                    'SELECT use_case_name, MAX(started_at) FROM training_jobs '
+                    'WHERE started_at IS NOT NULL GROUP BY use_case_name').fetchall())
+                next_job = min(queued, key=lambda job: schedule_key(
+                    priority=job['priority'], use_case_name=job['use_case_name'],
+                    enqueued_at=job['submitted_at'],
+                    running_per_use_case=running_per_use_case, last_started=last_started))
+                if next_job['job_id'] != job_id:
+                    return False
+                connection.execute(
+                    'UPDATE training_jobs SET status = ?, started_at = ? WHERE job_id = ?',
+                    (RUNNING, time.time(), job_id))
+                return True
+            finally:
+                connection.execute('COMMIT')
+
+    def set_stage(self, job_id: str, stage: str):
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute('SELECT stages FROM training_jobs WHERE job_id = ?',
+                                         (job_id,)).fetchone()
+                stages = json.loads(row['stages']) + \
+                    [{'stage': stage, 'started_at': to_isoformat(time.time())}]
+                connection.execute(
+                    'UPDATE training_jobs SET stage = ?, stages = ? WHERE job_id = ?',
+                    (stage, json.dumps(stages), job_id))
+            finally:
+                connection.execute('COMMIT')
+
+    def finish(self, job_id: str, result: dict, http_status: int):
+        """Stores the result of a job, it is completed with a 2xx http_status, failed otherwise."""
+        job_status = COMPLETED if 200 <= http_status < 300 else FAILED
+        with closing(self._connect()) as connection:
+            connection.execute(
+                'UPDATE training_jobs SET status = ?, result = ?, http_status = ?, '
+                'finished_at = ? WHERE job_id = ?',
+                (job_status, json.dumps(result), http_status, time.time(), job_id))
+
+    def get(self, job_id: str):
+        """:return: the job as dict or None if there is no job with this id"""
+        with closing(self._connect()) as connection:
+            row = connection.execute('SELECT * FROM training_jobs WHERE job_id = ?',
+                                     (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {'job_id': row['job_id'],
+                'use_case_name': row['use_case_name'],
+                'dataset_identifier': row['dataset_identifier'],
+                'status': row['status'],
+                'priority': row['priority'],
+                'stage': row['stage'],
+                'stages': json.loads(row['stages']),
+                'params': json.loads(row['params']),
+                'submitted_at': to_isoformat(row['submitted_at']),
+                'started_at': to_isoformat(row['started_at']),
+                'finished_at': to_isoformat(row['finished_at']),
+                'http_status': row['http_status'],
+                'result': json.loads(row['result']) if row['result'] is not None else None}
+
+    def counts(self) -> dict:
+        """Number of jobs per status."""
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                'SELECT status, COUNT(*) AS jobs FROM training_jobs GROUP BY status').fetchall()
+        return {**{job_status: 0 for job_status in (QUEUED, RUNNING, COMPLETED, FAILED)},
+                **{row['status']: row['jobs'] for row in rows}}
+
+    def average_duration(self, last: int = 20):
+        """Average seconds of the last finished jobs, None if no job has finished yet."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                'SELECT AVG(finished_at - started_at) AS duration FROM ('
+                'SELECT finished_at, started_at FROM training_jobs WHERE started_at IS NOT NULL '
+                'AND finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT ?)',
+                (last,)).fetchone()
+        return row['duration']
+
+    def dataset_cache_counts(self) -> dict:
+        """Dataset cache hits and misses summed over the results of all jobs."""
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT COALESCE(SUM(json_extract(result, '$.dataset_cache.hits')), 0) AS hits, "
+                "COALESCE(SUM(json_extract(result, '$.dataset_cache.misses')), 0) AS misses "
+                "FROM training_jobs WHERE result IS NOT NULL").fetchone()
+        return {'hits': row['hits'], 'misses': row['misses']}
+
+    @staticmethod
+    def _count(connection: sqlite3.Connection, *statuses) -> int:
+        placeholders = ', '.join('?' * len(statuses))
+        return connection.execute(
+            f'SELECT COUNT(*) FROM training_jobs WHERE status IN ({placeholders})',
+            statuses).fetchone()[0]
+
+    def fail_orphaned(self):
+        """Fails active jobs whose process has exited (e.g. killed), so they do not block others."""
+        with closing(self._connect()) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._fail_orphaned(connection)
+            finally:
+                connection.execute('COMMIT')
+
+    @staticmethod
+    def _fail_orphaned(connection: sqlite3.Connection):
+        rows = connection.execute(
+            'SELECT job_id, worker_pid, submitted_at FROM training_jobs '
+            'WHERE status IN (?, ?)', ACTIVE).fetchall()
+        started_before = time.time() - WORKER_START_TIMEOUT
+        for row in rows:
+            if row['worker_pid'] is None and row['submitted_at'] >= started_before:
+                # the process might still be starting
+                continue
+            if row['worker_pid'] is None or not process_is_alive(row['worker_pid']):
+                connection.execute(
+                    'UPDATE training_jobs SET status = ?, result = ?, http_status = ?, '
+                    'finished_at = ? WHERE job_id = ?',
+                    (FAILED, json.dumps({'training': "failed",
+                                         'error': "The training process exited unexpectedly."}),
+                     500, time.time(), row['job_id']))
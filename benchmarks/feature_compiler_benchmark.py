@@ -0,0 +1,49 @@
+"""
+Compares tsfresh with the compiled NumPy evaluation of feature settings (FEATURE_EVALUATOR)
+for the natively supported calculators of tsfresh's ComprehensiveFCParameters.
+
+Usage (from the repository root):
+    python -m benchmarks.feature_compiler_benchmark --series 1000 --length 100
+"""
+# the benchmark imports what tests_autotim/feature_engineering/feature_compiler_test.py imports
+# pylint: disable=duplicate-code
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+from tsfresh import extract_features
+from tsfresh.feature_extraction import ComprehensiveFCParameters
+
+from autotim.feature_engineering.feature_compiler import FeaturePlan, NATIVE_CALCULATORS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=1000)
+    parser.add_argument('--length', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    data = pd.DataFrame({'id': np.repeat(np.arange(args.series), args.length),
+                         'value': rng.normal(size=args.series * args.length)})
+    settings = {'value': {name: parameters
+                          for name, parameters in ComprehensiveFCParameters().items()
+                          if name in NATIVE_CALCULATORS}}
+    plan = FeaturePlan(settings=settings)
+
+    compiled = min(timeit.repeat(lambda: plan.evaluate(data, column_id='id'),
+                                 number=1, repeat=args.repeat))
+    tsfresh = min(timeit.repeat(lambda: extract_features(
+        data, column_id='id', kind_to_fc_parameters=settings, n_jobs=0,
+        disable_progressbar=True), number=1, repeat=args.repeat))
+    print(f"{args.series} series x {args.length} values, "
+          f"{plan.evaluate(data, column_id='id').shape[1]} features")
+    print(f"tsfresh  {tsfresh * 1000:10.1f} ms")
+    print(f"compiled {compiled * 1000:10.1f} ms ({tsfresh / compiled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
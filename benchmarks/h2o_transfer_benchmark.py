@@ -0,0 +1,81 @@
+"""
+Compares the previous pandas -> h2o upload (default H2OFrame parse, header-row check and
+per-column asnumeric()) and csv based download of predictions with h2o_frame_utils.
+
+Requires java, as a local h2o cluster is started.
+
+Usage (from the repository root):
+    python -m benchmarks.h2o_transfer_benchmark --rows 500 --columns 1000 5000 10000
+"""
+import sys
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+import h2o
+
+from autotim.app.endpoints.utils.h2o_frame_utils import download_column, upload_frame
+
+
+def create_features(rows: int, columns: int) -> pd.DataFrame:
+    """Creates a feature matrix with tsfresh-like column names."""
+    rng = np.random.default_rng(42)
+    names = [f'value__fft_coefficient__attr_"real"__coeff_{i}' for i in range(columns)]
+    return pd.DataFrame(rng.normal(size=(rows, columns)), columns=names)
+
+
+def legacy_upload(features: pd.DataFrame) -> h2o.H2OFrame:
+    frame = h2o.H2OFrame(features)
+    if len(frame) == len(features) + 1:
+        frame = frame.drop([0], axis=0)
+    for column in frame.columns:
+        frame[column] = frame[column].asnumeric()
+    # force evaluation of the lazy asnumeric expressions
+    frame.refresh()
+    return frame
+
+
+def typed_upload(features: pd.DataFrame) -> h2o.H2OFrame:
+    frame = upload_frame(features)
+    frame.refresh()
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--columns', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help="only measure h2o_frame_utils, the legacy upload of 10k columns "
+                             "takes several minutes")
+    args = parser.parse_args()
+    # the legacy upload builds one nested expression per column
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 3000))
+    h2o.init()
+
+    print(f"{'columns':>8}{'legacy upload [s]':>20}{'typed upload [s]':>19}")
+    for columns in args.columns:
+        features = create_features(rows=args.rows, columns=columns)
+        typed = min(timeit.repeat(lambda features=features: typed_upload(features),
+                                  number=1, repeat=args.repeat))
+        legacy = float('nan') if args.skip_legacy else \
+            min(timeit.repeat(lambda features=features: legacy_upload(features),
+                              number=1, repeat=args.repeat))
+        print(f"{columns:>8}{legacy:>20.2f}{typed:>19.2f}")
+
+    predictions = upload_frame(pd.DataFrame({'predict': np.arange(args.rows) % 2,
+                                             'p0': np.full(args.rows, 0.5),
+                                             'p1': np.full(args.rows, 0.5)}),
+                               column_types={'predict': 'enum'})
+    legacy = min(timeit.repeat(predictions.as_data_frame, number=1, repeat=args.repeat))
+    columnar = min(timeit.repeat(lambda: download_column(predictions, 'predict'),
+                                 number=1, repeat=args.repeat))
+    print(f"download of {args.rows} predictions: as_data_frame {legacy * 1000:.1f} ms, "
+          f"download_column {columnar * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares the time needed to decode /predict and /store uploads in the supported input formats.
+
+Usage (from the repository root):
+    python -m benchmarks.input_formats_benchmark --series 1000 --length 500 --kinds 3
+"""
+import io
+import argparse
+import timeit
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from werkzeug.datastructures import FileStorage
+
+from autotim.app.endpoints.utils.file_handling_utils import read_timeseries_from_file
+
+
+def create_dataset(series: int, length: int, kinds: int) -> pd.DataFrame:
+    """Creates a dataset in long format with one row per series, time step and kind."""
+    rng = np.random.default_rng(42)
+    rows = series * length * kinds
+    return pd.DataFrame({
+        'id': np.repeat(np.arange(series), length * kinds),
+        'time': np.tile(np.repeat(np.arange(length), kinds), series),
+        'kind': np.tile([f'sensor_{k}' for k in range(kinds)], series * length),
+        'value': rng.normal(size=rows)
+    })
+
+
+def serialize(dataset: pd.DataFrame) -> dict:
+    """Returns the dataset as bytes for each input format, keyed by file extension."""
+    table = pa.Table.from_pandas(dataset, preserve_index=False)
+    arrow_sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(arrow_sink, table.schema) as writer:
+        writer.write_table(table)
+    parquet_buffer = io.BytesIO()
+    dataset.to_parquet(parquet_buffer, index=False)
+
+    return {'csv': dataset.to_csv(index=False).encode('utf-8'),
+            'json': dataset.to_json(orient='records').encode('utf-8'),
+            'parquet': parquet_buffer.getvalue(),
+            'arrow': arrow_sink.getvalue().to_pybytes()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=1000)
+    parser.add_argument('--length', type=int, default=500)
+    parser.add_argument('--kinds', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    dataset = create_dataset(series=args.series, length=args.length, kinds=args.kinds)
+    print(f"{len(dataset)} rows ({args.series} series x {args.length} steps x {args.kinds} kinds)")
+    print(f"{'format':<10}{'size [MB]':>12}{'decode [ms]':>14}{'vs. csv':>10}")
+
+    csv_time = None
+    for extension, payload in serialize(dataset).items():
+        def decode(payload=payload, extension=extension):
+            file = FileStorage(stream=io.BytesIO(payload), filename=f'data.{extension}')
+            return read_timeseries_from_file(file)
+
+        assert len(decode()) == len(dataset)
+        decode_time = min(timeit.repeat(decode, number=1, repeat=args.repeat))
+        csv_time = decode_time if extension == 'csv' else csv_time
+        print(f"{extension:<10}{len(payload) / 1024 ** 2:>12.1f}{decode_time * 1000:>14.1f}"
+              f"{csv_time / decode_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
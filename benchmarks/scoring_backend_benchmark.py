@@ -0,0 +1,68 @@
+"""
+Compares the scoring latency of a trained model with the h2o cluster and with its MOJO
+(SCORING_BACKEND=cluster / mojo), features are created once and shared by both backends.
+
+Requires java, MLFLOW_TRACKING_URI and a model trained with MOJO export.
+
+Usage (from the repository root):
+    python -m benchmarks.scoring_backend_benchmark --use-case-name <use case> \
+        --dataset-identifier <dataset> --model-version 1 --file timeseries.csv
+"""
+import argparse
+import timeit
+
+import h2o
+import mlflow
+import pandas as pd
+
+from autotim.feature_engineering.automated_feature_engineering import create_features
+from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+from autotim.prediction_service.mlflow_model_loader import MlFlowModelLoader
+
+
+def load_model(backend: str, args) -> AutoTiM_Model:
+    loader = MlFlowModelLoader(mlflow_client=mlflow.tracking.MlflowClient(),
+                               scoring_backend=backend)
+    return loader.retrieve_mlflow_model_data(
+        model_sceleton=AutoTiM_Model(use_case_name=args.use_case_name,
+                                     dataset_identifier=args.dataset_identifier,
+                                     model_version=args.model_version))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--use-case-name', required=True)
+    parser.add_argument('--dataset-identifier', required=True)
+    parser.add_argument('--model-version', required=True, type=int)
+    parser.add_argument('--file', required=True, help="csv file with time series to score")
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    h2o.init()
+
+    models = {backend: load_model(backend, args) for backend in ['cluster', 'mojo']}
+    autotim_model = models['cluster']
+    params = autotim_model.params
+    features = create_features(dataframe=pd.read_csv(args.file),
+                               settings=autotim_model.feature_settings,
+                               column_id=params.get('column_id'),
+                               column_value=params.get('column_value'),
+                               column_kind=params.get('column_kind'),
+                               column_sort=params.get('column_sort'))
+    print(f"{len(features)} series, {features.shape[1]} features")
+
+    predictions = {}
+    for backend, model in models.items():
+        predictions[backend] = AutoTiMPredictionService.predict(model=model.model,
+                                                                features=features)
+        times = timeit.repeat(lambda model=model: AutoTiMPredictionService.predict(
+            model=model.model, features=features), number=1, repeat=args.repeat)
+        print(f"{backend:<8} min {min(times) * 1000:8.1f} ms, "
+              f"mean {sum(times) / len(times) * 1000:8.1f} ms")
+    print("predictions equal:", predictions['cluster'] == predictions['mojo'])
+    models['mojo'].model.remove()
+
+
+if __name__ == "__main__":
+    main()
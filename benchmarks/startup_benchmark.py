@@ -0,0 +1,95 @@
+"""
+Measures the startup of the AutoTiM service: the import time of the heaviest modules
+imported by autotim.app.app (python -X importtime) and the time from starting gunicorn
+until the first request is served, with and without preloading the app in the master.
+
+Usage (from the repository root, with the environment of the service):
+    python -m benchmarks.startup_benchmark --top 15 --workers 2
+"""
+import os
+import re
+import sys
+import time
+import socket
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+
+IMPORT_TIME = re.compile(r'import time:\s+\d+ \|\s+(\d+) \| *(\S+)')
+
+
+def measure_imports(module: str) -> list:
+    """Returns (cumulative seconds, module) of all modules imported by module."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            imports.append((int(match.group(1)) / 1e6, match.group(2)))
+    return imports
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_request(preload: bool, workers: int, timeout: float) -> float:
+    """Starts gunicorn and returns the seconds until GET / is answered."""
+    port = free_port()
+    env = {**os.environ, 'GUNICORN_BIND': f'127.0.0.1:{port}',
+           'GUNICORN_WORKERS': str(workers), 'GUNICORN_PRELOAD_APP': str(preload).lower(),
+           'GUNICORN_LOG_LEVEL': 'warning'}
+    start = time.perf_counter()
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [sys.executable, '-m', 'gunicorn', '-c', 'autotim/app/gunicorn.conf.py',
+         'autotim.app.app:app'], env=env)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1):
+                    return time.perf_counter() - start
+            except urllib.error.HTTPError:
+                # e.g. 401 without credentials, the request was still served
+                return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.05)
+        raise TimeoutError(f"No response from gunicorn within {timeout} s.")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='autotim.app.app')
+    parser.add_argument('--top', type=int, default=15,
+                        help="number of top-level packages to list by import time")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    imports = measure_imports(args.module)
+    total = next(seconds for seconds, name in imports if name == args.module)
+    packages = {}
+    for seconds, name in imports:
+        package = name.split('.')[0]
+        # modules are listed after their submodules, the outermost import is the largest
+        packages[package] = max(packages.get(package, 0), seconds)
+    print(f"import {args.module}: {total:.2f} s")
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<30}{seconds:8.2f} s")
+
+    for preload in [False, True]:
+        seconds = time_to_first_request(preload=preload, workers=args.workers,
+                                        timeout=args.timeout)
+        print(f"first request with {args.workers} workers, preload_app={preload}: "
+              f"{seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import threading
+import time
+import unittest
+
+from autotim.app.admission_control import AdmissionLimiter, AdmissionRejectedError, Admission
+
+
+class AdmissionLimiterTest(unittest.TestCase):
+    def test_requests_beyond_the_queue_are_rejected_with_429(self):
+        limiter = AdmissionLimiter(name='predict', max_concurrent=1, max_queue=0, max_wait=1)
+        limiter.acquire()
+
+        with self.assertRaises(AdmissionRejectedError) as context:
+            limiter.acquire()
+
+        self.assertEqual(context.exception.status, 429)
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+        self.assertEqual(limiter.stats()['rejected'], 1)
+
+    def test_queued_requests_time_out_with_503(self):
+        limiter = AdmissionLimiter(name='predict', max_concurrent=1, max_queue=1, max_wait=0.05)
+        limiter.acquire()
+
+        with self.assertRaises(AdmissionRejectedError) as context:
+            limiter.acquire()
+
+        self.assertEqual(context.exception.status, 503)
+        self.assertEqual(limiter.stats()['queued'], 0)
+        self.assertEqual(limiter.stats()['timed_out'], 1)
+
+    def test_queued_request_is_admitted_once_a_slot_is_released(self):
+        limiter = AdmissionLimiter(name='train', max_concurrent=1, max_queue=1, max_wait=5)
+        admission = Admission(limiter=limiter).acquire()
+        queued = threading.Thread(target=limiter.acquire)
+        queued.start()
+        time.sleep(0.05)
+        self.assertEqual(limiter.stats()['queued'], 1)
+
+        admission.release()
+        queued.join(timeout=1)
+
+        self.assertEqual(limiter.stats()['running'], 1)
+        self.assertEqual(limiter.stats()['admitted'], 2)
+
+    def test_zero_max_concurrent_admits_everything(self):
+        limiter = AdmissionLimiter(name='predict', max_concurrent=0, max_queue=0, max_wait=0)
+
+        for _ in range(10):
+            limiter.acquire()
+
+        self.assertEqual(limiter.stats()['running'], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
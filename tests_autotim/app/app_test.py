@@ -10,6 +10,7 @@ from autotim.app.authconfig import AuthConfig
 from autotim.storage_client.file_store_manager import FileStoreManager
 
 from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+from autotim.training_jobs.job_runner import TrainingJobRunner
 
 
 AUTH_HEADER = {
@@ -26,6 +27,7 @@ class AppTest(unittest.TestCase):
 
         self.file_client_mock = MagicMock(autospec=FileStoreManager)
         self.autotim_prediction_service = MagicMock(autospec=AutoTiMPredictionService)
+        self.training_job_runner = MagicMock(autospec=TrainingJobRunner)
         FlaskInjector(app=self.app, modules=[self.configure_mocks])
 
         self.client = self.app.test_client()
@@ -34,6 +36,7 @@ class AppTest(unittest.TestCase):
         binder.bind(FileStoreManager, to=self.file_client_mock, scope=singleton)
         binder.bind(AutoTiMPredictionService, to=self.autotim_prediction_service,
                     scope=singleton)
+        binder.bind(TrainingJobRunner, to=self.training_job_runner, scope=singleton)
 
 
 class RouteTest(AppTest):
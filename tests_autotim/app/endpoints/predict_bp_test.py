@@ -2,19 +2,22 @@
 import io
 
 import pandas as pd
+import pyarrow as pa
 from h2o import H2OFrame
-from mock import patch
+from mock import patch, MagicMock
 
 from mlflow.exceptions import MlflowException
 from requests.exceptions import ConnectionError
 
+from autotim.app.admission_control import AdmissionRejectedError
 from autotim.model_selection.exceptions import MlflowModelNotFoundError
 from autotim.feature_engineering.exceptions import FeatureCreationFailedError
 
 from autotim.app.endpoints.utils.reponse_utils import RESPONSE_400_INPUT_FORMAT_WRONG, \
     RESPONSE_400_NO_REQUIRED_PARAM, RESPONSE_500_INTERNAL_SERVER_ERROR 
 from autotim.app.endpoints.predict_bp import RESPONSE_404_MODEL_NOT_FOUND, \
-     RESPONSE_400_FEATURES_NOT_CREATED
+     RESPONSE_400_FEATURES_NOT_CREATED, RESPONSE_400_MANIFEST_WRONG, \
+     RESPONSE_400_MODEL_VERSIONS_WRONG
 
 from tests_autotim.app.app_test import AppTest, AUTH_HEADER
 from tests_autotim.test_objects.test_objects import set_environ_for_testing, \
@@ -165,3 +168,174 @@ class PredictBPTest(AppTest):
         }, headers=AUTH_HEADER)
 
         self.assertEqual(response.status_code, 200)
+
+    def test_predict_stats_returns_200(self):
+        self.autotim_prediction_service.cache_stats.return_value = {'models': {'hits': 1}}
+
+        response = self.client.get('/predict/stats', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['models'], {'hits': 1})
+        self.assertIn('batching', response.get_json())
+
+    def test_predict_invalidate_returns_200(self):
+        response = self.client.post('/predict/invalidate', data={
+            'use_case_name': 'some_name',
+            'dataset_identifier': 'some identifier'
+        }, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.autotim_prediction_service.invalidate_stage_cache.assert_called_with(
+            use_case_name='some_name', dataset_identifier='some identifier')
+
+    @patch('autotim.app.endpoints.predict_bp.create_features', return_value=H2OFrame())
+    def test_predict_returns_200_on_arrow_stream_body(self, *_):
+        self.autotim_prediction_service.predict.return_value = [1]
+        table = pa.table({'id': [1, 1], 'value': [0.5, 0.7]})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        response = self.client.post(
+            '/predict?use_case_name=some_name&dataset_identifier=some_identifier',
+            data=sink.getvalue().to_pybytes(),
+            content_type='application/vnd.apache.arrow.stream', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+
+    @patch('autotim.app.admission_control.AdmissionController.admit',
+           side_effect=AdmissionRejectedError(name='predict', status=429, retry_after=3))
+    def test_predict_returns_429_with_retry_after_when_overloaded(self, _):
+        response = self.client.post('/predict', data={
+            'file': (io.BytesIO(b"id,value\n1,1"), 'foo.csv'),
+            'use_case_name': 'some_name',
+            'dataset_identifier': 'some identifier'
+        }, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '3')
+        self.autotim_prediction_service.get_model.assert_not_called()
+        self.autotim_prediction_service.predict.assert_not_called()
+
+    def test_status_returns_admission_stats(self):
+        self.training_job_runner.stats.return_value = {'queued': 1, 'running': 1}
+
+        response = self.client.get('/status', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json['admission']), {'predict'})
+        self.assertIn('queued', response.json['admission']['predict'])
+        self.assertEqual(response.json['training_jobs'], {'queued': 1, 'running': 1})
+
+    @patch('autotim.app.endpoints.predict_bp.create_features')
+    def test_predict_scores_model_versions_with_shared_features(self, create_features_mock):
+        create_features_mock.return_value = pd.DataFrame(
+            {'value__mean': [0.5], 'value__maximum': [0.7]})
+        params = {'column_id': 'id', 'column_value': 'value'}
+        models = {'3': MagicMock(model_version=3, mlflow_uri='models:/some_model/3',
+                                 params=params, feature_settings={'value': {'mean': None}}),
+                  None: MagicMock(model_version=4, mlflow_uri='models:/some_model/4',
+                                  params=params, feature_settings={'value': {'maximum': None}})}
+        self.autotim_prediction_service.get_model.side_effect = \
+            lambda model_version, **_: models[None if model_version is None
+                                              else str(model_version)]
+        self.autotim_prediction_service.predict.side_effect = \
+            lambda model, features: list(features.columns)
+
+        response = self.client.post('/predict', data={
+            'file': (io.BytesIO(b"id,value\n1,1"), 'foo.csv'),
+            'use_case_name': 'some_name',
+            'dataset_identifier': 'some identifier',
+            'model_versions': '3,Production'
+        }, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['predictions'],
+                         {'3': ['value__mean'], '4': ['value__maximum']})
+        create_features_mock.assert_called_once()
+        self.assertEqual(create_features_mock.call_args.kwargs['settings'],
+                         {'value': {'mean': None, 'maximum': None}})
+
+    def test_predict_returns_400_on_wrong_model_versions(self):
+        response = self.client.post('/predict', data={
+            'file': (io.BytesIO(b"id,value\n1,1"), 'foo.csv'),
+            'use_case_name': 'some_name',
+            'dataset_identifier': 'some identifier',
+            'model_versions': '3,Staging'
+        }, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, RESPONSE_400_MODEL_VERSIONS_WRONG.status_code)
+
+
+class PredictBatchBPTest(AppTest):
+    """Batch prediction tests. """
+
+    def test_predict_batch_returns_400_on_missing_manifest(self):
+        response = self.client.post('/predict/batch', json={'some thing': 'another thing'},
+                                    headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, RESPONSE_400_MANIFEST_WRONG.status_code)
+
+    def test_predict_batch_reports_failed_groups(self):
+        self.autotim_prediction_service.get_model.side_effect = \
+            MlflowModelNotFoundError(model_name='')
+
+        response = self.client.post('/predict/batch', json={'groups': [
+            {'use_case_name': 'some_name', 'dataset_identifier': 'some identifier',
+             'series': [{'id': 1, 'value': 1}]},
+            {'use_case_name': 'some_name', 'series': [{'id': 1, 'value': 1}]}
+        ]}, headers=AUTH_HEADER)
+
+        results = response.get_json()['results']
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['failed_groups'], 2)
+        self.assertEqual(results[0]['status'], RESPONSE_404_MODEL_NOT_FOUND.status_code)
+        self.assertEqual(results[1]['status'], RESPONSE_400_NO_REQUIRED_PARAM.status_code)
+
+    @patch('autotim.app.endpoints.predict_bp.create_features', return_value=H2OFrame())
+    def test_predict_batch_returns_200(self, *_):
+        self.autotim_prediction_service.get_model.return_value = \
+            MagicMock(model_version='1', mlflow_uri='models:/some_model/1',
+                      params={'column_id': 'id'})
+        self.autotim_prediction_service.predict.return_value = [1]
+
+        response = self.client.post('/predict/batch', json={'groups': [
+            {'use_case_name': 'some_name', 'dataset_identifier': 'some identifier',
+             'series': [{'id': 1, 'value': 1}]}
+        ]}, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['results'][0]['prediction'], [1])
+        self.assertEqual(response.get_json()['failed_groups'], 0)
+
+
+class PredictStreamBPTest(AppTest):
+    """Streaming prediction tests. """
+
+    @patch('autotim.app.endpoints.predict_bp.create_features', return_value=H2OFrame())
+    def test_predict_stream_returns_ndjson(self, *_):
+        self.autotim_prediction_service.get_model.return_value = \
+            MagicMock(params={'column_id': 'id'})
+        self.autotim_prediction_service.predict.return_value = [1, 0]
+
+        response = self.client.post('/predict/stream', data={
+            'file': (io.BytesIO(b"id,value\n1,1\n2,2"), 'foo.csv'),
+            'use_case_name': 'some_name',
+            'dataset_identifier': 'some identifier'
+        }, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data,
+                         b'{"id": 1, "prediction": 1}\n{"id": 2, "prediction": 0}\n')
+
+    def test_predict_stream_returns_404_model_not_found(self):
+        self.autotim_prediction_service.get_model.side_effect = \
+            MlflowModelNotFoundError(model_name='')
+
+        response = self.client.post('/predict/stream', data={
+            'file': (io.BytesIO(b"id,value\n1,1"), 'foo.csv'),
+            'use_case_name': 'some_name',
+            'dataset_identifier': 'some identifier'
+        }, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, RESPONSE_404_MODEL_NOT_FOUND.status_code)
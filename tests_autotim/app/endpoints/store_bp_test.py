@@ -1,5 +1,7 @@
 import io
 
+import pyarrow as pa
+
 from tests_autotim.app.app_test import AppTest, AUTH_HEADER
 
 from autotim.storage_client.file_store_manager import StorageDoesNotExistError
@@ -74,3 +76,26 @@ class StoreBPTest(AppTest):
             }, headers=AUTH_HEADER)
 
         self.assertEqual(response.status_code, 200)
+
+    def test_store_saves_arrow_file_as_parquet(self):
+        self.file_client_mock.dir_exists.return_value = False
+        table = pa.table({'id': [1, 1], 'value': [0.5, 0.7]})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        response = self.client.post('/store', data={
+                'file': (io.BytesIO(sink.getvalue().to_pybytes()), 'foo.arrow'),
+                'use_case_name': 'possum', 'dataset_identifier': '42'
+            }, headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.file_client_mock.save_single_file.call_args[1]['src']
+                        .endswith('foo.parquet'))
+
+    def test_store_returns_400_on_invalid_arrow_body(self):
+        response = self.client.post('/store?use_case_name=possum', data=b"abcdef",
+                                    content_type='application/vnd.apache.arrow.stream',
+                                    headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, RESPONSE_400_INPUT_FORMAT_WRONG.status_code)
@@ -0,0 +1,75 @@
+from autotim.app.admission_control import AdmissionRejectedError
+from autotim.model_training.training_config import TrainingConfig
+
+from tests_autotim.app.app_test import AppTest, AUTH_HEADER
+
+
+class TrainBPTest(AppTest):
+    def test_train_returns_404_on_missing_params(self):
+        response = self.client.get('/train?use_case_name=possum', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 404)
+        self.training_job_runner.submit.assert_not_called()
+
+    def test_train_returns_400_on_wrong_train_size(self):
+        response = self.client.get('/train?use_case_name=possum&dataset_identifier=42'
+                                   '&train_size=1.5', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 400)
+        self.training_job_runner.submit.assert_not_called()
+
+    def test_train_returns_400_on_wrong_priority(self):
+        response = self.client.get('/train?use_case_name=possum&dataset_identifier=42'
+                                   '&priority=high', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 400)
+        self.training_job_runner.submit.assert_not_called()
+
+    def test_train_submits_job_and_returns_202(self):
+        self.training_job_runner.submit.return_value = 'abc123'
+
+        response = self.client.get('/train?use_case_name=possum&dataset_identifier=42'
+                                   '&column_value=value&max_attempts=3', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json, {'training': 'queued', 'job_id': 'abc123',
+                                         'status_url': '/train/abc123'})
+        self.assertTrue(response.headers['Location'].endswith('/train/abc123'))
+        kwargs = self.training_job_runner.submit.call_args.kwargs
+        self.assertEqual(kwargs['use_case_name'], 'possum')
+        self.assertEqual(kwargs['dataset_identifier'], '42')
+        self.assertEqual(kwargs['config'], TrainingConfig(column_value='value', max_attempts=3))
+        # called by the job runner once the job has completed
+        kwargs['on_completed']()
+        self.autotim_prediction_service.invalidate_stage_cache.assert_called_once_with(
+            use_case_name='possum', dataset_identifier='42')
+
+    def test_train_returns_429_if_job_queue_is_full(self):
+        self.training_job_runner.submit.side_effect = \
+            AdmissionRejectedError(name='train', status=429, retry_after=120)
+
+        response = self.client.get('/train?use_case_name=possum&dataset_identifier=42',
+                                   headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '120')
+
+    def test_training_job_returns_404_for_unknown_job(self):
+        self.training_job_runner.get.return_value = None
+
+        response = self.client.get('/train/unknown', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_training_job_returns_job(self):
+        job = {'job_id': 'abc123', 'use_case_name': 'possum', 'dataset_identifier': '42',
+               'status': 'completed', 'stage': 'selecting model',
+               'result': {'training': 'completed', 'latest_model_version': '2'}}
+        self.training_job_runner.get.return_value = job
+
+        response = self.client.get('/train/abc123', headers=AUTH_HEADER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json, job)
+        # the stage cache is dropped when the job completes, not on polling
+        self.autotim_prediction_service.invalidate_stage_cache.assert_not_called()
@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+
+from autotim.app.endpoints.utils.h2o_frame_utils import decode_frame_column, upload_frame
+
+
+class UploadFrameTest(unittest.TestCase):
+    @patch('autotim.app.endpoints.utils.h2o_frame_utils.h2o.upload_file')
+    def test_upload_uses_placeholder_header_and_column_types(self, upload_mock):
+        uploaded = {'frame': MagicMock()}
+
+        def upload_file(path, **kwargs):
+            uploaded['csv'] = pd.read_csv(path)
+            uploaded['kwargs'] = kwargs
+            return uploaded['frame']
+        upload_mock.side_effect = upload_file
+        dataframe = pd.DataFrame({'value__fft_coefficient__attr_"real"__coeff_0': [0.5, 1.0],
+                                  'label': ['a', 'b']})
+
+        upload_frame(dataframe, column_types={'label': 'enum'})
+
+        self.assertEqual(uploaded['csv'].columns.tolist(), ['C1', 'C2'])
+        self.assertEqual(uploaded['csv']['C1'].tolist(), [0.5, 1.0])
+        self.assertEqual(uploaded['kwargs']['header'], 1)
+        self.assertEqual(uploaded['kwargs']['col_types'], ['real', 'enum'])
+        uploaded['frame'].set_names.assert_called_once_with(dataframe.columns.tolist())
+
+    def test_upload_raises_value_error_on_empty_dataframe(self):
+        with self.assertRaises(ValueError):
+            upload_frame(pd.DataFrame())
+
+
+class DecodeFrameColumnTest(unittest.TestCase):
+    def test_decodes_numeric_column_with_missing_values(self):
+        column = {'type': 'real', 'data': [0.5, 'NaN', 2.0], 'string_data': None}
+
+        self.assertEqual(decode_frame_column(column), [0.5, None, 2.0])
+
+    def test_decodes_categorical_column_from_domain(self):
+        labels = {'type': 'enum', 'data': [1.0, 0.0, 'NaN'], 'domain': ['no', 'yes'],
+                  'string_data': None}
+        numeric_labels = {'type': 'enum', 'data': [1.0, 0.0], 'domain': ['0', '1'],
+                          'string_data': None}
+
+        self.assertEqual(decode_frame_column(labels), ['yes', 'no', None])
+        self.assertEqual(decode_frame_column(numeric_labels), [1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from tsfresh import extract_features
+
+from autotim.feature_engineering import automated_feature_engineering
+from autotim.feature_engineering.automated_feature_engineering import \
+    extract_features_from_settings, merge_settings, select_features, rank_features, \
+    select_relevant_features
+from autotim.prediction_service.lru_cache import LRUCache
+
+SETTINGS = {'value': {'mean': None, 'maximum': None}}
+
+
+class ExtractFeaturesFromSettingsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data = pd.DataFrame({'id': [1, 1, 2, 2, 3], 'value': [1.0, 2.0, 5.0, 3.0, 4.0]})
+
+    @patch.object(automated_feature_engineering, 'FEATURE_CACHE', LRUCache(capacity=10))
+    def test_cached_features_equal_tsfresh_features(self):
+        expected = extract_features(self.data, column_id='id', kind_to_fc_parameters=SETTINGS)
+        # first call fills the cache, second call is answered from the cache
+        for _ in range(2):
+            features = extract_features_from_settings(self.data, column_id='id',
+                                                      settings=SETTINGS)
+            pd.testing.assert_frame_equal(features, expected, check_names=False, check_like=True)
+
+    @patch.object(automated_feature_engineering, 'FEATURE_CACHE', LRUCache(capacity=10))
+    @patch('autotim.feature_engineering.automated_feature_engineering.extract_features',
+           wraps=extract_features)
+    def test_only_unseen_series_are_extracted(self, extract_mock):
+        extract_features_from_settings(self.data[self.data['id'] < 3], column_id='id',
+                                       settings=SETTINGS)
+        extract_features_from_settings(self.data, column_id='id', settings=SETTINGS)
+
+        self.assertEqual(extract_mock.call_args[0][0]['id'].unique().tolist(), [3])
+
+    @patch.object(automated_feature_engineering, 'FEATURE_CACHE', LRUCache(capacity=10))
+    def test_raises_value_error_on_empty_data(self):
+        with self.assertRaises(ValueError):
+            extract_features_from_settings(self.data.iloc[0:0], column_id='id',
+                                           settings=SETTINGS)
+
+
+class MergeSettingsTest(unittest.TestCase):
+    def test_sliced_union_features_equal_features_of_each_settings(self):
+        data = pd.DataFrame({'id': [1, 1, 1, 2, 2, 2], 'value': [1.0, 2.0, 5.0, 3.0, 4.0, 0.5],
+                             'temperature': [0.1, 0.3, 0.2, 0.4, 0.8, 0.6]})
+        settings = [{'value': {'mean': None, 'quantile': [{'q': 0.1}]}},
+                    {'value': {'quantile': [{'q': 0.1}, {'q': 0.9}]},
+                     'temperature': {'maximum': None}}]
+
+        union = extract_features(data, column_id='id', disable_progressbar=True,
+                                 kind_to_fc_parameters=merge_settings(settings))
+
+        self.assertEqual(union.shape[1], 4)
+        for model_settings in settings:
+            expected = extract_features(data, column_id='id', disable_progressbar=True,
+                                        kind_to_fc_parameters=model_settings)
+            pd.testing.assert_frame_equal(select_features(union, model_settings), expected,
+                                          check_like=True)
+
+
+class SelectRelevantFeaturesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        random = np.random.default_rng(42)
+        self.target = pd.Series([0, 1] * 20)
+        # the higher the number of a feature, the less it depends on the target
+        self.features = pd.DataFrame({f'feature_{i}': self.target * (10 - i) / 5 +
+                                      random.normal(size=40) for i in range(10)})
+
+    def test_attempts_slice_the_ranking_instead_of_testing_the_relevance_again(self):
+        ranking = rank_features(self.features, self.target)
+        features = self.features
+        with patch('autotim.feature_engineering.automated_feature_engineering.'
+                   'calculate_relevance_table') as relevance_mock:
+            for attempt in range(3):
+                features = select_relevant_features(features, self.target, attempt,
+                                                    max_features=8, features_decrement=0.5,
+                                                    ranking=ranking)
+                self.assertEqual(features.columns.tolist(), ranking[:8 // 2 ** attempt])
+
+        relevance_mock.assert_not_called()
+
+    def test_ranking_equals_ranking_of_the_relevance_table(self):
+        features = select_relevant_features(self.features, self.target, 0, max_features=3)
+
+        self.assertEqual(set(features.columns), {'feature_0', 'feature_1', 'feature_2'})
+        self.assertEqual(rank_features(features, self.target), features.columns.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+from tsfresh import extract_features
+from tsfresh.utilities.distribution import MapDistributor
+
+from autotim.feature_engineering import extraction_policy
+from autotim.feature_engineering.extraction_policy import get_execution_settings, \
+    PersistentMultiprocessingDistributor
+
+SETTINGS = {'value': {'mean': None, 'maximum': None}}
+
+
+@patch.object(extraction_policy, 'N_WORKERS', 2)
+@patch.object(extraction_policy, 'SMALL_INPUT_SERIES', 2)
+class ExtractionPolicyTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data = pd.DataFrame({'id': [1, 1, 2, 2, 3], 'value': [1.0, 2.0, 5.0, 3.0, 4.0]})
+
+    def test_small_input_is_extracted_in_process(self):
+        settings = get_execution_settings(number_of_series=2)
+
+        self.assertIsInstance(settings['distributor'], MapDistributor)
+        self.assertEqual(settings['n_jobs'], 0)
+
+    def test_large_inputs_share_a_persistent_pool(self):
+        expected = extract_features(self.data, column_id='id', kind_to_fc_parameters=SETTINGS,
+                                    n_jobs=0)
+        distributor = get_execution_settings(number_of_series=3)['distributor']
+        try:
+            self.assertIsInstance(distributor, PersistentMultiprocessingDistributor)
+            for _ in range(2):
+                settings = get_execution_settings(number_of_series=3)
+                self.assertIs(settings['distributor'], distributor)
+                features = extract_features(self.data, column_id='id',
+                                            kind_to_fc_parameters=SETTINGS, **settings)
+                pd.testing.assert_frame_equal(features, expected)
+        finally:
+            distributor.shutdown()
+            extraction_policy._SHARED_DISTRIBUTOR = None  # pylint: disable=protected-access
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from tsfresh import extract_features
+from tsfresh.feature_extraction import ComprehensiveFCParameters
+
+from autotim.feature_engineering.feature_compiler import FeaturePlan, NATIVE_CALCULATORS
+
+# all natively supported calculators and two calculators evaluated by tsfresh
+CALCULATORS = {name: parameters for name, parameters in ComprehensiveFCParameters().items()
+               if name in NATIVE_CALCULATORS or name in ['linear_trend', 'agg_autocorrelation']}
+
+
+def create_timeseries(series: int = 20):
+    rng = np.random.default_rng(42)
+    rows = []
+    for identifier in range(series):
+        # series of different lengths (incl. very short ones) and with repeated values
+        length = [1, 2, 3, 25][identifier % 4] if identifier < 8 else rng.integers(4, 40)
+        for kind in ['a', 'b']:
+            for value in rng.normal(size=length).round(1):
+                rows.append((identifier, kind, value))
+    return pd.DataFrame(rows, columns=['id', 'kind', 'value'])
+
+
+class FeaturePlanTest(unittest.TestCase):
+    def assert_features_equal_tsfresh(self, data, settings, **columns):
+        expected = extract_features(data, kind_to_fc_parameters=settings, n_jobs=0,
+                                    disable_progressbar=True, **columns)
+
+        features = FeaturePlan(settings=settings).evaluate(data, **columns)
+
+        pd.testing.assert_frame_equal(features.astype(float), expected.astype(float),
+                                      check_like=True, check_names=False,
+                                      rtol=1e-9, atol=1e-12)
+
+    def test_long_format_features_equal_tsfresh(self):
+        self.assert_features_equal_tsfresh(
+            create_timeseries(), settings={'a': CALCULATORS, 'b': CALCULATORS},
+            column_id='id', column_kind='kind', column_value='value')
+
+    def test_wide_format_features_equal_tsfresh(self):
+        data = create_timeseries()
+        data = pd.DataFrame({'id': data['id'][data['kind'] == 'a'].to_numpy(),
+                             'a': data['value'][data['kind'] == 'a'].to_numpy(),
+                             'b': data['value'][data['kind'] == 'b'].to_numpy()})
+
+        self.assert_features_equal_tsfresh(data, settings={'a': CALCULATORS},
+                                           column_id='id')
+
+    def test_wide_format_with_non_numeric_sort_column_equals_tsfresh(self):
+        # the sort column is not passed at prediction time and treated as a kind
+        data = pd.DataFrame({'id': [1, 1, 2, 2],
+                             'time': ['2020-01-01', '2020-01-02', '2020-01-01', '2020-01-02'],
+                             'value': [1.0, 2.0, 5.0, 3.0]})
+
+        self.assert_features_equal_tsfresh(data, settings={'value': {'mean': None}},
+                                           column_id='id')
+
+    def test_non_finite_values_are_passed_to_tsfresh(self):
+        data = create_timeseries()
+        data.loc[3, 'value'] = np.inf
+
+        self.assert_features_equal_tsfresh(
+            data, settings={'a': {'mean': None, 'quantile': [{'q': 0.5}]}},
+            column_id='id', column_kind='kind', column_value='value')
+
+    def test_raises_value_error_on_missing_id_column(self):
+        with self.assertRaises(ValueError):
+            FeaturePlan(settings={'a': {'mean': None}}).evaluate(
+                create_timeseries(), column_id='possum', column_kind='kind',
+                column_value='value')
+
+
+if __name__ == "__main__":
+    unittest.main()
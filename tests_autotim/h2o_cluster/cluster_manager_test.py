@@ -0,0 +1,71 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+from autotim.h2o_cluster.cluster_manager import H2OCluster, SERVING, TRAINING
+
+
+@patch('autotim.h2o_cluster.cluster_manager.h2o')
+class H2OClusterTest(unittest.TestCase):
+    @patch.dict(os.environ, {'H2O_MAX_MEM_SIZE': '2G', 'H2O_NTHREADS': '4',
+                             'H2O_SERVING_MAX_MEM_SIZE': '1G'})
+    def test_roles_share_one_cluster_by_default(self, h2o_mock):
+        h2o_mock.connection.return_value = MagicMock(connected=False)
+
+        H2OCluster(role=SERVING).connect()
+
+        h2o_mock.init.assert_called_once_with(ip='127.0.0.1', port=54321, name=None,
+                                              nthreads=4, max_mem_size='2G', verbose=False)
+
+    @patch.dict(os.environ, {'H2O_SEPARATE_CLUSTERS': 'true', 'H2O_MAX_MEM_SIZE': '2G',
+                             'H2O_SERVING_MAX_MEM_SIZE': '1G', 'H2O_SERVING_NTHREADS': '2'})
+    def test_separate_clusters_are_sized_per_role(self, h2o_mock):
+        h2o_mock.connection.return_value = MagicMock(connected=False)
+
+        H2OCluster(role=SERVING).connect()
+        H2OCluster(role=TRAINING).connect()
+
+        h2o_mock.init.assert_any_call(ip='127.0.0.1', port=54323, name='autotim-serving',
+                                      nthreads=2, max_mem_size='1G', verbose=False)
+        h2o_mock.init.assert_any_call(ip='127.0.0.1', port=54321, name='autotim-training',
+                                      nthreads=-1, max_mem_size='2G', verbose=False)
+
+    @patch.dict(os.environ, {'H2O_URL': 'http://h2o:54321'})
+    def test_connects_to_an_external_cluster(self, h2o_mock):
+        h2o_mock.connection.return_value = MagicMock(connected=False)
+
+        H2OCluster(role=TRAINING).connect()
+
+        h2o_mock.init.assert_called_once_with(url='http://h2o:54321', start_h2o=False,
+                                              verbose=False)
+
+    def test_existing_connection_is_reused(self, h2o_mock):
+        h2o_mock.connection.return_value = MagicMock(connected=True, autotim_role=None)
+
+        H2OCluster(role=TRAINING).connect()
+
+        h2o_mock.init.assert_not_called()
+
+    @patch.dict(os.environ, {'H2O_HEALTH_CHECK_INTERVAL_SECONDS': '0'})
+    def test_reconnects_if_the_cluster_is_down(self, h2o_mock):
+        cluster = H2OCluster(role=SERVING)
+        h2o_mock.cluster.return_value.is_running.return_value = True
+        self.assertFalse(cluster.ensure_healthy())
+
+        h2o_mock.cluster.return_value.is_running.return_value = False
+        self.assertTrue(cluster.ensure_healthy())
+        h2o_mock.init.assert_called_once()
+
+    @patch.dict(os.environ, {'H2O_HEALTH_CHECK_INTERVAL_SECONDS': '60'})
+    def test_health_checks_are_throttled(self, h2o_mock):
+        cluster = H2OCluster(role=SERVING)
+        h2o_mock.cluster.return_value.is_running.return_value = True
+
+        cluster.ensure_healthy()
+        cluster.ensure_healthy()
+
+        h2o_mock.cluster.return_value.is_running.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
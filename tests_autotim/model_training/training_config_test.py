@@ -0,0 +1,41 @@
+import unittest
+
+from autotim.model_training.training_config import TrainingConfig
+
+
+class TrainingConfigTest(unittest.TestCase):
+    def test_from_params_converts_request_parameters(self):
+        config = TrainingConfig.from_params({'column_id': 'series', 'column_value': 'value',
+                                             'column_kind': '', 'max_features': '200',
+                                             'features_decrement': '0.5', 'train_time': '3',
+                                             'train_size': '0.8', 'priority': '2',
+                                             'use_case_name': 'possum'})
+
+        self.assertEqual(config, TrainingConfig(column_id='series', column_value='value',
+                                                max_features=200, features_decrement=0.5,
+                                                train_time=3.0, train_size=0.8, priority=2))
+        self.assertEqual(config.dataset_columns, {'column_id': 'series', 'column_label': 'label',
+                                                  'column_value': 'value'})
+
+    def test_from_params_keeps_defaults(self):
+        config = TrainingConfig.from_params({'train_time': 'dynamic'})
+
+        self.assertEqual(config, TrainingConfig())
+        self.assertIsNone(config.train_time)
+        self.assertEqual(TrainingConfig(**config.to_params()), config)
+
+    def test_from_params_rejects_invalid_parameters(self):
+        with self.assertRaisesRegex(ValueError, 'train_size'):
+            TrainingConfig.from_params({'train_size': '1.5'})
+        with self.assertRaisesRegex(ValueError, 'max_features'):
+            TrainingConfig.from_params({'max_features': 'many'})
+        with self.assertRaisesRegex(ValueError, 'priority'):
+            TrainingConfig.from_params({'priority': 'high'})
+
+    def test_config_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            TrainingConfig().metric = 'recall_score'
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# the imports of a test working in a temporary directory are the same in other tests
+# pylint: disable=duplicate-code
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from autotim.model_training.training_scheduler import TrainingScheduler, split_runtime
+
+
+class SplitRuntimeTest(unittest.TestCase):
+    def test_runtime_is_split_across_concurrent_runs(self):
+        self.assertEqual(split_runtime(requested_runtime=1500, concurrent_runs=1,
+                                       runtime_budget=1800, min_runtime=120), 1500)
+        self.assertEqual(split_runtime(requested_runtime=1500, concurrent_runs=2,
+                                       runtime_budget=1800, min_runtime=120), 900)
+        self.assertEqual(split_runtime(requested_runtime=600, concurrent_runs=2,
+                                       runtime_budget=1800, min_runtime=120), 600)
+        self.assertEqual(split_runtime(requested_runtime=1500, concurrent_runs=30,
+                                       runtime_budget=1800, min_runtime=120), 120)
+        self.assertEqual(split_runtime(requested_runtime=1500, concurrent_runs=2,
+                                       runtime_budget=0, min_runtime=120), 1500)
+
+
+class TrainingSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.environ = patch.dict(os.environ, {
+            'TRAINING_JOB_STORE': os.path.join(self.directory, 'jobs.db'),
+            'AUTOML_MAX_CONCURRENT': "1", 'AUTOML_RUNTIME_BUDGET_SECONDS': "1800"})
+        self.environ.start()
+        self.scheduler = TrainingScheduler(poll_interval=0.01)
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def enqueue(self, use_case_name, priority=0, requested_runtime=600):
+        return self.scheduler.enqueue(use_case_name=use_case_name, priority=priority,
+                                      requested_runtime=requested_runtime)
+
+    def start_next(self, run_ids):
+        """Claims all runs, returns the one that was started."""
+        started = [run_id for run_id in run_ids if self.scheduler.claim(run_id) is not None]
+        self.assertEqual(len(started), 1)
+        return started[0]
+
+    def test_runs_wait_for_a_free_slot_by_priority(self):
+        first = self.enqueue('possum')
+        self.assertEqual(self.scheduler.claim(first), 600)
+        low, high = self.enqueue('koala', priority=0), self.enqueue('wombat', priority=5)
+
+        self.assertIsNone(self.scheduler.claim(high))
+        self.scheduler.finish(first)
+        self.assertEqual(self.start_next([low, high]), high)
+
+    def test_use_cases_share_the_cluster_fairly(self):
+        self.scheduler.finish(self.start_next([self.enqueue('possum')]))
+        again, other = self.enqueue('possum'), self.enqueue('koala')
+
+        # the use case that has not trained recently goes first, although it came later
+        self.assertEqual(self.start_next([again, other]), other)
+
+    def test_runtime_is_split_between_concurrent_runs(self):
+        self.scheduler.max_concurrent = 2
+        first, second = self.enqueue('possum', requested_runtime=1500), \
+            self.enqueue('koala', requested_runtime=1500)
+
+        self.assertEqual(self.scheduler.claim(first), 1500)
+        self.assertEqual(self.scheduler.claim(second), 900)
+        self.assertEqual(self.scheduler.stats()['running'], 2)
+
+    def test_slot_is_released_on_exit(self):
+        with self.scheduler.slot(use_case_name='possum', requested_runtime=300) as slot:
+            self.assertEqual(slot.max_runtime_secs, 300)
+            self.assertEqual(self.scheduler.stats()['running'], 1)
+
+        self.assertEqual(self.scheduler.stats()['running'], 0)
+
+    def test_runs_of_exited_processes_do_not_block_the_cluster(self):
+        # a process id above the maximum of linux (2^22)
+        with patch('autotim.model_training.training_scheduler.os.getpid',
+                   return_value=2 ** 22 + 1):
+            self.scheduler.claim(self.enqueue('possum'))
+
+        self.assertIsNotNone(self.scheduler.claim(self.enqueue('koala')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.autotim_prediction_service import AutoTiMPredictionService
+
+
+def load_slowly(model_sceleton):
+    time.sleep(0.1)
+    model_sceleton.model = MagicMock()
+    return model_sceleton
+
+
+@patch('autotim.prediction_service.autotim_prediction_service.connect',
+       **{'return_value.ensure_healthy.return_value': False})
+@patch('autotim.prediction_service.autotim_prediction_service.mlflow.tracking.MlflowClient')
+@patch('autotim.prediction_service.autotim_prediction_service.h2o')
+class AutoTiMPredictionServiceTest(unittest.TestCase):
+    @patch('autotim.prediction_service.autotim_prediction_service.MlFlowModelLoader'
+           '.retrieve_mlflow_model_data', side_effect=load_slowly)
+    def test_concurrent_requests_load_a_cold_model_once(self, load_mock, *_):
+        service = AutoTiMPredictionService()
+        models = []
+
+        def get_model():
+            models.append(service.get_model(use_case_name='possum', dataset_identifier='42',
+                                            model_version=1))
+
+        threads = [threading.Thread(target=get_model) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(load_mock.call_count, 1)
+        self.assertEqual(len({id(model) for model in models}), 1)
+
+    @patch.dict(os.environ, {'MODEL_EVICTION_GRACE_SECONDS': '0.1'})
+    def test_evicted_model_is_removed_after_grace_period(self, h2o_mock, *_):
+        service = AutoTiMPredictionService()
+        autotim_model = AutoTiM_Model(use_case_name='possum', dataset_identifier='42',
+                                      model_version=1, mlflow_model=MagicMock())
+
+        # pylint: disable=protected-access
+        service._release_model(model_uri=autotim_model.mlflow_uri, autotim_model=autotim_model)
+
+        h2o_mock.remove.assert_not_called()
+        time.sleep(0.3)
+        h2o_mock.remove.assert_called_once_with(autotim_model.model)
+
+    def test_models_are_reloaded_after_reconnecting_to_the_cluster(self, _, __, connect_mock):
+        service = AutoTiMPredictionService()
+        service.model_cache.put('models:/possum-42_model/1', MagicMock())
+        connect_mock.return_value.ensure_healthy.return_value = True
+
+        with patch('autotim.prediction_service.autotim_prediction_service.MlFlowModelLoader'
+                   '.retrieve_mlflow_model_data', side_effect=load_slowly) as load_mock:
+            service.get_model(use_case_name='possum', dataset_identifier='42', model_version=1)
+
+        load_mock.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+
+from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.bulk_scoring import run
+from autotim.storage_client.local_client import LocalStorageClient
+
+
+def create_mean_feature(dataframe, column_id, column_value, **_):
+    return dataframe.groupby(column_id)[column_value].mean().to_frame('value__mean')
+
+
+def predict_by_mean(features, **_):
+    return [int(mean > 2) for mean in features['value__mean']]
+
+
+class BulkScoringTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = tempfile.mkdtemp()
+        self.working_directory = tempfile.mkdtemp()
+        dataset_directory = os.path.join(self.storage, 'possum', 'fleet')
+        os.makedirs(dataset_directory)
+        pd.DataFrame({'id': [1, 1, 2, 2, 3, 3], 'time': [0, 1] * 3,
+                      'value': [1.0, 2.0, 3.0, 4.0, 0.5, 0.5]}) \
+            .to_parquet(os.path.join(dataset_directory, 'data.parquet'))
+        pd.DataFrame({'id': [4, 4], 'time': [0, 1], 'value': [5.0, 6.0]}) \
+            .to_csv(os.path.join(dataset_directory, 'more_data.csv'), index=False)
+
+        self.autotim_model = AutoTiM_Model(
+            use_case_name='possum', dataset_identifier='fleet', model_version=2,
+            mlflow_model=MagicMock(), feature_settings={'value': {'mean': None}},
+            model_params={'column_id': 'id', 'column_value': 'value', 'column_kind': None,
+                          'column_sort': 'time'})
+
+    def tearDown(self):
+        shutil.rmtree(self.storage, ignore_errors=True)
+        shutil.rmtree(self.working_directory, ignore_errors=True)
+
+    @patch('autotim.prediction_service.bulk_scoring.create_features',
+           side_effect=create_mean_feature)
+    @patch('autotim.prediction_service.bulk_scoring.AutoTiMPredictionService.predict',
+           side_effect=predict_by_mean)
+    def test_predictions_are_written_per_chunk(self, *_):
+        summary = run(file_client=LocalStorageClient(directory_path=self.storage + '/'),
+                      autotim_model=self.autotim_model, output='possum/predictions',
+                      chunk_size=2, working_directory=self.working_directory)
+
+        output_directory = os.path.join(self.storage, 'possum', 'predictions')
+        parts = sorted(os.listdir(output_directory))
+        predictions = pd.concat([pd.read_parquet(os.path.join(output_directory, part))
+                                 for part in parts], ignore_index=True)
+        self.assertEqual(parts, ['part-00000.parquet', 'part-00001.parquet',
+                                 'part-00002.parquet'])
+        self.assertEqual(predictions['id'].tolist(), [1, 2, 3, 4])
+        self.assertEqual(predictions['prediction'].tolist(), [0, 1, 0, 1])
+        self.assertEqual(summary['series'], 4)
+        self.assertEqual(summary['rows'], 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from autotim.prediction_service.lru_cache import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    def test_get_counts_hits_and_misses(self):
+        cache = LRUCache(capacity=2)
+        cache.put('possum', 1)
+
+        self.assertEqual(cache.get('possum'), 1)
+        self.assertIsNone(cache.get('opossum'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_evicts_least_recently_used_on_capacity(self):
+        evicted = []
+        cache = LRUCache(capacity=2, on_evict=lambda key, value: evicted.append(key))
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertEqual(evicted, ['b'])
+        self.assertIn('a', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_evicts_on_max_size(self):
+        cache = LRUCache(capacity=10, max_size=10, size_of=lambda value: value)
+        cache.put('a', 4)
+        cache.put('b', 4)
+        cache.put('c', 4)
+
+        self.assertNotIn('a', cache)
+        self.assertEqual(cache.total_size, 8)
+
+    def test_keeps_newest_entry_exceeding_max_size(self):
+        cache = LRUCache(capacity=10, max_size=10, size_of=lambda value: value)
+        cache.put('a', 4)
+        cache.put('b', 20)
+
+        self.assertEqual(len(cache), 1)
+        self.assertIn('b', cache)
+
+    def test_pop_does_not_count_as_eviction(self):
+        cache = LRUCache(capacity=2)
+        cache.put('a', 1)
+
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 0)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
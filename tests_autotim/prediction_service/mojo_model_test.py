@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from autotim.prediction_service.mojo_model import MojoModel, GENMODEL_JAR
+
+
+class MojoModelTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        for file in ['GBM_1.zip', GENMODEL_JAR]:
+            with open(os.path.join(self.directory, file), 'w', encoding='utf-8'):
+                pass
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @patch('autotim.prediction_service.mojo_model.h2o.mojo_predict_pandas',
+           return_value=pd.DataFrame({'predict': [1, 0], 'p0': [0.2, 0.7], 'p1': [0.8, 0.3]}))
+    def test_predict_scores_features_with_mojo(self, predict_mock):
+        features = pd.DataFrame({'value__mean': [1.0, 2.0]})
+
+        predictions = MojoModel(directory=self.directory).predict(features)
+
+        self.assertEqual(predictions, [1, 0])
+        self.assertEqual(predict_mock.call_args[1]['mojo_zip_path'],
+                         os.path.join(self.directory, 'GBM_1.zip'))
+        self.assertEqual(predict_mock.call_args[1]['genmodel_jar_path'],
+                         os.path.join(self.directory, GENMODEL_JAR))
+
+    def test_missing_genmodel_jar_raises_file_not_found_error(self):
+        os.remove(os.path.join(self.directory, GENMODEL_JAR))
+
+        with self.assertRaises(FileNotFoundError):
+            MojoModel(directory=self.directory)
+
+    def test_remove_deletes_mojo_files(self):
+        MojoModel(directory=self.directory).remove()
+
+        self.assertFalse(os.path.isdir(self.directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+import pandas as pd
+
+from autotim.app.admission_control import Admission, AdmissionLimiter, AdmissionRejectedError
+from autotim.prediction_service.prediction_coalescer import PredictionCoalescer, \
+    merge_timeseries, split_predictions
+
+
+def score_by_id(dataframe):
+    # one prediction per series, ordered by series id
+    return dataframe.groupby('id')['value'].sum().sort_index().tolist()
+
+
+class MergeTimeseriesTest(unittest.TestCase):
+    def test_merge_and_split_keeps_order_per_frame(self):
+        first = pd.DataFrame({'id': ['b', 'a', 'b'], 'value': [1, 2, 3]})
+        second = pd.DataFrame({'id': ['a', 'c'], 'value': [10, 20]})
+
+        merged, counts = merge_timeseries(frames=[first, second], column_id='id')
+
+        self.assertEqual(counts, [2, 2])
+        self.assertEqual(split_predictions(score_by_id(merged), counts),
+                         [score_by_id(first), score_by_id(second)])
+
+
+class PredictionCoalescerTest(unittest.TestCase):
+    def test_disabled_coalescer_scores_directly(self):
+        coalescer = PredictionCoalescer()
+        timeseries = pd.DataFrame({'id': [1, 2], 'value': [1, 2]})
+
+        self.assertEqual(coalescer.submit(key='model', timeseries=timeseries, column_id='id',
+                                          score=score_by_id), [1, 2])
+        self.assertEqual(coalescer.stats()['batches'], 0)
+
+    @patch.dict(os.environ, {'PREDICT_BATCH_WINDOW_MS': '200'})
+    def test_concurrent_requests_are_scored_together(self):
+        coalescer = PredictionCoalescer()
+        frames = [pd.DataFrame({'id': [1, 1, 2], 'value': [i, i, 1]}) for i in range(3)]
+        results = [None] * len(frames)
+
+        def submit(i):
+            results[i] = coalescer.submit(key='model', timeseries=frames[i], column_id='id',
+                                          score=score_by_id)
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(frames))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [score_by_id(frame) for frame in frames])
+        self.assertEqual(coalescer.stats()['batched_requests'], 3)
+        self.assertLess(coalescer.stats()['batches'], 3)
+
+    @patch.dict(os.environ, {'PREDICT_BATCH_WINDOW_MS': '10'})
+    def test_failing_request_does_not_fail_batch(self):
+        coalescer = PredictionCoalescer()
+
+        def score(dataframe):
+            if dataframe['value'].isna().any():
+                raise ValueError('possum')
+            return score_by_id(dataframe)
+
+        with self.assertRaises(ValueError):
+            coalescer.submit(key='model', column_id='id', score=score,
+                             timeseries=pd.DataFrame({'id': [1], 'value': [None]}))
+        self.assertEqual(coalescer.submit(key='model', column_id='id', score=score,
+                                          timeseries=pd.DataFrame({'id': [1], 'value': [4]})),
+                         [4])
+
+    @patch.dict(os.environ, {'PREDICT_BATCH_WINDOW_MS': '50'})
+    def test_request_without_id_column_does_not_block_later_requests(self):
+        coalescer = PredictionCoalescer()
+        results = []
+
+        with self.assertRaises(KeyError):
+            coalescer.submit(key='model', column_id='id', score=score_by_id,
+                             timeseries=pd.DataFrame({'possum': [1], 'value': [4]}))
+        thread = threading.Thread(target=lambda: results.append(coalescer.submit(
+            key='model', column_id='id', score=score_by_id,
+            timeseries=pd.DataFrame({'id': [1], 'value': [4]}))), daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results, [[4]])
+
+    @patch.dict(os.environ, {'PREDICT_BATCH_WINDOW_MS': '200'})
+    def test_batch_takes_a_single_admission_slot(self):
+        coalescer = PredictionCoalescer()
+        limiter = AdmissionLimiter(name='predict', max_concurrent=1, max_queue=0, max_wait=0)
+        frames = [pd.DataFrame({'id': [1], 'value': [i]}) for i in range(4)]
+        results = [None] * len(frames)
+
+        def submit(i):
+            results[i] = coalescer.submit(key='model', timeseries=frames[i], column_id='id',
+                                          score=score_by_id,
+                                          admit=lambda: Admission(limiter=limiter))
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(frames))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # more requests than slots, none of them is rejected
+        self.assertEqual(results, [[0], [1], [2], [3]])
+        self.assertEqual(limiter.stats()['rejected'], 0)
+
+    @patch.dict(os.environ, {'PREDICT_BATCH_WINDOW_MS': '10'})
+    def test_batch_that_is_not_admitted_fails_its_requests(self):
+        coalescer = PredictionCoalescer()
+
+        def admit():
+            raise AdmissionRejectedError(name='predict', status=429, retry_after=1)
+
+        with self.assertRaises(AdmissionRejectedError):
+            coalescer.submit(key='model', column_id='id', score=score_by_id, admit=admit,
+                             timeseries=pd.DataFrame({'id': [1], 'value': [4]}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from autotim.prediction_service.production_watcher import ProductionWatcher
+
+
+class ProductionWatcherTest(unittest.TestCase):
+    def test_watcher_refreshes_until_stopped(self):
+        refresh = MagicMock()
+        watcher = ProductionWatcher(refresh=refresh, interval=0.01)
+        watcher.start()
+        time.sleep(0.1)
+        watcher.stop()
+        watcher.join(timeout=1)
+
+        self.assertFalse(watcher.is_alive())
+        self.assertGreater(refresh.call_count, 0)
+
+    def test_watcher_survives_failing_refresh(self):
+        refresh = MagicMock(side_effect=ConnectionError)
+        watcher = ProductionWatcher(refresh=refresh, interval=0.01)
+        watcher.start()
+        time.sleep(0.1)
+
+        self.assertTrue(watcher.is_alive())
+        self.assertGreater(refresh.call_count, 1)
+        watcher.stop()
+        watcher.join(timeout=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
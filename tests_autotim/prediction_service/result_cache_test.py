@@ -0,0 +1,51 @@
+import os
+import unittest
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+
+from autotim.prediction_service.result_cache import PredictionResultCache
+
+
+def get_model(version: str):
+    return MagicMock(mlflow_uri=f'models:/possum_model/{version}', feature_settings={'value': {}},
+                     params={'column_id': 'id', 'column_sort': 'time'})
+
+
+class PredictionResultCacheTest(unittest.TestCase):
+    @patch.dict(os.environ, {'PREDICTION_CACHE_SIZE': '10'})
+    def test_only_new_series_are_scored(self):
+        cache = PredictionResultCache()
+        score = MagicMock(side_effect=lambda df: df.groupby('id')['value'].sum().tolist())
+        first = pd.DataFrame({'id': [1, 1, 2], 'time': [0, 1, 0], 'value': [1, 2, 5]})
+        # series 7 equals series 1 with shuffled rows, series 8 is new
+        second = pd.DataFrame({'id': [7, 7, 8], 'time': [1, 0, 0], 'value': [2, 1, 9]})
+
+        self.assertEqual(cache.score(get_model('1'), first, score), [3, 5])
+        self.assertEqual(cache.score(get_model('1'), second, score), [3, 9])
+        self.assertEqual(score.call_args[0][0]['id'].unique().tolist(), [8])
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    @patch.dict(os.environ, {'PREDICTION_CACHE_SIZE': '10'})
+    def test_cache_is_keyed_by_model_version(self):
+        cache = PredictionResultCache()
+        score = MagicMock(return_value=[1])
+        timeseries = pd.DataFrame({'id': [1], 'time': [0], 'value': [1]})
+        cache.score(get_model('1'), timeseries, score)
+        cache.score(get_model('2'), timeseries, score)
+
+        self.assertEqual(score.call_count, 2)
+
+    def test_disabled_cache_scores_directly(self):
+        cache = PredictionResultCache()
+        score = MagicMock(return_value=[1])
+        timeseries = pd.DataFrame({'id': [1], 'time': [0], 'value': [1]})
+        cache.score(get_model('1'), timeseries, score)
+        cache.score(get_model('1'), timeseries, score)
+
+        self.assertFalse(cache.enabled)
+        self.assertEqual(score.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+
+from autotim.model_selection.exceptions import ModelArtifactsNotAvailableError
+from autotim.prediction_service.autotim_model import AutoTiM_Model
+from autotim.prediction_service.scoring_sidecar import ScoringServer, \
+    SidecarPredictionService, read_features, write_features, encode_predict_request, \
+    decode_predict_request, encode_predictions, decode_predictions
+
+
+class ScoringSidecarTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, 'scoring.sock')
+        self.received_features = []
+        self.service = MagicMock()
+        self.service.get_model.return_value = AutoTiM_Model(
+            use_case_name='possum', dataset_identifier='42', model_version=3,
+            mlflow_model=MagicMock(), feature_settings={'value': {'mean': None}},
+            model_params={'column_id': 'id'}, run_id='run')
+        self.service.predict.side_effect = \
+            lambda model, features: self.received_features.append(features) or ['1', '0']
+        self.server = ScoringServer(socket_path=self.socket_path,
+                                    prediction_service=self.service)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        with patch.dict(os.environ, {'SCORING_SIDECAR_SOCKET': self.socket_path}):
+            self.client = SidecarPredictionService()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.socket_path)
+        os.rmdir(self.directory)
+
+    def test_features_round_trip_through_shared_memory(self):
+        features = pd.DataFrame({'value__mean': [1.5, -2.0], 'value__maximum': [3.0, 4.25]})
+        memory, description = write_features(features)
+        try:
+            pd.testing.assert_frame_equal(read_features(description), features)
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def test_predict_request_and_predictions_round_trip_in_binary_layout(self):
+        model = {'use_case_name': 'possum', 'dataset_identifier': '42', 'model_version': None}
+        features = {'name': 'psm_1', 'shape': [2, 2],
+                    'columns': ['value__mean', 'value__quantile__q_0.1']}
+        predictions = ['1', 0, 2.5, None, 'känguru']
+
+        self.assertEqual(decode_predict_request(encode_predict_request(model, features)),
+                         (model, features))
+        self.assertEqual(decode_predictions(encode_predictions(predictions)), predictions)
+
+    def test_predict_with_model_of_the_sidecar(self):
+        autotim_model = self.client.get_model(use_case_name='possum', dataset_identifier='42')
+        features = pd.DataFrame({'value__mean': [1.5, -2.0]})
+
+        predictions = self.client.predict(model=autotim_model.model, features=features)
+
+        self.assertEqual(predictions, ['1', '0'])
+        self.assertEqual(autotim_model.model_version, 3)
+        self.assertEqual(autotim_model.feature_settings, {'value': {'mean': None}})
+        self.assertEqual(autotim_model.params, {'column_id': 'id'})
+        pd.testing.assert_frame_equal(self.received_features[0], features)
+        # the resolved version is scored, even if the sidecar evicted the model in between
+        self.service.get_model.assert_called_with(use_case_name='possum',
+                                                  dataset_identifier='42', model_version=3)
+
+    def test_errors_of_the_sidecar_are_raised_in_the_worker(self):
+        self.service.get_model.side_effect = ModelArtifactsNotAvailableError(
+            model_name='possum_42', model_version=3)
+
+        with self.assertRaises(ModelArtifactsNotAvailableError):
+            self.client.get_model(use_case_name='possum', dataset_identifier='42',
+                                  model_version=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from unittest.mock import patch
+
+from autotim.prediction_service.stage_cache import StageResolutionCache
+
+
+class StageResolutionCacheTest(unittest.TestCase):
+    def test_get_returns_cached_version(self):
+        cache = StageResolutionCache(ttl=30)
+        cache.put(model_name='possum_model', stage='Production', run_id='run', model_version='3')
+
+        self.assertEqual(cache.get(model_name='possum_model', stage='Production'), ('run', '3'))
+        self.assertIsNone(cache.get(model_name='possum_model', stage='Staging'))
+
+    @patch('autotim.prediction_service.stage_cache.time.monotonic', side_effect=[0, 31])
+    def test_get_returns_none_after_ttl(self, *_):
+        cache = StageResolutionCache(ttl=30)
+        cache.put(model_name='possum_model', stage='Production', run_id='run', model_version='3')
+
+        self.assertIsNone(cache.get(model_name='possum_model', stage='Production'))
+
+    def test_ttl_zero_disables_cache(self):
+        cache = StageResolutionCache(ttl=0)
+        cache.put(model_name='possum_model', stage='Production', run_id='run', model_version='3')
+
+        self.assertIsNone(cache.get(model_name='possum_model', stage='Production'))
+
+    def test_invalidate_drops_matching_entries(self):
+        cache = StageResolutionCache(ttl=30)
+        cache.put(model_name='possum_model', stage='Production', run_id='run', model_version='3')
+        cache.put(model_name='wombat_model', stage='Production', run_id='run', model_version='1')
+        cache.invalidate(model_name='possum_model')
+
+        self.assertIsNone(cache.get(model_name='possum_model', stage='Production'))
+        self.assertEqual(cache.get(model_name='wombat_model', stage='Production'), ('run', '1'))
+
+
+if __name__ == "__main__":
+    unittest.main()
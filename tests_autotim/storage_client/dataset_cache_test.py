@@ -0,0 +1,78 @@
+# the imports of a test working in a temporary directory are the same in other tests
+# pylint: disable=duplicate-code
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from autotim.storage_client.dataset_cache import DatasetCache
+from autotim.storage_client.local_client import LocalStorageClient
+
+
+class DatasetCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = os.path.join(self.directory, 'storage')
+        self.write('possum/42/dataset.csv', "id,time,value\n1,1,0.5\n")
+        self.client = LocalStorageClient(directory_path=self.storage + '/')
+        with patch.dict(os.environ, {'DATASET_CACHE_DIR':
+                                     os.path.join(self.directory, 'cache'),
+                                     'DATASET_CACHE_MAX_MB': "1"}):
+            self.cache = DatasetCache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, path, content):
+        path = os.path.join(self.storage, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+
+    def fetch(self, workspace):
+        output_path = os.path.join(self.directory, workspace)
+        self.cache.fetch(file_client=self.client, prefix='possum/42/', output_path=output_path)
+        with open(os.path.join(output_path, 'possum/42/dataset.csv'), encoding='utf-8') as file:
+            return file.read()
+
+    def test_unchanged_dataset_is_not_downloaded_again(self):
+        self.assertEqual(self.fetch('first'), "id,time,value\n1,1,0.5\n")
+
+        with patch.object(self.client, 'download_dir') as download_dir:
+            self.assertEqual(self.fetch('second'), "id,time,value\n1,1,0.5\n")
+
+        download_dir.assert_not_called()
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        stats = self.cache.stats()
+        self.assertEqual((stats['files'], stats['hits'], stats['misses']), (1, 1, 1))
+
+    def test_changed_dataset_is_downloaded(self):
+        self.fetch('first')
+        self.write('possum/42/dataset.csv', "id,time,value\n1,1,0.75\n")
+
+        self.assertEqual(self.fetch('second'), "id,time,value\n1,1,0.75\n")
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+    def test_file_that_changed_during_the_download_is_not_cached(self):
+        keys = self.client.list_content_keys('possum/42/')
+        changed_keys = {path: 'changed' for path in keys}
+        with patch.object(self.client, 'list_content_keys', side_effect=[keys, changed_keys]):
+            self.assertEqual(self.fetch('first'), "id,time,value\n1,1,0.5\n")
+
+        self.assertEqual(self.cache.size(), 0)
+
+    def test_least_recently_used_files_are_evicted(self):
+        self.cache.max_bytes = 1500
+        self.write('possum/42/dataset.csv', "1" * 1000)
+        self.fetch('first')
+        self.write('possum/42/dataset.csv', "2" * 1000)
+        self.fetch('second')
+
+        self.assertEqual(self.cache.size(), 1000)
+        self.assertEqual(self.fetch('third'), "2" * 1000)
+        self.assertEqual(self.cache.hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
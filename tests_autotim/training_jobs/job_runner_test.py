@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+from autotim.app.admission_control import AdmissionRejectedError
+from autotim.model_training.training_config import TrainingConfig
+from autotim.training_jobs.job_runner import TrainingJobRunner, run_job
+from autotim.training_jobs.job_store import JobStore, COMPLETED, FAILED
+
+
+def train_with_stages(on_stage, **_):
+    on_stage("extracting features")
+    return {'training': "completed", 'latest_model_version': '1'}, 200
+
+
+class JobRunnerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.environ = patch.dict(os.environ, {
+            'TRAINING_JOB_STORE': os.path.join(self.directory, 'jobs.db'),
+            'TRAIN_MAX_CONCURRENT': "1", 'TRAIN_MAX_QUEUE': "1"})
+        self.environ.start()
+        self.job_store = JobStore()
+
+    def tearDown(self):
+        self.environ.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @patch('autotim.training_jobs.job_runner.create_storage_client')
+    @patch('autotim.app.endpoints.utils.model_creation_utils.train',
+           side_effect=train_with_stages)
+    def test_run_job_stores_stages_and_result(self, train_mock, _):
+        config = TrainingConfig(column_id='series', train_size=0.8)
+        job_id = self.job_store.submit(use_case_name='possum', dataset_identifier='42',
+                                       params=config.to_params())
+
+        run_job(job_id, max_running=1, max_wait=0)
+
+        job = self.job_store.get(job_id)
+        self.assertEqual(job['status'], COMPLETED)
+        self.assertEqual(job['stage'], "extracting features")
+        self.assertEqual(job['result'], {'training': "completed", 'latest_model_version': '1',
+                                         'dataset_cache': {'hits': 0, 'misses': 0}})
+        self.assertEqual(train_mock.call_args.kwargs['config'], config)
+
+    @patch('autotim.training_jobs.job_runner.create_storage_client')
+    @patch('autotim.app.endpoints.utils.model_creation_utils.train',
+           side_effect=RuntimeError("h2o is gone"))
+    def test_run_job_fails_job_on_unexpected_errors(self, *_):
+        job_id = self.job_store.submit(use_case_name='possum', dataset_identifier='42',
+                                       params={})
+
+        run_job(job_id, max_running=1, max_wait=0)
+
+        job = self.job_store.get(job_id)
+        self.assertEqual(job['status'], FAILED)
+        self.assertEqual(job['http_status'], 500)
+
+    def test_run_job_fails_job_that_waited_too_long(self):
+        self.job_store.submit(use_case_name='possum', dataset_identifier='1', params={})
+        job_id = self.job_store.submit(use_case_name='possum', dataset_identifier='42',
+                                       params={})
+
+        run_job(job_id, max_running=1, max_wait=0.01)
+
+        self.assertEqual(self.job_store.get(job_id)['http_status'], 503)
+
+    @patch('autotim.training_jobs.job_store.process_is_alive', return_value=True)
+    def test_submit_starts_a_process_and_rejects_jobs_beyond_the_queue(self, _):
+        runner = TrainingJobRunner(job_store=self.job_store)
+        runner._context = context = MagicMock()  # pylint: disable=protected-access
+        context.Process.return_value.pid = 4242
+
+        job_id = runner.submit(use_case_name='possum', dataset_identifier='42',
+                               config=TrainingConfig())
+        runner.submit(use_case_name='possum', dataset_identifier='43', config=TrainingConfig())
+
+        with self.assertRaises(AdmissionRejectedError) as rejected:
+            runner.submit(use_case_name='possum', dataset_identifier='44',
+                          config=TrainingConfig())
+        self.assertEqual(rejected.exception.status, 429)
+        self.assertEqual(context.Process.return_value.start.call_count, 2)
+        self.assertEqual(runner.stats()['queued'], 2)
+        self.assertIsNotNone(runner.get(job_id))
+
+    @patch('autotim.training_jobs.job_store.process_is_alive', return_value=True)
+    def test_on_completed_is_called_once_the_job_has_completed(self, _):
+        runner = TrainingJobRunner(job_store=self.job_store)
+        runner._context = context = MagicMock()  # pylint: disable=protected-access
+        context.Process.return_value.pid = 4242
+        exited, completed = threading.Event(), threading.Event()
+        context.Process.return_value.join.side_effect = lambda: exited.wait(timeout=5)
+
+        job_id = runner.submit(use_case_name='possum', dataset_identifier='42',
+                               config=TrainingConfig(), on_completed=completed.set)
+        # e.g. by the training process before it exits
+        self.job_store.finish(job_id, result={'training': "completed"}, http_status=200)
+        self.assertFalse(completed.is_set())
+        exited.set()
+
+        self.assertTrue(completed.wait(timeout=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+# the imports of a test working in a temporary directory are the same in other tests
+# pylint: disable=duplicate-code
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from autotim.training_jobs import job_store as job_store_module
+from autotim.training_jobs.job_store import JobStore, QUEUED, RUNNING, COMPLETED, FAILED
+
+
+class JobStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with patch.dict(os.environ, {'TRAINING_JOB_STORE':
+                                     os.path.join(self.directory, 'jobs.db')}):
+            self.job_store = JobStore()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def submit(self, **kwargs):
+        return self.job_store.submit(use_case_name='possum', dataset_identifier='42',
+                                     params={'column_id': 'id'}, **kwargs)
+
+    def test_submitted_job_is_queued(self):
+        job_id = self.submit()
+
+        job = self.job_store.get(job_id)
+        self.assertEqual(job['status'], QUEUED)
+        self.assertEqual(job['use_case_name'], 'possum')
+        self.assertEqual(job['params'], {'column_id': 'id'})
+        self.assertIsNone(job['result'])
+        self.assertIsNone(self.job_store.get('unknown'))
+
+    def test_submit_is_rejected_if_max_active_jobs_are_queued_or_running(self):
+        self.assertIsNotNone(self.submit(max_active=2))
+        self.assertIsNotNone(self.submit(max_active=2))
+
+        self.assertIsNone(self.submit(max_active=2))
+        self.assertEqual(self.job_store.counts()[QUEUED], 2)
+
+    def test_jobs_are_claimed_in_order_up_to_max_running(self):
+        first, second = self.submit(), self.submit()
+
+        self.assertFalse(self.job_store.claim(second, max_running=1))
+        self.assertTrue(self.job_store.claim(first, max_running=1))
+        self.assertFalse(self.job_store.claim(second, max_running=1))
+        self.job_store.finish(first, result={'training': 'completed'}, http_status=200)
+        self.assertTrue(self.job_store.claim(second, max_running=1))
+        self.assertEqual(self.job_store.get(second)['status'], RUNNING)
+
+    def test_jobs_with_higher_priority_are_claimed_first(self):
+        first = self.submit()
+        self.job_store.claim(first, max_running=1)
+        low = self.submit()
+        high = self.job_store.submit(use_case_name='koala', dataset_identifier='1',
+                                     params={}, priority=3)
+        self.job_store.finish(first, result={'training': 'completed'}, http_status=200)
+
+        self.assertFalse(self.job_store.claim(low, max_running=1))
+        self.assertTrue(self.job_store.claim(high, max_running=1))
+        self.assertEqual(self.job_store.get(high)['priority'], 3)
+
+    def test_stages_and_result_are_stored(self):
+        job_id = self.submit()
+        self.job_store.claim(job_id)
+
+        self.job_store.set_stage(job_id, 'extracting features')
+        self.job_store.set_stage(job_id, 'training (attempt 1 of 5)')
+        self.job_store.finish(job_id, result={'training': 'failed', 'error': 'no data'},
+                              http_status=404)
+
+        job = self.job_store.get(job_id)
+        self.assertEqual(job['stage'], 'training (attempt 1 of 5)')
+        self.assertEqual([stage['stage'] for stage in job['stages']],
+                         ['extracting features', 'training (attempt 1 of 5)'])
+        self.assertEqual(job['status'], FAILED)
+        self.assertEqual(job['result'], {'training': 'failed', 'error': 'no data'})
+        self.assertEqual(job['http_status'], 404)
+        self.assertIsNotNone(self.job_store.average_duration())
+
+    def test_dataset_cache_counts_are_summed_over_jobs(self):
+        self.assertEqual(self.job_store.dataset_cache_counts(), {'hits': 0, 'misses': 0})
+        for hits, misses in [(1, 0), (2, 1)]:
+            self.job_store.finish(self.submit(), http_status=200, result={
+                'training': 'completed', 'dataset_cache': {'hits': hits, 'misses': misses}})
+        self.job_store.finish(self.submit(), result={'training': 'failed'}, http_status=500)
+
+        self.assertEqual(self.job_store.dataset_cache_counts(), {'hits': 3, 'misses': 1})
+
+    @patch('autotim.training_jobs.job_store.process_is_alive', return_value=False)
+    def test_jobs_of_exited_processes_fail_and_do_not_block_the_queue(self, _):
+        crashed, queued = self.submit(), self.submit()
+        self.job_store.claim(crashed, max_running=1)
+        self.job_store.set_worker(crashed, pid=123456)
+
+        self.assertTrue(self.job_store.claim(queued, max_running=1))
+        self.assertEqual(self.job_store.get(crashed)['status'], FAILED)
+        self.assertEqual(self.job_store.counts()[COMPLETED], 0)
+
+    @patch('autotim.training_jobs.job_store.process_is_alive', return_value=True)
+    def test_jobs_whose_process_never_started_fail_after_a_timeout(self, _):
+        started, never_started = self.submit(), self.submit()
+        self.job_store.set_worker(started, pid=123456)
+        self.job_store.fail_orphaned()
+        self.assertEqual(self.job_store.get(never_started)['status'], QUEUED)
+
+        with patch.object(job_store_module, 'WORKER_START_TIMEOUT', -1):
+            self.job_store.fail_orphaned()
+
+        self.assertEqual(self.job_store.get(started)['status'], QUEUED)
+        self.assertEqual(self.job_store.get(never_started)['status'], FAILED)
+
+
+if __name__ == '__main__':
+    unittest.main()